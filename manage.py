@@ -6,7 +6,10 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "realestate_project.settings")
+    default_settings = "realestate_project.settings"
+    if sys.argv[1:2] == ["test"]:
+        default_settings = "realestate_project.test_settings"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
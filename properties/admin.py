@@ -13,8 +13,10 @@ from .models import (
     Listing, ListingImage, Construction, ConstructionImage, ContactMessage, 
     About, SiteSettings, CustomSection, BannerImage, Reference, ReferenceImage, 
     ReferenceVideo, SEOSettings, VisibleCustomSection, NewsletterSubscriber, 
-    Newsletter, PopupSettings, NewsletterLog,NavigationSettings
+    Newsletter, PopupSettings, NewsletterLog,NavigationSettings, OutboundEmail,
+    ImageProcessingJob, ContentStats, ExchangeRate
 )
+from .content_stats import update_queryset
 
 # Register your models here.
 
@@ -47,6 +49,27 @@ class ListingAdmin(admin.ModelAdmin):
     price_display.short_description = 'Fiyat'
     price_display.admin_order_field = 'price'
     
+    actions = ['activate_listings', 'deactivate_listings']
+    
+    def activate_listings(self, request, queryset):
+        updated = update_queryset(queryset, is_active=True)
+        self.message_user(request, f'{updated} ilan aktifleştirildi.')
+    activate_listings.short_description = 'Seçili ilanları aktifleştir'
+    
+    def deactivate_listings(self, request, queryset):
+        updated = update_queryset(queryset, is_active=False)
+        self.message_user(request, f'{updated} ilan pasifleştirildi.')
+    deactivate_listings.short_description = 'Seçili ilanları pasifleştir'
+    
+    readonly_fields = ('image_processing_status',)
+    
+    def image_processing_status(self, obj):
+        if not obj.pk:
+            return '-'
+        status = ImageProcessingJob.status_for(obj)
+        return dict(ImageProcessingJob.STATUS_CHOICES)[status]
+    image_processing_status.short_description = 'Görsel Optimizasyonu'
+    
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -98,7 +121,7 @@ class ListingAdmin(admin.ModelAdmin):
             'description': 'NOT: Yatak odası, banyo, kat ve bina yaşı alanları arsa ve ticari gayrimenkuller için boş bırakılabilir. Bu alanlar sadece daire, ev, villa ve ofis için doldurulmalıdır.'
         }),
         ('Medya', {
-            'fields': ('main_image', 'image_alt_text')
+            'fields': ('main_image', 'image_alt_text', 'image_processing_status')
         }),
         ('Görüntüleme Seçenekleri', {
             'fields': ('is_active', 'is_featured')
@@ -134,6 +157,18 @@ class ConstructionAdmin(admin.ModelAdmin):
     date_hierarchy = 'start_date'
     inlines = [ConstructionImageInline]
     
+    actions = ['activate_constructions', 'deactivate_constructions']
+    
+    def activate_constructions(self, request, queryset):
+        updated = update_queryset(queryset, is_active=True)
+        self.message_user(request, f'{updated} proje aktifleştirildi.')
+    activate_constructions.short_description = 'Seçili projeleri aktifleştir'
+    
+    def deactivate_constructions(self, request, queryset):
+        updated = update_queryset(queryset, is_active=False)
+        self.message_user(request, f'{updated} proje pasifleştirildi.')
+    deactivate_constructions.short_description = 'Seçili projeleri pasifleştir'
+    
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -672,177 +707,29 @@ class NewsletterAdmin(admin.ModelAdmin):
     actions = ['send_newsletter']
     
     def send_newsletter(self, request, queryset):
-        from django.core.mail import EmailMultiAlternatives, get_connection
-        from django.template.loader import render_to_string
-        from django.utils import timezone
+        from .newsletter import claim_newsletter, deliver_newsletter
+        
+        base_url = request.build_absolute_uri('/').rstrip('/')
         
         for newsletter in queryset:
-            if newsletter.status in ['sent', 'sending']:
+            # Compare-and-set so a double click or the scheduler cannot send it twice
+            if not claim_newsletter(newsletter):
                 self.message_user(request, f'"{newsletter.title}" zaten gönderilmiş veya gönderiliyor.', level='warning')
                 continue
             
-            # Log: Starting newsletter send
-            NewsletterLog.log_info(newsletter, f'Bülten gönderimi başlatıldı: {newsletter.title}')
-            
-            # Get active subscribers
-            subscribers = NewsletterSubscriber.objects.filter(is_active=True)
-            newsletter.total_recipients = subscribers.count()
-            
-            if newsletter.total_recipients == 0:
-                NewsletterLog.log_error(newsletter, 'Aktif abone bulunamadı')
-                self.message_user(request, 'Aktif abone bulunamadı!', level='error')
-                continue
-            
-            NewsletterLog.log_info(newsletter, f'Toplam {newsletter.total_recipients} aboneye gönderilecek')
-            
-            newsletter.status = 'sending'
-            newsletter.save()
-            
-            sent_count = 0
-            failed_count = 0
+            result = deliver_newsletter(newsletter, base_url=base_url, resume=False)
             
-            # Get SMTP settings from SiteSettings
-            site_settings = SiteSettings.objects.first()
-            
-            if not site_settings:
-                NewsletterLog.log_error(newsletter, 'Site ayarları bulunamadı')
-                self.message_user(request, 'Site ayarları bulunamadı! Lütfen önce Site Ayarlarını yapılandırın.', level='error')
-                newsletter.status = 'failed'
-                newsletter.save()
-                continue
-            
-            # Check if SMTP settings are configured
-            if not site_settings.smtp_host or not site_settings.smtp_username:
-                NewsletterLog.log_error(newsletter, 'SMTP ayarları yapılandırılmamış')
-                self.message_user(
-                    request, 
-                    'SMTP ayarları yapılandırılmamış! Lütfen Site Ayarları > Email SMTP Ayarları bölümünü doldurun.',
-                    level='error'
-                )
-                newsletter.status = 'failed'
-                newsletter.save()
-                continue
-            
-            # Create custom email connection with SiteSettings SMTP config
-            try:
-                connection = get_connection(
-                    backend='django.core.mail.backends.smtp.EmailBackend',
-                    host=site_settings.smtp_host,
-                    port=site_settings.smtp_port,
-                    username=site_settings.smtp_username,
-                    password=site_settings.smtp_password,
-                    use_tls=site_settings.smtp_use_tls,
-                    fail_silently=False,
-                )
-                NewsletterLog.log_success(newsletter, f'SMTP bağlantısı kuruldu: {site_settings.smtp_host}:{site_settings.smtp_port}')
-            except Exception as e:
-                error_msg = f'SMTP bağlantısı kurulamadı: {str(e)}'
-                NewsletterLog.log_error(newsletter, error_msg, error_details=str(e))
-                self.message_user(request, error_msg, level='error')
-                newsletter.status = 'failed'
-                newsletter.save()
-                continue
-            
-            for subscriber in subscribers:
-                try:
-                    # Prepare unsubscribe link
-                    unsubscribe_url = request.build_absolute_uri(
-                        reverse('newsletter_unsubscribe', args=[subscriber.unsubscribe_token])
-                    )
-                    
-                    # Generate absolute logo URL for email
-                    logo_url = None
-                    if site_settings.logo:
-                        # Logo URL is already absolute from CDN, use it directly
-                        logo_url = site_settings.logo.url
-                        NewsletterLog.log_info(newsletter, f'Logo URL from storage: {logo_url}')
-                        # If it's a relative path, make it absolute
-                        if not logo_url.startswith('http'):
-                            logo_url = request.build_absolute_uri(logo_url)
-                            NewsletterLog.log_info(newsletter, f'Logo URL converted to absolute: {logo_url}')
-                        else:
-                            NewsletterLog.log_info(newsletter, f'Logo URL is already absolute: {logo_url}')
-                    
-                    # Render email template with context
-                    import datetime
-                    context = {
-                        'newsletter': newsletter,
-                        'subscriber': subscriber,
-                        'site_settings': site_settings,
-                        'unsubscribe_url': unsubscribe_url,
-                        'logo_url': logo_url,
-                        'current_year': datetime.datetime.now().year,
-                    }
-                    
-                    html_content = render_to_string('emails/newsletter.html', context)
-                    
-                    # Plain text version (strip HTML tags)
-                    from django.utils.html import strip_tags
-                    plain_content = strip_tags(newsletter.content)
-                    
-                    # Send email using custom SMTP connection
-                    email = EmailMultiAlternatives(
-                        subject=newsletter.subject,
-                        body=plain_content,
-                        from_email=site_settings.email_from if site_settings.email_from else site_settings.email,
-                        to=[subscriber.email],
-                        connection=connection  # Use custom SMTP connection
-                    )
-                    email.attach_alternative(html_content, "text/html")
-                    email.send()
-                    
-                    sent_count += 1
-                    NewsletterLog.log_success(
-                        newsletter, 
-                        f'Email başarıyla gönderildi', 
-                        subscriber_email=subscriber.email
-                    )
-                    
-                except Exception as e:
-                    failed_count += 1
-                    error_msg = f'Email gönderilemedi: {str(e)}'
-                    NewsletterLog.log_error(
-                        newsletter,
-                        error_msg,
-                        subscriber_email=subscriber.email,
-                        error_details=str(e)
-                    )
-                    print(f"Failed to send to {subscriber.email}: {str(e)}")
-            
-            # Close connection
-            try:
-                connection.close()
-            except:
-                pass
-            
-            # Update newsletter stats and status
-            newsletter.sent_count = sent_count
-            newsletter.failed_count = failed_count
-            newsletter.sent_date = timezone.now()
-            
-            # Determine final status
-            if sent_count == 0:
+            if result.error:
+                self.message_user(request, f'"{newsletter.title}": {result.error}', level='error')
+            elif result.sent == 0:
                 # No emails sent at all
-                newsletter.status = 'failed'
-                status_message = f'❌ "{newsletter.title}" bülteni hiçbir aboneye gönderilemedi! ({failed_count} başarısız)'
-                message_level = 'error'
-                NewsletterLog.log_error(newsletter, f'Bülten gönderimi başarısız: Hiçbir email gönderilemedi ({failed_count} hata)')
-            elif failed_count == 0:
+                self.message_user(request, f'❌ "{newsletter.title}" bülteni hiçbir aboneye gönderilemedi! ({result.failed} başarısız)', level='error')
+            elif result.failed == 0:
                 # All emails sent successfully
-                newsletter.status = 'sent'
-                status_message = f'✅ "{newsletter.title}" bülteni {sent_count}/{newsletter.total_recipients} aboneye başarıyla gönderildi!'
-                message_level = 'success'
-                NewsletterLog.log_success(newsletter, f'Bülten başarıyla gönderildi: {sent_count}/{newsletter.total_recipients} email')
+                self.message_user(request, f'✅ "{newsletter.title}" bülteni {result.sent}/{result.total} aboneye başarıyla gönderildi! ({result.rate:.1f} email/sn)', level='success')
             else:
                 # Partial success
-                newsletter.status = 'sent'  # Mark as sent if at least some went through
-                status_message = f'⚠️ "{newsletter.title}" bülteni {sent_count}/{newsletter.total_recipients} aboneye gönderildi. ({failed_count} başarısız)'
-                message_level = 'warning'
-                NewsletterLog.log_warning(newsletter, f'Kısmi başarı: {sent_count} başarılı, {failed_count} başarısız')
-            
-            newsletter.save()
-            
-            self.message_user(request, status_message, level=message_level)
+                self.message_user(request, f'⚠️ "{newsletter.title}" bülteni {result.sent}/{result.total} aboneye gönderildi. ({result.failed} başarısız)', level='warning')
     
     send_newsletter.short_description = 'Seçili bültenleri gönder'
 
@@ -972,3 +859,78 @@ class NavigationSettingsAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # Don't allow deletion
         return False
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """
+    Email outbox admin for monitoring queued notification emails
+    """
+    list_display = ('created_date', 'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_date')
+    list_filter = ('status', 'created_date')
+    search_fields = ('subject', 'recipients', 'last_error')
+    readonly_fields = ('subject', 'body', 'from_email', 'recipients', 'attempts', 'last_error', 'claimed_at', 'created_date', 'sent_date')
+    date_hierarchy = 'created_date'
+    
+    actions = ['retry_emails']
+    
+    def retry_emails(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status__in=['sent', 'sending']).update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f'{updated} e-posta yeniden gönderim kuyruğuna alındı.')
+    retry_emails.short_description = 'Seçili e-postaları yeniden dene'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ImageProcessingJob)
+class ImageProcessingJobAdmin(admin.ModelAdmin):
+    """
+    Background image optimization queue
+    """
+    list_display = ('created_date', 'source_name', 'content_type', 'field_name', 'status', 'attempts', 'updated_date')
+    list_filter = ('status', 'content_type')
+    search_fields = ('source_name', 'result_name', 'last_error')
+    readonly_fields = ('content_type', 'object_id', 'field_name', 'source_name', 'result_name', 'attempts', 'last_error', 'created_date', 'updated_date')
+    
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status='failed').update(status='pending', attempts=0)
+        self.message_user(request, f'{updated} görsel yeniden işleme kuyruğuna alındı.')
+    retry_jobs.short_description = 'Seçili görselleri yeniden işle'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ContentStats)
+class ContentStatsAdmin(admin.ModelAdmin):
+    """
+    Denormalized active counts, maintained by signals and reconciled hourly
+    """
+    list_display = ('model_name', 'dimension', 'value', 'count', 'updated_date')
+    list_filter = ('model_name', 'dimension')
+    readonly_fields = ('model_name', 'dimension', 'value', 'count', 'updated_date')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    """
+    TRY exchange rates; saving a rate recomputes the TRY price of its listings
+    """
+    list_display = ('currency', 'rate', 'updated_date')
+    list_editable = ('rate',)
+    readonly_fields = ('updated_date',)
+    
+    actions = ['recompute_prices']
+    
+    def recompute_prices(self, request, queryset):
+        from .exchange_rates import recompute_price_try
+        updated = recompute_price_try([rate.currency for rate in queryset])
+        self.message_user(request, f'{updated} ilanın TL fiyatı yeniden hesaplandı.')
+    recompute_prices.short_description = 'Seçili kurların ilan fiyatlarını yeniden hesapla'
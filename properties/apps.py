@@ -1,5 +1,7 @@
 from django.apps import AppConfig
 import logging
+import os
+import sys
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +16,29 @@ class PropertiesConfig(AppConfig):
         """
         # Import signals to register them
         import properties.signals  # noqa
+        import properties.db_instrumentation  # noqa
+        
+        # Management commands (migrate, collectstatic, ...) never run jobs;
+        # the dedicated `manage.py run_scheduler` process starts it itself
+        if not self._should_start_scheduler():
+            return
         
         # Import here to avoid AppRegistryNotReady error
         from properties.scheduler import start_scheduler
         
-        # Start the scheduler (only once)
+        # Start the scheduler (only once); jobs run only in the leader process
         try:
             start_scheduler()
             logger.info("Newsletter scheduler initialized successfully")
         except Exception as e:
             logger.error(f"Failed to start newsletter scheduler: {str(e)}")
+    
+    @staticmethod
+    def _should_start_scheduler():
+        from django.conf import settings
+        
+        if not getattr(settings, 'SCHEDULER_AUTOSTART', True):
+            return False
+        if os.path.basename(sys.argv[0]) == 'manage.py':
+            return sys.argv[1:2] == ['runserver']
+        return True
@@ -0,0 +1,318 @@
+"""
+Search-as-you-type suggestions for the listing search boxes
+
+Every worker process keeps an in-memory prefix index (see PrefixIndex) of
+the locations and titles of active listings, so the autocomplete endpoint
+answers from memory without touching the database. Each word start of a
+suggestion is indexed (``istanbul`` finds "Kadıköy, İstanbul"), under its
+Turkish case folding (İ -> i, I -> ı) and under an ASCII spelling, so
+"kadikoy" typed on a keyboard without Turkish letters finds it too.
+
+The process that saves a Listing updates its index incrementally (signals)
+and increments a shared version counter; the other workers notice the new version on
+their next lookup and rebuild in a background thread while still answering
+from their current index. Only the very first lookup of a process builds
+synchronously (or wsgi.py warms it at boot).
+"""
+import bisect
+import heapq
+import logging
+import re
+import random
+import threading
+from collections import Counter
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'properties:autocomplete_version'
+
+# Shorter prefixes match too much to be useful
+MIN_PREFIX_LENGTH = 2
+# Longer prefixes are matched on their first MAX_KEY_LENGTH characters
+MAX_KEY_LENGTH = 30
+# Ranked results kept per prefix; the cache starts over when full
+MAX_CACHED_RESULTS = 5000
+
+ASCII_MAP = str.maketrans('çğıöşüâîû', 'cgiosuaiu')
+WORD_RE = re.compile(r'\w+')
+
+
+def turkish_fold(text):
+    """Lowercase with Turkish dotted/dotless i rules"""
+    return text.replace('I', 'ı').replace('İ', 'i').lower().strip()
+
+
+def ascii_fold(text):
+    return turkish_fold(text).translate(ASCII_MAP)
+
+
+def index_keys(text):
+    """
+    Keys a suggestion is reachable by: the text from each word start, folded
+    both ways and cut to MAX_KEY_LENGTH
+    """
+    folded = turkish_fold(text)
+    keys = set()
+    for match in WORD_RE.finditer(folded):
+        suffix = folded[match.start():match.start() + MAX_KEY_LENGTH]
+        keys.add(suffix)
+        keys.add(suffix.translate(ASCII_MAP))
+    return keys
+
+
+class PrefixIndex:
+    """
+    Suggestions of several kinds ('location', 'title'), each an id with a
+    text and a weight (number of listings), reachable by the prefixes of
+    their keys
+
+    The keys of each kind are kept in one sorted list searched by bisection:
+    a flattened trie with the same prefix lookups but a fraction of the
+    memory of one node per character. Ranked results are cached per prefix
+    and kept up to date by add()/remove().
+    """
+
+    def __init__(self):
+        self.keys = {}  # kind -> sorted [(key, id)]
+        self.texts = {}  # kind -> {id: text}
+        self.weights = {}  # kind -> Counter of ids
+        self._rank = {}  # kind -> {id: (-weight, folded text)}, the result order
+        self._results = {}  # (kind, folded prefix, limit) -> ranked ids
+
+    @classmethod
+    def build(cls, entries):
+        """Index of (kind, id, text) entries, each adding a weight of 1, sorted once"""
+        index = cls()
+        for kind, ident, text in entries:
+            texts, keys, weights = index._kind(kind)
+            if ident not in texts:
+                texts[ident] = text
+                keys.extend((key, ident) for key in index_keys(text))
+            weights[ident] += 1
+        for kind, keys in index.keys.items():
+            keys.sort()
+            texts, rank = index.texts[kind], index._rank[kind]
+            for ident, weight in index.weights[kind].items():
+                rank[ident] = (-weight, turkish_fold(texts[ident]))
+        return index
+
+    def _kind(self, kind):
+        if kind not in self.texts:
+            self.texts[kind], self.keys[kind], self.weights[kind], self._rank[kind] = {}, [], Counter(), {}
+        return self.texts[kind], self.keys[kind], self.weights[kind]
+
+    def _cached_for(self, kind, ident):
+        """Cache keys of the results the suggestion belongs to"""
+        keys = index_keys(self.texts[kind][ident])
+        return [
+            cache_key for cache_key in self._results
+            if cache_key[0] == kind and any(
+                key.startswith(cache_key[1]) or key.startswith(cache_key[1].translate(ASCII_MAP)) for key in keys
+            )
+        ]
+
+    def add(self, kind, ident, text, weight=1):
+        texts, keys, weights = self._kind(kind)
+        if ident not in texts:
+            texts[ident] = text
+            for key in index_keys(text):
+                bisect.insort(keys, (key, ident))
+        weights[ident] += weight
+        rank = self._rank[kind]
+        rank[ident] = (-weights[ident], turkish_fold(text))
+        # A suggestion only moves up: merge it into the cached results
+        for cache_key in self._cached_for(kind, ident):
+            results = set(self._results[cache_key]) | {ident}
+            self._results[cache_key] = heapq.nsmallest(cache_key[2], results, key=rank.__getitem__)
+
+    def remove(self, kind, ident, weight=1):
+        texts = self.texts.get(kind, {})
+        if ident not in texts:
+            return
+        # Whatever ranked below it may move up: drop the affected results
+        for cache_key in self._cached_for(kind, ident):
+            if ident in self._results[cache_key]:
+                del self._results[cache_key]
+        weights, rank = self.weights[kind], self._rank[kind]
+        weights[ident] -= weight
+        rank[ident] = (-weights[ident], rank[ident][1])
+        if weights[ident] <= 0:
+            keys = self.keys[kind]
+            for key in index_keys(texts[ident]):
+                position = bisect.bisect_left(keys, (key, ident))
+                if position < len(keys) and keys[position] == (key, ident):
+                    del keys[position]
+            del weights[ident], rank[ident], texts[ident]
+
+    def _matches(self, kind, prefix):
+        keys = self.keys.get(kind, ())
+        start = bisect.bisect_left(keys, (prefix,))
+        end = bisect.bisect_left(keys, (prefix + '\U0010ffff',), start)
+        return set(map(itemgetter(1), keys[start:end]))
+
+    def search(self, prefix, kind, limit):
+        """Ids of the best suggestions of one kind for a prefix (folded either way)"""
+        folded = turkish_fold(prefix)[:MAX_KEY_LENGTH]
+        cache_key = (kind, folded, limit)
+        results = self._results.get(cache_key)
+        if results is None:
+            matches = self._matches(kind, folded) | self._matches(kind, folded.translate(ASCII_MAP))
+            if len(self._results) >= MAX_CACHED_RESULTS:
+                self._results.clear()
+            results = heapq.nsmallest(limit, matches, key=self._rank.get(kind, {}).__getitem__)
+            self._results[cache_key] = results
+        return results
+
+
+class AutocompleteIndex:
+    """Process-local index of active listing locations and titles, versioned across workers"""
+
+    def __init__(self):
+        self._index = None
+        self._version = None
+        self._slugs = {}
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def _build(self):
+        from .models import Listing
+
+        version = get_version()
+        rows = list(Listing.objects.filter(is_active=True).values_list('pk', 'title', 'slug', 'location'))
+        index = PrefixIndex.build(
+            entry for pk, title, _, location in rows
+            for entry in (('title', pk, title), ('location', location, location))
+        )
+        slugs = {pk: slug for pk, _, slug, _ in rows}
+        with self._lock:
+            self._index, self._slugs, self._version = index, slugs, version
+        logger.debug(f"Autocomplete index built with {sum(map(len, index.texts.values()))} suggestions")
+
+    def _rebuild_in_background(self):
+        def run():
+            from django.db import close_old_connections
+            try:
+                self._build()
+            except Exception as e:
+                logger.error(f"Error rebuilding the autocomplete index: {str(e)}")
+            finally:
+                self._rebuilding = False
+                close_old_connections()
+
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=run, name='autocomplete-rebuild', daemon=True).start()
+
+    def warm(self):
+        self._build()
+
+    def _current(self):
+        if self._index is None:
+            self._build()
+        elif self._version != get_version():
+            self._rebuild_in_background()
+        return self._index
+
+    def suggest(self, prefix, limit=8):
+        prefix = prefix.strip()
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return {'locations': [], 'titles': []}
+        index = self._current()
+        with self._lock:
+            locations = index.search(prefix, 'location', limit)
+            titles = index.search(prefix, 'title', limit)
+            texts = index.texts
+            return {
+                'locations': [texts['location'][location] for location in locations],
+                'titles': [{'title': texts['title'][pk], 'slug': self._slugs.get(pk)} for pk in titles],
+            }
+
+    def apply_change(self, previous, current):
+        """
+        Incremental update of this process's index for one saved/deleted
+        listing; previous/current are (pk, title, slug, location) of the row
+        while active, or None. Other processes rebuild on the bumped version.
+        """
+        with self._lock:
+            built_version = self._version if self._index is not None else None
+            if self._index is not None:
+                if previous:
+                    pk, _, _, location = previous
+                    self._index.remove('title', pk)
+                    self._index.remove('location', location)
+                    self._slugs.pop(pk, None)
+                if current:
+                    pk, title, slug, location = current
+                    self._index.add('title', pk, title)
+                    self._index.add('location', location, location)
+                    self._slugs[pk] = slug
+            version = bump_version()
+            # Compare-and-set: the index is current only if no other process
+            # bumped since it was built; otherwise it still needs the rebuild
+            if built_version is not None and version == built_version + 1:
+                self._version = version
+
+
+def get_version():
+    """
+    Shared version counter; starts at a random value so a counter lost with
+    the cache does not restart at a version some process already holds
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, random.getrandbits(48), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Atomically increment the shared version and return the new value"""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:  # not set yet, or evicted
+        get_version()
+        return cache.incr(VERSION_KEY)
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+INDEXED_FIELDS = ('pk', 'is_active', 'title', 'slug', 'location')
+
+
+def _indexed(values):
+    """(pk, title, slug, location) of an active listing row, or None"""
+    if not values or not values['is_active']:
+        return None
+    return values['pk'], values['title'], values['slug'], values['location']
+
+
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """pre_save: the stored row, to remove its old title/location from the index"""
+    if raw or instance._state.adding or instance.pk is None:
+        instance._autocomplete_previous = None
+        return
+    instance._autocomplete_previous = _indexed(
+        sender._default_manager.filter(pk=instance.pk).values(*INDEXED_FIELDS).first()
+    )
+
+
+def track_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_autocomplete_previous', None)
+    current = _indexed({field: getattr(instance, field) for field in INDEXED_FIELDS})
+    if previous != current:
+        transaction.on_commit(lambda: autocomplete_index.apply_change(previous, current))
+
+
+def track_delete(sender, instance, **kwargs):
+    previous = _indexed({field: getattr(instance, field) for field in INDEXED_FIELDS})
+    if previous:
+        transaction.on_commit(lambda: autocomplete_index.apply_change(previous, None))
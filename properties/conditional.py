@@ -0,0 +1,119 @@
+"""
+Cheap validators for conditional GET on public pages
+
+Views are wrapped with Django's ``condition`` decorator, so a request whose
+If-None-Match still matches gets a 304 before the view builds its context.
+The ETags are derived from the shared content version (bumped by the signals
+whenever public content changes, see signals.py), a release token and, where
+it is cheap, row timestamps. There is no Last-Modified: a row timestamp misses
+settings, related listing and exchange rate changes, so If-Modified-Since
+alone would answer 304 for a changed page.
+
+Responses that depend on the visitor are never validated: logged-in users
+and requests with pending flash messages always get a full render.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from .snapshot import get_settings_version
+
+_release_token = None
+
+
+def release_token():
+    """
+    Identifies the deployed code so a deploy changes every ETag
+    RELEASE_VERSION if set, otherwise the newest template modification time
+    """
+    global _release_token
+    if _release_token is None:
+        token = os.getenv('RELEASE_VERSION', '')
+        if not token:
+            newest = 0
+            for directory in settings.TEMPLATES[0]['DIRS']:
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+            token = str(int(newest))
+        _release_token = token
+    return _release_token
+
+
+def is_cacheable(request):
+    """False for responses that are specific to the visitor"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return False
+    return not len(messages.get_messages(request))
+
+
+def make_etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _memoize(request, key, compute):
+    """Compute the validators once per request"""
+    cache = request.__dict__.setdefault('_conditional_validators', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def home_etag(request):
+    if not is_cacheable(request):
+        return None
+    return make_etag('home', get_settings_version(), release_token())
+
+
+def _listings_validators(request):
+    from .views import filter_listings
+
+    def compute():
+        listings_list, _, _, _ = filter_listings(request)
+        # Strip the ordering (search ranking) so this stays a plain aggregate
+        return listings_list.order_by().aggregate(last_modified=Max('updated_date'))['last_modified']
+    return _memoize(request, 'listings', compute)
+
+
+def listings_etag(request):
+    if not is_cacheable(request):
+        return None
+    last_modified = _listings_validators(request)
+    return make_etag('listings', request.GET.urlencode(), last_modified, get_settings_version(), release_token())
+
+
+def _listing_detail_validators(request, slug):
+    from .models import Listing
+
+    def compute():
+        row = Listing.objects.filter(slug=slug, is_active=True).aggregate(
+            found=Count('pk', distinct=True),
+            updated_date=Max('updated_date'),
+            related_updated_date=Max('related_updated_date'),
+            images_modified=Max('images__uploaded_at'),
+            image_count=Count('images'),
+        )
+        return row if row['found'] else None
+    return _memoize(request, ('listing_detail', slug), compute)
+
+
+def listing_detail_etag(request, slug):
+    if not is_cacheable(request):
+        return None
+    row = _listing_detail_validators(request, slug)
+    if row is None:
+        return None  # 404
+    return make_etag(
+        'listing', slug, row['updated_date'], row['related_updated_date'], row['images_modified'], row['image_count'],
+        get_settings_version(), release_token(),
+    )
+
+
+home_condition = condition(etag_func=home_etag)
+listings_condition = condition(etag_func=listings_etag)
+listing_detail_condition = condition(etag_func=listing_detail_etag)
@@ -0,0 +1,176 @@
+"""
+Denormalized active counts (ContentStats)
+
+Each tracked model has one 'all' row plus one row per value of its choice
+fields, counting active rows. The signals apply +1/-1 deltas when a row is
+created, deleted, (de)activated or moves to another type/status; bulk
+QuerySet.update() calls go through update_queryset(). reconcile() recomputes
+everything from the source tables and runs from the scheduler.
+
+Readers use get_content_stats(): a single SELECT on a handful of rows,
+served to templates through the settings snapshot.
+"""
+import logging
+from collections import Counter
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F
+
+logger = logging.getLogger(__name__)
+
+# model label -> choice fields counted per value
+TRACKED_MODELS = {
+    'properties.listing': ('property_type', 'status'),
+    'properties.construction': ('status',),
+}
+
+
+def _model_name(model):
+    return model._meta.model_name
+
+
+def _dimensions(model):
+    return TRACKED_MODELS[model._meta.label_lower]
+
+
+def stat_keys(model, values):
+    """ContentStats keys (dimension, value) an active row with these values counts towards"""
+    return [('all', '')] + [(field, values[field]) for field in _dimensions(model)]
+
+
+def apply_deltas(model, deltas):
+    """Add {(dimension, value): delta} to the stored counts"""
+    from .models import ContentStats
+
+    model_name = _model_name(model)
+    for (dimension, value), delta in deltas.items():
+        if not delta:
+            continue
+        updated = ContentStats.objects.filter(
+            model_name=model_name, dimension=dimension, value=value
+        ).update(count=F('count') + delta)
+        if not updated:
+            stat, created = ContentStats.objects.get_or_create(
+                model_name=model_name, dimension=dimension, value=value, defaults={'count': delta}
+            )
+            if not created:
+                ContentStats.objects.filter(pk=stat.pk).update(count=F('count') + delta)
+
+
+def _row_values(model, instance):
+    return {field: getattr(instance, field) for field in ('is_active',) + _dimensions(model)}
+
+
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """pre_save: load the stored state so post_save can compute the delta"""
+    if raw or instance._state.adding or instance.pk is None:
+        instance._content_stats_previous = None
+        return
+    instance._content_stats_previous = (
+        sender._default_manager.filter(pk=instance.pk).values('is_active', *_dimensions(sender)).first()
+    )
+
+
+def track_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = Counter()
+    previous = getattr(instance, '_content_stats_previous', None)
+    if previous and previous['is_active']:
+        deltas.subtract(stat_keys(sender, previous))
+    current = _row_values(sender, instance)
+    if current['is_active']:
+        deltas.update(stat_keys(sender, current))
+    apply_deltas(sender, deltas)
+
+
+def track_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        apply_deltas(sender, Counter({key: -1 for key in stat_keys(sender, _row_values(sender, instance))}))
+
+
+def _grouped_counts(queryset):
+    """Counter of stat keys over the active rows of a queryset (one GROUP BY)"""
+    model = queryset.model
+    counts = Counter()
+    rows = queryset.filter(is_active=True).order_by().values(*_dimensions(model)).annotate(total=Count('pk'))
+    for row in rows:
+        for key in stat_keys(model, row):
+            counts[key] += row['total']
+    return counts
+
+
+def update_queryset(queryset, **changes):
+    """
+    QuerySet.update() that keeps ContentStats right (update() sends no
+    signals); also invalidates the settings snapshot, cached pages and the
+    autocomplete indexes
+    """
+    from . import autocomplete, page_cache
+    from .snapshot import bump_settings_version
+
+    model = queryset.model
+    with transaction.atomic():
+        pks = list(queryset.select_for_update().values_list('pk', flat=True))
+        affected = model._default_manager.filter(pk__in=pks)
+        before = _grouped_counts(affected)
+        updated = affected.update(**changes)
+        deltas = _grouped_counts(affected)
+        deltas.subtract(before)
+        apply_deltas(model, deltas)
+    transaction.on_commit(bump_settings_version)
+    transaction.on_commit(lambda: page_cache.bump('site'))
+    transaction.on_commit(autocomplete.bump_version)
+    return updated
+
+
+def reconcile(labels=None):
+    """
+    Recompute the counts from the source tables and fix drifted rows
+    Returns the number of corrected rows.
+    """
+    from .models import ContentStats
+
+    corrected = 0
+    for label in labels or TRACKED_MODELS:
+        model = apps.get_model(label)
+        model_name = _model_name(model)
+        with transaction.atomic():
+            actual = _grouped_counts(model._default_manager.all())
+            actual.setdefault(('all', ''), 0)
+            stored = {
+                (stat.dimension, stat.value): stat
+                for stat in ContentStats.objects.select_for_update().filter(model_name=model_name)
+            }
+            for key in set(actual) | set(stored):
+                count = actual.get(key, 0)
+                stat = stored.get(key)
+                if stat is None:
+                    ContentStats.objects.create(model_name=model_name, dimension=key[0], value=key[1], count=count)
+                elif stat.count != count:
+                    logger.warning(f"ContentStats drift for {model_name} {key}: stored {stat.count}, actual {count}")
+                    ContentStats.objects.filter(pk=stat.pk).update(count=count)
+                else:
+                    continue
+                corrected += 1
+    return corrected
+
+
+def get_content_stats():
+    """
+    {'listing': {'all': n, 'property_type': {...}, 'status': {...}}, 'construction': {...}}
+    """
+    from .models import ContentStats
+
+    stats = {}
+    for label, dimensions in TRACKED_MODELS.items():
+        stats[label.split('.')[1]] = {'all': 0, **{dimension: {} for dimension in dimensions}}
+    for model_name, dimension, value, count in ContentStats.objects.values_list('model_name', 'dimension', 'value', 'count'):
+        if model_name not in stats:
+            continue
+        if dimension == 'all':
+            stats[model_name]['all'] = count
+        elif count:
+            stats[model_name].setdefault(dimension, {})[value] = count
+    return stats
@@ -1,34 +1,16 @@
-from .models import About, SiteSettings, PopupSettings, NavigationSettings
-from .models import Listing, Construction
+from django.conf import settings
+
+from .conditional import release_token
+from .snapshot import get_site_snapshot
 
 def about_info(request):
     """
     Context processor to make about information available globally
+    Served from the process-local settings snapshot (see properties.snapshot)
     """
-    try:
-        about_content = About.objects.first()
-    except About.DoesNotExist:
-        about_content = None
-    
-    try:
-        site_settings = SiteSettings.objects.first()
-    except SiteSettings.DoesNotExist:
-        site_settings = None
-    
-    try:
-        popup_settings = PopupSettings.get_settings()
-    except:
-        popup_settings = None
-    
-    try:
-        nav_settings = NavigationSettings.get_settings()
-    except:
-        nav_settings = None
-    
-    # Get counts for listings and constructions
-    listings_count = Listing.objects.filter(is_active=True).count()
-    constructions_count = Construction.objects.filter(is_active=True).count()
-    
+    snapshot = get_site_snapshot()
+    about_content = snapshot.about
+
     # Get template class for body
     template_class = ''
     if about_content and about_content.homepage_template:
@@ -37,10 +19,15 @@ def about_info(request):
         template_class = 'template1-active'  # Default template
     return {
         'about': about_content,
-        'global_site_settings': site_settings,
-        'popup_settings': popup_settings,
-        'nav_settings': nav_settings,
-        'listings_count': listings_count,
-        'constructions_count': constructions_count,
+        'global_site_settings': snapshot.site_settings,
+        'popup_settings': snapshot.popup_settings,
+        'nav_settings': snapshot.nav_settings,
+        'listings_count': snapshot.listings_count,
+        'constructions_count': snapshot.constructions_count,
+        'content_stats': snapshot.content_stats,
         'template_class': template_class,  # Add template class globally
-    }
\ No newline at end of file
+        # Key and lifetime of the {% cache %} blocks in base.html; a snapshot
+        # built while the version was moving has no version and is not cached
+        'chrome_version': f'{snapshot.version}-{release_token()}',
+        'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT if snapshot.version else 0,
+    }
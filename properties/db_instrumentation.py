@@ -0,0 +1,65 @@
+"""
+Database connection instrumentation
+
+With CONN_MAX_AGE a worker keeps its connection across requests. These
+receivers record, per connection, when it was opened and how many requests
+it has served, plus the number of connections opened by this process, so
+connection churn is visible (X-DB-Connection header, see
+DBConnectionStatsMiddleware, and the log).
+"""
+import logging
+import threading
+import time
+
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_opened = {}  # alias -> connections opened by this process
+_opened_lock = threading.Lock()
+
+
+@receiver(connection_created, dispatch_uid='db_instrumentation_connection_created')
+def track_connection(sender, connection, **kwargs):
+    with _opened_lock:
+        _opened[connection.alias] = _opened.get(connection.alias, 0) + 1
+        opened = _opened[connection.alias]
+    connection.instrumentation = {'opened_at': time.monotonic(), 'requests': 0}
+    logger.debug(
+        f"Opened database connection '{connection.alias}' "
+        f"(#{opened} in this process, CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']})"
+    )
+
+
+@receiver(request_finished, dispatch_uid='db_instrumentation_request_finished')
+def count_request(sender, **kwargs):
+    """
+    Runs after Django's close_old_connections, so only connections that stay
+    open for the next request are counted
+    """
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None and hasattr(connection, 'instrumentation'):
+            connection.instrumentation['requests'] += 1
+
+
+def connection_stats(alias='default'):
+    """
+    Age in seconds and completed requests of this thread's connection (None
+    while it is closed) and the number of connections opened by the process
+    """
+    connection = connections[alias]
+    stats = {
+        'alias': alias,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'opened': _opened.get(alias, 0),
+        'age': None,
+        'requests': None,
+    }
+    if connection.connection is not None and hasattr(connection, 'instrumentation'):
+        stats['age'] = time.monotonic() - connection.instrumentation['opened_at']
+        stats['requests'] = connection.instrumentation['requests']
+    return stats
@@ -0,0 +1,82 @@
+"""
+Read replica routing for public pages
+
+Views wrapped with ``replica_reads`` run their GET/HEAD queries against the
+DB_READ_REPLICA alias; everything else (writes, the admin, logged-in users,
+background jobs) stays on the primary. After a visitor submits a form the
+response sets a short-lived cookie (ReplicaStickinessMiddleware) and their
+reads stay on the primary until it expires, so they see their own write even
+while the replica lags.
+
+Without a replica configured in DATABASES the router does nothing.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+_use_replica = ContextVar('use_replica', default=False)
+
+STICKY_COOKIE = 'db_primary'
+
+
+def replica_alias():
+    alias = getattr(settings, 'DB_READ_REPLICA', 'replica')
+    return alias if alias in connections.settings else None
+
+
+@contextmanager
+def replica_reads_enabled(enabled=True):
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def use_primary():
+    """Force primary reads inside a replica-routed view"""
+    return replica_reads_enabled(False)
+
+
+def wants_primary(request):
+    if request.method not in ('GET', 'HEAD') or STICKY_COOKIE in request.COOKIES:
+        return True
+    # Staff editing content must see it; only requests with a session can be logged in
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return request.user.is_authenticated
+    return False
+
+
+def replica_reads(view):
+    """Route the view's reads to the replica (see module docstring)"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if replica_alias() is None or wants_primary(request):
+            return view(request, *args, **kwargs)
+        with replica_reads_enabled():
+            response = view(request, *args, **kwargs)
+            # Template responses (e.g. the sitemap) query while rendering
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return None
+        # Reads inside a transaction on the primary must see its writes
+        if connections['default'].in_atomic_block:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
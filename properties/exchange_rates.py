@@ -0,0 +1,108 @@
+"""
+Currency-normalized listing prices
+
+Listing prices are stored in their own currency. Listing.price_try holds the
+Türk Lirası value from the ExchangeRate table so range filters and sorting
+compare one unit on an indexed column. Listing.save() sets it for a single
+row; when rates change every affected listing is recomputed by ONE UPDATE
+joining the rate table (a correlated subquery on the rate, so the same
+statement also runs on SQLite) instead of loading rows into Python.
+"""
+import csv
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, When
+
+from . import page_cache
+from .models import ExchangeRate, Listing
+from .snapshot import bump_settings_version
+
+logger = logging.getLogger(__name__)
+
+_deferred = ContextVar('exchange_rates_deferred', default=False)
+
+
+def price_try_expression():
+    """price_try of each row, computed in the database from its currency's rate"""
+    rate = Subquery(ExchangeRate.objects.filter(currency=OuterRef('currency')).values('rate')[:1])
+    return Case(
+        When(currency=ExchangeRate.BASE_CURRENCY, then=F('price')),
+        default=ExpressionWrapper(F('price') * rate, output_field=DecimalField(max_digits=18, decimal_places=2)),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+
+
+def recompute_price_try(currencies=None):
+    """Recompute price_try of the listings in the given currencies (all if None) in one UPDATE"""
+    listings = Listing.objects.all()
+    if currencies is not None:
+        listings = listings.filter(currency__in=currencies)
+    updated = listings.update(price_try=price_try_expression())
+    # Price sorted/filtered listings pages and facet counts change; update()
+    # leaves updated_date alone, so the ETags need the new settings version.
+    # Both after the commit (load_rates runs this inside its transaction)
+    transaction.on_commit(lambda: page_cache.bump('listings'))
+    transaction.on_commit(bump_settings_version)
+    logger.info(f"Recomputed price_try of {updated} listing(s)")
+    return updated
+
+
+def rate_changed(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete of ExchangeRate"""
+    if raw or _deferred.get():
+        return
+    recompute_price_try([instance.currency])
+
+
+@contextmanager
+def _recompute_deferred():
+    """Save several rates without one UPDATE per rate"""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def parse_rates_file(path):
+    """
+    {currency: Decimal rate} from a JSON object ({"USD": "41.25", ...}) or a
+    CSV file with currency,rate rows
+    """
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            items = json.load(f).items()
+        else:
+            items = [row[:2] for row in csv.reader(f) if len(row) >= 2 and not row[0].startswith('#')]
+
+    valid_currencies = dict(Listing.CURRENCY_CHOICES)
+    rates = {}
+    for currency, rate in items:
+        currency = currency.strip().upper()
+        if currency not in valid_currencies or currency == ExchangeRate.BASE_CURRENCY:
+            raise ValueError(f'Unknown currency: {currency}')
+        try:
+            rates[currency] = Decimal(str(rate).strip())
+        except InvalidOperation:
+            raise ValueError(f'Invalid rate for {currency}: {rate}')
+        if rates[currency] <= 0:
+            raise ValueError(f'Invalid rate for {currency}: {rate}')
+    return rates
+
+
+def load_rates(rates):
+    """Store {currency: rate} and recompute price_try once; returns the changed currencies"""
+    stored = dict(ExchangeRate.objects.values_list('currency', 'rate'))
+    changed = [currency for currency, rate in rates.items() if stored.get(currency) != rate]
+    with transaction.atomic():
+        with _recompute_deferred():
+            for currency in changed:
+                ExchangeRate.objects.update_or_create(currency=currency, defaults={'rate': rates[currency]})
+        if changed:
+            recompute_price_try(changed)
+    return changed
@@ -0,0 +1,220 @@
+"""
+Faceted listing search
+
+Every facet (type, status, currency, bedroom/price/area bands, location)
+is a GET parameter with a single selected value. Counts are disjunctive:
+the count shown for an option is the number of results if that option were
+picked while the other facets stay as they are.
+
+All facets are counted in ONE query: a small GROUP BY on its own key per
+facet, over the listings matching the other selections, combined with UNION
+ALL (grouping by every key at once gave about one group per listing, the
+locations being nearly unique). The computed counts are cached per normalized filter state and
+versioned with the page cache groups the signals bump on listing changes.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+from . import page_cache
+from .models import Listing
+from .search import search_listings
+
+FACET_KEY_PREFIX = 'properties:facets'
+
+Facet = namedtuple('Facet', ['param', 'field', 'label', 'choices', 'bands'])
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+BEDROOM_BANDS = (
+    ('0', 'Stüdyo', None, 1),
+    ('1', '1 Oda', 1, 2),
+    ('2', '2 Oda', 2, 3),
+    ('3', '3 Oda', 3, 4),
+    ('4+', '4+ Oda', 4, None),
+)
+
+# In TRY (Listing.price_try), so listings in every currency are banded alike
+PRICE_BANDS = (
+    ('0-1m', '1 Milyon ₺ altı', None, 1_000_000),
+    ('1m-3m', '1 - 3 Milyon ₺', 1_000_000, 3_000_000),
+    ('3m-5m', '3 - 5 Milyon ₺', 3_000_000, 5_000_000),
+    ('5m-10m', '5 - 10 Milyon ₺', 5_000_000, 10_000_000),
+    ('10m+', '10 Milyon ₺ üzeri', 10_000_000, None),
+)
+
+AREA_BANDS = (
+    ('0-100', '100 m² altı', None, 100),
+    ('100-200', '100 - 200 m²', 100, 200),
+    ('200-500', '200 - 500 m²', 200, 500),
+    ('500+', '500 m² üzeri', 500, None),
+)
+
+FACETS = (
+    Facet('type', 'property_type', 'Emlak Tipi', Listing.PROPERTY_TYPES, None),
+    Facet('status', 'status', 'Durum', Listing.STATUS_CHOICES, None),
+    Facet('currency', 'currency', 'Para Birimi', Listing.CURRENCY_CHOICES, None),
+    Facet('bedrooms', 'bedrooms', 'Oda Sayısı', None, BEDROOM_BANDS),
+    Facet('price', 'price_try', 'Fiyat', None, PRICE_BANDS),
+    Facet('area', 'area', 'Alan', None, AREA_BANDS),
+    Facet('location', 'location', 'Konum', None, None),
+)
+
+# Most common locations listed in the location facet
+LOCATION_FACET_LIMIT = 10
+
+
+def _band_q(field, lower, upper):
+    q = Q()
+    if lower is not None:
+        q &= Q(**{f'{field}__gte': lower})
+    if upper is not None:
+        q &= Q(**{f'{field}__lt': upper})
+    return q
+
+
+def band_index(bands, value):
+    """Position of the band a value falls in, or None"""
+    if value is None:
+        return None
+    for position, (_, _, lower, upper) in enumerate(bands):
+        if (lower is None or value >= lower) and (upper is None or value < upper):
+            return position
+    return None
+
+
+def _facet_expression(facet):
+    """Expression giving a listing's option key for the facet"""
+    if facet.bands:
+        return Case(
+            *(When(_band_q(facet.field, lower, upper), then=Value(key)) for key, _, lower, upper in facet.bands),
+            default=Value(''),
+            output_field=CharField(),
+        )
+    return F(facet.field)
+
+
+def _options(facet):
+    if facet.bands:
+        return [(key, label) for key, label, _, _ in facet.bands]
+    return list(facet.choices or ())
+
+
+def selected_facets(request):
+    """{param: value} of the valid facet selections in the query string"""
+    selected = {}
+    for facet in FACETS:
+        value = request.GET.get(facet.param, '').strip()
+        if not value:
+            continue
+        if facet.choices or facet.bands:
+            if value not in dict(_options(facet)):
+                continue
+        selected[facet.param] = value
+    return selected
+
+
+def apply_facets(queryset, selected):
+    """Filter a Listing queryset by the selected facet options"""
+    for facet in FACETS:
+        value = selected.get(facet.param)
+        if not value:
+            continue
+        if facet.bands:
+            _, _, lower, upper = next(band for band in facet.bands if band[0] == value)
+            queryset = queryset.filter(_band_q(facet.field, lower, upper))
+        else:
+            queryset = queryset.filter(**{facet.field: value})
+    return queryset
+
+
+def _facet_key(search_query, selected, range_lookups):
+    versions = page_cache.get_versions(['site', 'listings'])
+    raw = '|'.join([
+        versions['site'], versions['listings'], search_query.strip().lower(),
+        '&'.join(f'{param}={value}' for param, value in sorted(selected.items())),
+        '&'.join(f'{lookup}={value}' for lookup, value in sorted(range_lookups.items())),
+    ])
+    return f'{FACET_KEY_PREFIX}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _compute_counts(search_query, selected, range_lookups):
+    queryset = search_listings(Listing.objects.filter(is_active=True, **range_lookups), search_query).order_by()
+    # One GROUP BY per facet over the listings matching the other selections
+    # (a facet's own selection does not narrow its counts)
+    parts = [
+        apply_facets(queryset, {param: value for param, value in selected.items() if param != facet.param})
+        .annotate(facet=Value(facet.param, output_field=CharField()), option=_facet_expression(facet))
+        .values('facet', 'option')
+        .annotate(total=Count('pk'))
+        for facet in FACETS
+    ]
+    counts = {facet.param: {} for facet in FACETS}
+    for group in parts[0].union(*parts[1:], all=True):
+        # Rows outside every band (e.g. no TRY price yet) are not counted
+        if group['option'] != '':
+            counts[group['facet']][group['option']] = group['total']
+    return counts
+
+
+def facet_counts(search_query, selected, range_lookups=None):
+    """
+    {param: {option: count}} for the filter state (search, facet selections
+    and the ListingFilterForm range lookups), from the cache or one query
+    """
+    range_lookups = range_lookups or {}
+    key = _facet_key(search_query, selected, range_lookups)
+    counts = cache.get(key)
+    if counts is None:
+        counts = _compute_counts(search_query, selected, range_lookups)
+        cache.set(key, counts, getattr(settings, 'FACET_CACHE_TIMEOUT', 3600))
+    return counts
+
+
+def build_facets(request, search_query, selected, range_lookups=None):
+    """
+    Facets for the template by param: label, per option counts, total and the
+    options to list with their selected state and the URL that toggles them
+    """
+    counts = facet_counts(search_query, selected, range_lookups)
+    facets = {}
+    for facet in FACETS:
+        option_counts = counts.get(facet.param, {})
+        if facet.choices or facet.bands:
+            options = _options(facet)
+        else:
+            values = sorted(option_counts, key=lambda value: (-option_counts[value], value))[:LOCATION_FACET_LIMIT]
+            if selected.get(facet.param) and selected[facet.param] not in values:
+                values.append(selected[facet.param])
+            options = [(value, value) for value in values]
+
+        items = []
+        for value, label in options:
+            count = option_counts.get(value, 0)
+            is_selected = selected.get(facet.param) == value
+            if not count and not is_selected:
+                continue
+            query = request.GET.copy()
+            for param in ('page', 'cursor'):
+                query.pop(param, None)
+            if is_selected:
+                query.pop(facet.param, None)
+            else:
+                query[facet.param] = value
+            items.append({
+                'value': value,
+                'label': label,
+                'count': count,
+                'selected': is_selected,
+                'url': f'?{query.urlencode()}',
+            })
+        facets[facet.param] = {
+            'param': facet.param,
+            'label': facet.label,
+            'counts': option_counts,
+            'options': items,
+            'total': sum(option_counts.values()),
+        }
+    return facets
@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import F
 from .models import ContactMessage, NewsletterSubscriber, Newsletter, ListingImage, ConstructionImage, ReferenceImage
 
 
@@ -156,3 +157,91 @@ class ReferenceImageUploadForm(forms.Form):
         help_text='Birden fazla resim seçebilirsiniz (Ctrl/Cmd tuşuna basılı tutarak)',
         required=False
     )
+
+
+def _range_input(placeholder):
+    return forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': placeholder})
+
+
+class ListingFilterForm(forms.Form):
+    """
+    Min/max range filters and sort order of the listings page (GET)
+    Invalid values are dropped from cleaned_data and do not filter.
+    """
+    RANGE_FIELDS = (
+        ('price', 'Fiyat (₺)'),
+        ('area', 'Alan (m²)'),
+        ('bedrooms', 'Yatak Odası'),
+        ('bathrooms', 'Banyo'),
+        ('floor', 'Kat'),
+        ('building_age', 'Bina Yaşı'),
+    )
+    
+    SORT_CHOICES = (
+        ('newest', 'En Yeni'),
+        ('price_asc', 'Fiyat (Artan)'),
+        ('price_desc', 'Fiyat (Azalan)'),
+        ('area_asc', 'Alan (Artan)'),
+        ('area_desc', 'Alan (Azalan)'),
+    )
+    
+    # Prices are compared in TRY (Listing.price_try, see properties.exchange_rates)
+    RANGE_COLUMNS = {'price': 'price_try'}
+    
+    SORT_ORDERINGS = {
+        'newest': ('-created_date', '-id'),
+        # Listings whose currency has no exchange rate come last
+        'price_asc': (F('price_try').asc(nulls_last=True), 'id'),
+        'price_desc': (F('price_try').desc(nulls_last=True), '-id'),
+        'area_asc': ('area', 'id'),
+        'area_desc': ('-area', '-id'),
+    }
+    
+    min_price = forms.DecimalField(required=False, min_value=0, max_digits=18, decimal_places=2, widget=_range_input('Min'))
+    max_price = forms.DecimalField(required=False, min_value=0, max_digits=18, decimal_places=2, widget=_range_input('Maks'))
+    min_area = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2, widget=_range_input('Min'))
+    max_area = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2, widget=_range_input('Maks'))
+    min_bedrooms = forms.IntegerField(required=False, min_value=0, max_value=100, widget=_range_input('Min'))
+    max_bedrooms = forms.IntegerField(required=False, min_value=0, max_value=100, widget=_range_input('Maks'))
+    min_bathrooms = forms.IntegerField(required=False, min_value=0, max_value=100, widget=_range_input('Min'))
+    max_bathrooms = forms.IntegerField(required=False, min_value=0, max_value=100, widget=_range_input('Maks'))
+    # Basement floors are negative
+    min_floor = forms.IntegerField(required=False, min_value=-10, max_value=300, widget=_range_input('Min'))
+    max_floor = forms.IntegerField(required=False, min_value=-10, max_value=300, widget=_range_input('Maks'))
+    min_building_age = forms.IntegerField(required=False, min_value=0, max_value=500, widget=_range_input('Min'))
+    max_building_age = forms.IntegerField(required=False, min_value=0, max_value=500, widget=_range_input('Maks'))
+    
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, _ in self.RANGE_FIELDS:
+            low, high = cleaned_data.get(f'min_{field}'), cleaned_data.get(f'max_{field}')
+            if low is not None and high is not None and low > high:
+                self.add_error(f'max_{field}', 'En yüksek değer en düşük değerden küçük olamaz.')
+        return cleaned_data
+    
+    def range_pairs(self):
+        """(label, min bound field, max bound field) for the template"""
+        return [(label, self[f'min_{field}'], self[f'max_{field}']) for field, label in self.RANGE_FIELDS]
+    
+    def range_lookups(self):
+        """Queryset lookups of the valid bounds, e.g. {'price_try__gte': Decimal('1000')}"""
+        cleaned_data = getattr(self, 'cleaned_data', {})
+        lookups = {}
+        for field, _ in self.RANGE_FIELDS:
+            column = self.RANGE_COLUMNS.get(field, field)
+            if cleaned_data.get(f'min_{field}') is not None:
+                lookups[f'{column}__gte'] = cleaned_data[f'min_{field}']
+            if cleaned_data.get(f'max_{field}') is not None:
+                lookups[f'{column}__lte'] = cleaned_data[f'max_{field}']
+        return lookups
+    
+    def ordering(self):
+        """Ordering of the selected sort, or None for the default (newest / search rank)"""
+        sort = getattr(self, 'cleaned_data', {}).get('sort')
+        return self.SORT_ORDERINGS[sort] if sort else None
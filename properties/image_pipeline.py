@@ -0,0 +1,287 @@
+"""
+Background image optimization
+
+Uploads are stored as-is by the request. A post_save receiver records an
+ImageProcessingJob for every image field holding a non-WebP file (or, on
+models with an ``image_variants`` manifest, a file without variants), and
+once the transaction commits the job is handed to a dispatcher thread. The
+CPU bound decode/resize/encode runs in a process pool; the dispatcher then
+stores the WebP file and its responsive width variants, swaps them into the
+row (only if the field still points at the original) and deletes the
+original and any superseded variants.
+
+Jobs are durable: anything left 'pending', or 'processing' by a worker that
+died, is picked up by process_pending_jobs() from the scheduler or the
+`process_images` management command.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .utils import encode_variants, encode_webp
+
+logger = logging.getLogger(__name__)
+
+# (app_label.model, field) -> (max_width, max_height, quality)
+IMAGE_SPECS = {
+    ('properties.listing', 'main_image'): (1920, 1080, 85),
+    ('properties.listingimage', 'image'): (1920, 1080, 85),
+    ('properties.construction', 'main_image'): (1920, 1080, 85),
+    ('properties.constructionimage', 'image'): (1920, 1080, 85),
+    ('properties.bannerimage', 'image'): (1920, 1080, 90),  # Higher quality for banner images
+    ('properties.customsection', 'main_image'): (1920, 1080, 85),
+    ('properties.customsection', 'card_image_1'): (800, 600, 85),
+    ('properties.customsection', 'card_image_2'): (800, 600, 85),
+    ('properties.customsection', 'card_image_3'): (800, 600, 85),
+    ('properties.referenceimage', 'image'): (1920, 1080, 85),
+    ('properties.seosettings', 'og_image'): (1200, 630, 90),  # Standard OG image size
+    ('properties.sitesettings', 'logo'): (500, 500, 90),  # Favicon (.ico) is never converted
+}
+
+# Models whose image fields get responsive variants listed in image_variants
+VARIANT_MODELS = {
+    'properties.listing', 'properties.listingimage', 'properties.construction',
+    'properties.bannerimage', 'properties.referenceimage', 'properties.customsection',
+}
+
+MAX_ATTEMPTS = 3
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def image_fields(model):
+    """Image fields of a model that are optimized in the background"""
+    label = model._meta.label_lower
+    return [field for (model_label, field) in IMAGE_SPECS if model_label == label]
+
+
+def variant_widths():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 960, 1280, 1920)))
+
+
+def has_variants(model):
+    return model._meta.label_lower in VARIANT_MODELS
+
+
+def needs_processing(instance, field_name):
+    """True if the field holds a file that is not WebP or has no variants yet"""
+    name = getattr(instance, field_name).name
+    if not name:
+        return False
+    if not name.lower().endswith('.webp'):
+        return True
+    if has_variants(type(instance)):
+        entry = (instance.image_variants or {}).get(field_name) or {}
+        return entry.get('source') != name
+    return False
+
+
+def _get_executor(kind):
+    """Lazily created pools; the process pool is per OS process (safe after fork)"""
+    key = (kind, os.getpid())
+    with _executors_lock:
+        if key not in _executors:
+            workers = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+            if kind == 'process':
+                _executors[key] = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _executors[key] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-dispatch')
+        return _executors[key]
+
+
+def _run_cpu(func, *args):
+    """Run CPU bound work in the process pool, or inline when disabled or broken"""
+    if getattr(settings, 'IMAGE_PROCESSING_MODE', 'background') != 'background':
+        return func(*args)
+    try:
+        return _get_executor('process').submit(func, *args).result()
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning(f"Image process pool unavailable, encoding inline: {e}")
+        with _executors_lock:
+            _executors.pop(('process', os.getpid()), None)
+        return func(*args)
+
+
+def enqueue_images(instance, dispatch_jobs=True):
+    """
+    Record jobs for the instance's unprocessed images and dispatch them after
+    commit. Returns the created jobs.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from .models import ImageProcessingJob
+
+    content_type = None
+    jobs = []
+    for field_name in image_fields(type(instance)):
+        if not needs_processing(instance, field_name):
+            continue
+        content_type = content_type or ContentType.objects.get_for_model(instance)
+        job, created = ImageProcessingJob.objects.get_or_create(
+            content_type=content_type,
+            object_id=instance.pk,
+            field_name=field_name,
+            source_name=getattr(instance, field_name).name,
+        )
+        if created:
+            jobs.append(job)
+
+    if jobs and dispatch_jobs:
+        job_ids = [job.pk for job in jobs]
+        transaction.on_commit(lambda: dispatch(job_ids))
+    return jobs
+
+
+def dispatch(job_ids):
+    """Hand jobs to the background dispatcher (or run them now in 'sync' mode)"""
+    if getattr(settings, 'IMAGE_PROCESSING_MODE', 'background') != 'background':
+        for job_id in job_ids:
+            process_job(job_id)
+        return
+    executor = _get_executor('thread')
+    for job_id in job_ids:
+        executor.submit(_process_in_thread, job_id)
+
+
+def _process_in_thread(job_id):
+    try:
+        process_job(job_id)
+    except Exception:
+        logger.exception(f"Image processing job {job_id} crashed")
+    finally:
+        connection.close()
+
+
+def _claim(job_id, stale_before=None):
+    from django.db.models import Q
+    from .models import ImageProcessingJob
+
+    claimable = Q(status='pending')
+    if stale_before is not None:
+        claimable |= Q(status='processing', updated_date__lt=stale_before)
+    return ImageProcessingJob.objects.filter(claimable, pk=job_id).update(
+        status='processing', updated_date=timezone.now()
+    )
+
+
+def process_job(job_id, stale_before=None):
+    """
+    Optimize one image, build its variants and swap them in; returns True
+    when the job is done
+
+    Claimed with a compare-and-set on status so a job is processed by one
+    worker only.
+    """
+    from .models import ImageProcessingJob
+    from .page_cache import invalidate_instance
+    from .snapshot import bump_settings_version
+
+    if not _claim(job_id, stale_before):
+        return False
+    job = ImageProcessingJob.objects.select_related('content_type').get(pk=job_id)
+    model = job.content_type.model_class()
+    max_width, max_height, quality = IMAGE_SPECS[(model._meta.label_lower, job.field_name)]
+    storage = model._meta.get_field(job.field_name).storage
+    base_name = os.path.splitext(job.source_name)[0]
+    converted = not job.source_name.lower().endswith('.webp')
+    created_files = []
+
+    try:
+        with storage.open(job.source_name, 'rb') as original:
+            data = original.read()
+        result_name = job.source_name
+        if converted:
+            data = _run_cpu(encode_webp, data, max_width, max_height, quality)
+            result_name = storage.save(f'{base_name}.webp', ContentFile(data))
+            created_files.append(result_name)
+
+        manifest_entry = None
+        if has_variants(model):
+            width, encoded = _run_cpu(encode_variants, data, variant_widths(), quality)
+            variants = {}
+            for variant_width, variant_data in encoded.items():
+                variants[str(variant_width)] = storage.save(f'{base_name}_{variant_width}w.webp', ContentFile(variant_data))
+                created_files.append(variants[str(variant_width)])
+            manifest_entry = {'source': result_name, 'width': width, 'variants': variants}
+    except Exception as e:
+        for name in created_files:
+            storage.delete(name)
+        job.attempts += 1
+        job.last_error = str(e)
+        job.status = 'failed' if job.attempts >= MAX_ATTEMPTS else 'pending'
+        job.save(update_fields=['attempts', 'last_error', 'status', 'updated_date'])
+        logger.warning(f"Image processing failed for {job.source_name} (attempt {job.attempts}): {e}")
+        return False
+
+    superseded = _swap(model, job, result_name, manifest_entry)
+    if superseded is None:
+        # The field was changed meanwhile; its new file has its own job
+        for name in created_files:
+            storage.delete(name)
+        result_name = ''
+    else:
+        if converted:
+            superseded.append(job.source_name)
+        for name in superseded:
+            if name not in created_files:
+                storage.delete(name)
+        bump_settings_version()
+        # The swap bypasses save(), so drop the pages showing the old files here
+        instance = model._default_manager.filter(pk=job.object_id).first()
+        if instance is not None:
+            invalidate_instance(instance)
+
+    job.status = 'done'
+    job.result_name = result_name
+    job.attempts += 1
+    job.save(update_fields=['status', 'result_name', 'attempts', 'updated_date'])
+    return True
+
+
+def _swap(model, job, result_name, manifest_entry):
+    """
+    Point the field at the processed file and record its variants, only if it
+    still holds the job's source. The row is locked so jobs for other fields
+    of the same object cannot lose each other's manifest entries. Returns the
+    variant files that were superseded, or None if nothing was swapped.
+    """
+    columns = [job.field_name] + (['image_variants'] if manifest_entry is not None else [])
+    with transaction.atomic():
+        row = model._default_manager.select_for_update().filter(pk=job.object_id).values(*columns).first()
+        if row is None or row[job.field_name] != job.source_name:
+            return None
+        updates = {job.field_name: result_name}
+        superseded = []
+        if manifest_entry is not None:
+            manifest = row['image_variants'] or {}
+            previous = manifest.get(job.field_name) or {}
+            superseded = list((previous.get('variants') or {}).values())
+            manifest[job.field_name] = manifest_entry
+            updates['image_variants'] = manifest
+        model._default_manager.filter(pk=job.object_id).update(**updates)
+    return superseded
+
+
+def process_pending_jobs(limit=50):
+    """
+    Process jobs that were never dispatched or whose worker died
+    Returns the number of images optimized.
+    """
+    from django.db.models import Q
+    from .models import ImageProcessingJob
+
+    stale_before = timezone.now() - timedelta(minutes=getattr(settings, 'IMAGE_PROCESSING_STALE_MINUTES', 10))
+    job_ids = list(
+        ImageProcessingJob.objects.filter(
+            Q(status='pending') | Q(status='processing', updated_date__lt=stale_before)
+        ).order_by('updated_date').values_list('pk', flat=True)[:limit]
+    )
+    return sum(1 for job_id in job_ids if process_job(job_id, stale_before))
@@ -0,0 +1,173 @@
+"""
+Outgoing email helpers
+
+Views never talk to SMTP directly: notifications are written to the
+OutboundEmail outbox inside the request and sent later by drain_outbox(),
+which reuses one authenticated connection for a whole batch and retries
+failures with exponential backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+
+
+def get_site_email_connection(site_settings, fail_silently=False):
+    """
+    Return the email backend for site mail
+
+    Uses the SMTP settings from SiteSettings when they are configured and
+    falls back to the project's EMAIL_BACKEND otherwise. Socket operations
+    give up after EMAIL_TIMEOUT seconds, so a stalled server cannot block a
+    sender forever.
+    """
+    if site_settings and site_settings.smtp_username and site_settings.smtp_password:
+        return get_connection(
+            backend='django.core.mail.backends.smtp.EmailBackend',
+            host=site_settings.smtp_host or 'smtp.gmail.com',
+            port=site_settings.smtp_port or 587,
+            username=site_settings.smtp_username,
+            password=site_settings.smtp_password,
+            use_tls=site_settings.smtp_use_tls,
+            timeout=getattr(settings, 'EMAIL_TIMEOUT', None),
+            fail_silently=fail_silently,
+        )
+    return get_connection(fail_silently=fail_silently)
+
+
+def get_from_email(site_settings):
+    """Sender address configured in SiteSettings (None means DEFAULT_FROM_EMAIL)"""
+    if not site_settings:
+        return None
+    return site_settings.email_from or site_settings.smtp_username or site_settings.email or None
+
+
+def get_contact_recipients(site_settings):
+    """Addresses that receive contact form and listing inquiry notifications"""
+    if not site_settings:
+        return []
+    recipients = [email.strip() for email in site_settings.contact_email_recipients.split(',') if email.strip()]
+    if not recipients and site_settings.email:
+        recipients = [site_settings.email]
+    return recipients
+
+
+def queue_email(subject, body, recipients):
+    """Add an email to the outbox; it is sent by the outbox worker"""
+    from .models import OutboundEmail
+
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body=body,
+        recipients=', '.join(recipients),
+    )
+
+
+def queue_contact_notification(site_settings, subject, body):
+    """Queue a notification for the site's contact recipients, if any are configured"""
+    recipients = get_contact_recipients(site_settings)
+    if not recipients:
+        return None
+    return queue_email(subject, body, recipients)
+
+
+def _retry_fields(email, error):
+    """Field values that put a failed email back in the queue (or give up)"""
+    attempts = email.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        return {'status': 'failed', 'attempts': attempts, 'last_error': str(error)}
+    delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return {
+        'status': 'pending', 'attempts': attempts, 'last_error': str(error),
+        'next_attempt_at': timezone.now() + timedelta(seconds=delay),
+    }
+
+
+def _claim_batch(batch_size):
+    """
+    Mark due emails (and stale claims of dead workers) 'sending' in a short
+    transaction; SKIP LOCKED lets several workers claim concurrently
+    """
+    from django.conf import settings
+    from django.db.models import Q
+    from .models import OutboundEmail
+
+    now = timezone.now()
+    stale_before = now - timedelta(minutes=getattr(settings, 'OUTBOX_STALE_MINUTES', 10))
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', claimed_at__lt=stale_before))
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(status='sending', claimed_at=now)
+    for email in batch:
+        email.status, email.claimed_at = 'sending', now
+    return batch
+
+
+def _finish(email, **fields):
+    """
+    Record the result of one claimed email in its own (autocommit) UPDATE;
+    ignored if the claim went stale and another worker took the row over
+    """
+    from .models import OutboundEmail
+
+    return OutboundEmail.objects.filter(pk=email.pk, status='sending', claimed_at=email.claimed_at).update(**fields)
+
+
+def drain_outbox(batch_size=50):
+    """
+    Send due outbox emails over a single connection
+
+    Rows are claimed first ('sending'), then sent outside any transaction,
+    each result committed as soon as it is known: a worker killed mid-batch
+    only leaves its unsent claims, which are retried once stale, and no
+    database transaction stays open during SMTP I/O. Returns the number sent.
+    """
+    from .models import SiteSettings
+
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0
+
+    sent = 0
+    site_settings = SiteSettings.objects.first()
+    from_email = get_from_email(site_settings)
+    connection = get_site_email_connection(site_settings)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Outbox SMTP connection failed: {e}")
+        for email in batch:
+            _finish(email, **_retry_fields(email, e))
+        return 0
+
+    try:
+        for email in batch:
+            try:
+                EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or from_email,
+                    to=email.get_recipient_list(),
+                    connection=connection,
+                ).send()
+            except Exception as e:
+                logger.warning(f"Outbox email {email.pk} failed (attempt {email.attempts + 1}): {e}")
+                _finish(email, **_retry_fields(email, e))
+                continue
+            _finish(email, status='sent', sent_date=timezone.now())
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent
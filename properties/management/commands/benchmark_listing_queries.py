@@ -0,0 +1,126 @@
+"""
+Management command to check the query plans of the listings filters
+
+Seeds a synthetic dataset (200k listings by default) inside a transaction,
+runs the common filter/sort combinations of the listings page through
+views.filter_listings, and prints the plan and median time of the first page,
+of the paginator COUNT and of the (uncached) facet counts for each. The transaction is rolled back, so it
+can run against a copy of the production database without leaving rows.
+
+    python manage.py benchmark_listing_queries --count 200000
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from properties.models import Listing
+
+# Query strings of the listings page, as sent by the filter form
+COMBINATIONS = [
+    'status=sale',
+    'status=sale&min_price=1000000&max_price=3000000',
+    'status=sale&min_price=1000000&max_price=3000000&sort=price_asc',
+    'type=apartment&status=sale&min_price=2000000&max_price=5000000&sort=price_asc',
+    'type=villa&status=sale&sort=price_desc',
+    'status=sale&sort=price_desc',
+    'sort=price_desc',
+    'type=apartment&status=rent&min_area=80&max_area=150&sort=area_desc',
+    'status=sale&min_bedrooms=3&min_bathrooms=2',
+    'type=apartment&status=sale&min_floor=2&max_building_age=10',
+    'min_price=500000&max_price=700000&sort=price_asc',
+    'type=apartment&bedrooms=3&price=1m-3m',
+    'location=Konum 7&status=rent',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Explain and time the listings filter queries on a seeded benchmark dataset (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=200000,
+            help='Synthetic listings to seed',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Timed executions per query',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['count'])
+                for query_string in COMBINATIONS:
+                    self.benchmark(query_string, options['iterations'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Benchmark rows rolled back')
+
+    def seed(self, count):
+        started = time.perf_counter()
+        rng = random.Random(42)
+        types = [code for code, _ in Listing.PROPERTY_TYPES]
+        now = timezone.now()
+        batch = []
+        for i in range(count):
+            price = rng.randint(5, 2000) * 10000
+            batch.append(Listing(
+                title=f'Benchmark İlanı {i}', slug=f'benchmark-ilani-{i}', description='Benchmark',
+                location=f'Konum {i % 200}', property_type=rng.choice(types),
+                status='sale' if rng.random() < 0.7 else 'rent',
+                price=price, price_try=price, area=rng.randint(40, 600),
+                bedrooms=rng.randint(0, 6), bathrooms=rng.randint(1, 4),
+                floor=rng.randint(-1, 30), building_age=rng.randint(0, 50),
+                is_active=rng.random() < 0.9, created_date=now - timedelta(minutes=i),
+                main_image='listings/seed.webp',
+            ))
+            if len(batch) == 5000:
+                Listing.objects.bulk_create(batch)
+                batch = []
+        Listing.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE properties_listing' if connection.vendor == 'postgresql' else 'ANALYZE')
+        self.stdout.write(f'Seeded {count} listings in {time.perf_counter() - started:.1f}s')
+
+    def benchmark(self, query_string, iterations):
+        from properties.facets import _compute_counts
+        from properties.views import filter_listings
+
+        request = RequestFactory().get(f'/listings/?{query_string}')
+        listings_list, search_query, selected, filter_form = filter_listings(request)
+        first_page = listings_list[:10]
+        range_lookups = filter_form.range_lookups()
+
+        def facet_counts():
+            return _compute_counts(search_query, selected, range_lookups)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n?{query_string}'))
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        self.stdout.write(first_page.explain(**explain_options))
+        self.stdout.write(
+            f'first page: {self.median_ms(lambda: list(first_page.all()), iterations):.2f} ms, '
+            f'count: {self.median_ms(listings_list.count, iterations):.2f} ms, '
+            f'facets: {self.median_ms(facet_counts, iterations):.2f} ms'
+        )
+
+    def median_ms(self, func, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,79 @@
+"""
+Management command to measure the server side render time of the public pages
+
+Every page is requested through the test client (full middleware stack,
+anonymous visitor) with the rendered page cache turned off, first with the
+base.html fragment cache disabled and then enabled, and the median/mean time
+per request is printed side by side.
+
+Run it against a database with representative content, e.g.:
+    python manage.py benchmark_pages --iterations 50
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from properties.models import Listing
+
+DEFAULT_PAGES = ['home', 'listings', 'construction', 'references', 'contact']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the render time of public pages with and without fragment caching'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Timed requests per page and mode',
+        )
+        parser.add_argument(
+            '--pages',
+            nargs='+',
+            default=DEFAULT_PAGES,
+            help='URL names to benchmark (the first active listing detail page is always added)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        urls = [reverse(name) for name in options['pages']]
+        listing = Listing.objects.filter(is_active=True).order_by('-created_date').first()
+        if listing:
+            urls.append(listing.get_absolute_url())
+
+        results = {}
+        for label, timeout in (('before', 0), ('after', settings.FRAGMENT_CACHE_TIMEOUT or 3600)):
+            with override_settings(
+                PAGE_CACHE_ENABLED=False,
+                FRAGMENT_CACHE_TIMEOUT=timeout,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                client = Client()
+                for url in urls:
+                    results.setdefault(url, {})[label] = self.time_page(client, url, iterations)
+
+        self.stdout.write(f'{"Page":<40} {"before (ms)":>20} {"after (ms)":>20} {"speedup":>8}')
+        self.stdout.write(f'{"":<40} {"median / mean":>20} {"median / mean":>20}')
+        for url, timings in results.items():
+            before, after = timings['before'], timings['after']
+            speedup = before[0] / after[0] if after[0] else 0
+            self.stdout.write(
+                f'{url:<40} {before[0]:>9.2f} / {before[1]:<8.2f} {after[0]:>9.2f} / {after[1]:<8.2f} {speedup:>7.2f}x'
+            )
+
+    def time_page(self, client, url, iterations):
+        """Median and mean milliseconds per request after one warm-up request"""
+        response = client.get(url)
+        if response.status_code != 200:
+            self.stdout.write(self.style.WARNING(f'{url} returned {response.status_code}'))
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples), statistics.mean(samples)
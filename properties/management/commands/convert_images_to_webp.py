@@ -1,14 +1,46 @@
 """
 Management command to convert existing images to WebP format
+
+Rows are streamed per model in primary key order. Images are read and written
+by the main process while decoding/encoding runs on a process pool
+(--workers). Results are written back with a conditional UPDATE instead of
+save(), so no signals fire and a file replaced meanwhile is left alone.
+
+Progress is checkpointed to a JSON file: for each model, the highest primary
+key below which every row has been handled. A rerun resumes from there
+(use --reset to start over).
 """
-from django.core.management.base import BaseCommand
-from django.core.files import File
-from properties.models import (
-    Listing, ListingImage, Construction, ConstructionImage,
-    BannerImage, CustomSection, ReferenceImage, SEOSettings, SiteSettings
-)
-from properties.utils import optimize_image
+import json
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+
+from properties import page_cache
+from properties.image_pipeline import IMAGE_SPECS
+from properties.snapshot import bump_settings_version
+from properties.utils import encode_webp
+
+
+class InlineExecutor:
+    """Executor stand-in running work in the calling process (--workers 1)"""
+
+    def submit(self, func, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
 
 
 class Command(BaseCommand):
@@ -20,143 +52,193 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be converted without actually converting',
         )
-
-    def handle(self, *args, **options):
-        dry_run = options['dry_run']
-        
-        if dry_run:
-            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
-        
-        total_converted = 0
-        
-        # Convert Listing images
-        self.stdout.write('Converting Listing images...')
-        total_converted += self.convert_model_images(
-            Listing.objects.all(),
-            ['main_image'],
-            dry_run
-        )
-        
-        # Convert ListingImage
-        self.stdout.write('Converting Listing gallery images...')
-        total_converted += self.convert_model_images(
-            ListingImage.objects.all(),
-            ['image'],
-            dry_run
-        )
-        
-        # Convert Construction images
-        self.stdout.write('Converting Construction images...')
-        total_converted += self.convert_model_images(
-            Construction.objects.all(),
-            ['main_image'],
-            dry_run
-        )
-        
-        # Convert ConstructionImage
-        self.stdout.write('Converting Construction gallery images...')
-        total_converted += self.convert_model_images(
-            ConstructionImage.objects.all(),
-            ['image'],
-            dry_run
-        )
-        
-        # Convert BannerImage
-        self.stdout.write('Converting Banner images...')
-        total_converted += self.convert_model_images(
-            BannerImage.objects.all(),
-            ['image'],
-            dry_run,
-            quality=90
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of encoder processes (default: CPU count)',
         )
-        
-        # Convert CustomSection images
-        self.stdout.write('Converting Custom Section images...')
-        total_converted += self.convert_model_images(
-            CustomSection.objects.all(),
-            ['main_image', 'card_image_1', 'card_image_2', 'card_image_3'],
-            dry_run
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Rows fetched per database round-trip',
         )
-        
-        # Convert ReferenceImage
-        self.stdout.write('Converting Reference images...')
-        total_converted += self.convert_model_images(
-            ReferenceImage.objects.all(),
-            ['image'],
-            dry_run
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.convert_images_to_webp.json'),
+            help='Progress file used to resume an interrupted run',
         )
-        
-        # Convert SEOSettings OG images
-        self.stdout.write('Converting SEO Open Graph images...')
-        total_converted += self.convert_model_images(
-            SEOSettings.objects.all(),
-            ['og_image'],
-            dry_run,
-            max_width=1200,
-            max_height=630,
-            quality=90
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Ignore the checkpoint and scan every row again',
         )
-        
-        # Convert SiteSettings images
-        self.stdout.write('Converting Site Settings images...')
-        total_converted += self.convert_model_images(
-            SiteSettings.objects.all(),
-            ['logo', 'favicon'],
-            dry_run,
-            max_width=500,
-            max_height=500,
-            quality=90
+        parser.add_argument(
+            '--delete-originals',
+            action='store_true',
+            help='Delete the original file once the WebP version is in place',
         )
-        
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = {} if options['reset'] else self.load_checkpoint()
+        self.delete_originals = options['delete_originals']
+        self.stats = {'converted': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        # Group the field specs by model; favicons are not in IMAGE_SPECS and stay .ico
+        models = {}
+        for (label, field_name), spec in IMAGE_SPECS.items():
+            models.setdefault(label, {})[field_name] = spec
+
+        workers = max(options['workers'], 1)
+        executor = InlineExecutor() if dry_run or workers == 1 else ProcessPoolExecutor(max_workers=workers)
+        started = time.monotonic()
+        try:
+            for label, fields in models.items():
+                model = apps.get_model(label)
+                self.stdout.write(f'Converting {model._meta.verbose_name_plural} images...')
+                self.convert_model_images(model, fields, executor, workers, options['chunk_size'], dry_run)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nInterrupted - progress saved, rerun to resume'))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if not dry_run:
+                self.save_checkpoint()
+                if self.stats['converted']:
+                    bump_settings_version()
+                    # Rows were updated without save(); every page may show a converted image
+                    page_cache.bump('site')
+
+        elapsed = time.monotonic() - started
+        total_converted = self.stats['converted']
         if dry_run:
             self.stdout.write(
                 self.style.SUCCESS(f'Would convert {total_converted} images to WebP format')
             )
-        else:
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully converted {total_converted} images to WebP format')
-            )
+            return
+
+        saved = self.stats['bytes_before'] - self.stats['bytes_after']
+        rate = total_converted / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully converted {total_converted} images to WebP format')
+        )
+        if self.stats['failed']:
+            self.stdout.write(self.style.ERROR(f'{self.stats["failed"]} images failed (they are retried by the next run with --reset)'))
+        self.stdout.write(
+            f'{rate:.1f} images/sec, {saved / 1024 / 1024:.1f} MB saved '
+            f'({self.stats["bytes_before"]} -> {self.stats["bytes_after"]} bytes) in {elapsed:.1f}s'
+        )
 
-    def convert_model_images(self, queryset, image_fields, dry_run, max_width=1920, max_height=1080, quality=85):
-        """Convert images for a given model queryset"""
-        converted = 0
-        
-        for instance in queryset:
-            for field_name in image_fields:
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_checkpoint(self):
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def convert_model_images(self, model, fields, executor, workers, chunk_size, dry_run):
+        """Convert images for a model, keeping at most 2 * workers encodes in flight"""
+        label = model._meta.label_lower
+        last_done = self.checkpoint.get(label, 0)
+        queryset = (
+            model._default_manager.filter(pk__gt=last_done)
+            .only('pk', *fields)
+            .order_by('pk')
+        )
+
+        in_flight = {}  # future -> (pk, field_name, source_name, original size)
+        open_tasks = {}  # pk -> number of unfinished conversions
+        last_seen = last_done
+        completed = 0
+
+        def advance():
+            # Everything below the oldest unfinished row is done
+            watermark = min(open_tasks) - 1 if open_tasks else last_seen
+            if watermark > self.checkpoint.get(label, 0):
+                self.checkpoint[label] = watermark
+
+        def collect(block):
+            nonlocal completed
+            if not in_flight:
+                return
+            done, _ = wait(list(in_flight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                pk, field_name, source_name, size = in_flight.pop(future)
+                self.store_result(model, pk, field_name, source_name, size, future)
+                open_tasks[pk] -= 1
+                if not open_tasks[pk]:
+                    del open_tasks[pk]
+                completed += 1
+            advance()
+            if not dry_run and completed % 50 == 0:
+                self.save_checkpoint()
+
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            for field_name, (max_width, max_height, quality) in fields.items():
                 image_field = getattr(instance, field_name, None)
-                
-                if not image_field:
+
+                # Skip empty and already WebP fields
+                if not image_field or image_field.name.lower().endswith('.webp'):
                     continue
-                
-                # Skip if already WebP
-                if image_field.name.endswith('.webp'):
+
+                if dry_run:
+                    self.stdout.write(f'  Would convert: {image_field.name}')
+                    self.stats['converted'] += 1
                     continue
-                
+
                 try:
-                    if dry_run:
-                        self.stdout.write(f'  Would convert: {image_field.name}')
-                        converted += 1
-                    else:
-                        # Convert to WebP
-                        webp_image = optimize_image(
-                            image_field,
-                            max_width=max_width,
-                            max_height=max_height,
-                            quality=quality
-                        )
-                        
-                        if webp_image:
-                            # Save the converted image
-                            setattr(instance, field_name, webp_image)
-                            instance.save()
-                            
-                            self.stdout.write(
-                                self.style.SUCCESS(f'  ✓ Converted: {image_field.name} -> {webp_image.name}')
-                            )
-                            converted += 1
+                    with image_field.storage.open(image_field.name, 'rb') as original:
+                        data = original.read()
                 except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'  ✗ Failed to convert {image_field.name}: {str(e)}')
-                    )
-        
-        return converted
+                    self.stats['failed'] += 1
+                    self.stdout.write(self.style.ERROR(f'  ✗ Failed to read {image_field.name}: {str(e)}'))
+                    continue
+
+                future = executor.submit(encode_webp, data, max_width, max_height, quality)
+                in_flight[future] = (instance.pk, field_name, image_field.name, len(data))
+                open_tasks[instance.pk] = open_tasks.get(instance.pk, 0) + 1
+                while len(in_flight) >= workers * 2:
+                    collect(block=True)
+
+            last_seen = instance.pk
+            collect(block=False)
+
+        while in_flight:
+            collect(block=True)
+        if not dry_run:
+            advance()
+
+    def store_result(self, model, pk, field_name, source_name, size, future):
+        """Save the encoded file and point the row at it if it still holds the original"""
+        try:
+            webp = future.result()
+            storage = model._meta.get_field(field_name).storage
+            new_name = storage.save(f'{os.path.splitext(source_name)[0]}.webp', ContentFile(webp))
+        except Exception as e:
+            self.stats['failed'] += 1
+            self.stdout.write(self.style.ERROR(f'  ✗ Failed to convert {source_name}: {str(e)}'))
+            return
+
+        updated = model._default_manager.filter(pk=pk, **{field_name: source_name}).update(**{field_name: new_name})
+        if not updated:
+            storage.delete(new_name)
+            self.stdout.write(self.style.WARNING(f'  - Skipped {source_name}: changed during conversion'))
+            return
+        if self.delete_originals:
+            storage.delete(source_name)
+
+        self.stats['converted'] += 1
+        self.stats['bytes_before'] += size
+        self.stats['bytes_after'] += len(webp)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Converted: {source_name} -> {new_name}'))
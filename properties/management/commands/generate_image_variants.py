@@ -0,0 +1,65 @@
+"""
+Management command to backfill responsive image variants for existing media
+Queues an ImageProcessingJob for every image that is not WebP or has no
+variants in its image_variants manifest, then processes the queue.
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from properties.image_pipeline import (
+    VARIANT_MODELS, enqueue_images, image_fields, needs_processing, process_pending_jobs,
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate srcset width variants for existing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            help='Limit to a model (e.g. listing, listingimage); can be repeated',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many images need variants',
+        )
+        parser.add_argument(
+            '--queue-only',
+            action='store_true',
+            help='Queue the jobs and leave them to the scheduler / process_images',
+        )
+
+    def handle(self, *args, **options):
+        labels = sorted(VARIANT_MODELS)
+        if options['model']:
+            requested = {f"properties.{name.lower()}" for name in options['model']}
+            unknown = requested - VARIANT_MODELS
+            if unknown:
+                raise CommandError(f"Unknown model(s): {', '.join(sorted(unknown))}")
+            labels = sorted(requested)
+        
+        queued = 0
+        for label in labels:
+            model = apps.get_model(label)
+            count = 0
+            for obj in model._default_manager.order_by('pk').iterator(chunk_size=500):
+                if options['dry_run']:
+                    count += sum(1 for field in image_fields(model) if needs_processing(obj, field))
+                else:
+                    count += len(enqueue_images(obj, dispatch_jobs=False))
+            queued += count
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {count} image(s)')
+        
+        if options['dry_run'] or options['queue_only']:
+            self.stdout.write(self.style.SUCCESS(f'{queued} image(s) {"need variants" if options["dry_run"] else "queued"}.'))
+            return
+        
+        processed = 0
+        batch = process_pending_jobs()
+        while batch:
+            processed += batch
+            self.stdout.write(f'Processed {processed}...')
+            batch = process_pending_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Done: {processed} image(s) processed, {queued} queued.'))
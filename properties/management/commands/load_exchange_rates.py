@@ -0,0 +1,40 @@
+"""
+Management command to load exchange rates from a local file
+
+The file is a JSON object ({"USD": "41.25", "EUR": "44.80"}) or a CSV file
+with currency,rate rows, giving the Türk Lirası value of one unit. Changed
+rates are stored and Listing.price_try is recomputed in one UPDATE.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from properties.exchange_rates import load_rates, parse_rates_file, recompute_price_try
+
+
+class Command(BaseCommand):
+    help = 'Load TRY exchange rates from a JSON/CSV file and recompute listing prices in TRY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='JSON or CSV file with currency,rate entries')
+        parser.add_argument(
+            '--recompute',
+            action='store_true',
+            help='Recompute price_try of every listing even if no rate changed',
+        )
+
+    def handle(self, *args, **options):
+        if not options['path'] and not options['recompute']:
+            raise CommandError('Give a rates file and/or --recompute')
+
+        if options['path']:
+            try:
+                rates = parse_rates_file(options['path'])
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+            changed = load_rates(rates)
+            self.stdout.write(self.style.SUCCESS(
+                f"Loaded {len(rates)} rate(s), changed: {', '.join(changed) or 'none'}"
+            ))
+
+        if options['recompute']:
+            updated = recompute_price_try()
+            self.stdout.write(self.style.SUCCESS(f'Recomputed the TRY price of {updated} listing(s)'))
@@ -0,0 +1,45 @@
+"""
+Management command to run queued image optimizations (ImageProcessingJob)
+Run once from cron, or with --loop as a dedicated worker process.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties.image_pipeline import process_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Optimize uploaded images waiting in the ImageProcessingJob queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Number of jobs picked per pass',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the queue instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls in --loop mode',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        
+        while True:
+            processed = process_pending_jobs(limit=limit)
+            while processed:
+                self.stdout.write(self.style.SUCCESS(f'Optimized {processed} image(s)'))
+                processed = process_pending_jobs(limit=limit)
+            
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+"""
+Management command to recompute the related listings of every listing
+The scheduler refreshes stale listings every minute and rebuilds daily; run
+it after deploying the RelatedListing table or after bulk imports.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties.related import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed related listings shown on the listing detail pages'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Related listings computed for {count} listing(s) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,23 @@
+"""
+Management command to recompute the denormalized active counts (ContentStats)
+The scheduler does this hourly; run it after raw SQL or bulk imports that
+bypass the signals.
+"""
+from django.core.management.base import BaseCommand
+
+from properties import page_cache
+from properties.content_stats import reconcile
+from properties.snapshot import bump_settings_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute the active listing/construction counts shown on the site'
+
+    def handle(self, *args, **options):
+        corrected = reconcile()
+        if corrected:
+            bump_settings_version()
+            page_cache.bump('site')
+            self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} content stat(s)'))
+        else:
+            self.stdout.write('Content stats are up to date')
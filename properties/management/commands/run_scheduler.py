@@ -0,0 +1,36 @@
+"""
+Management command to run the newsletter/outbox scheduler as a dedicated process
+Set SCHEDULER_AUTOSTART=False for the web processes when this is deployed;
+either way only the process holding the leader lock runs the jobs.
+"""
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from properties.scheduler import leader_lock, start_scheduler, stop_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the APScheduler jobs (scheduled newsletters, email outbox) in the foreground'
+
+    def handle(self, *args, **options):
+        stopped = threading.Event()
+        
+        def shutdown(signum, frame):
+            stopped.set()
+        
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        
+        start_scheduler()
+        if leader_lock.acquire():
+            self.stdout.write(self.style.SUCCESS('Scheduler started as leader.'))
+        else:
+            self.stdout.write(self.style.WARNING('Another process holds the scheduler lock; standing by.'))
+        
+        try:
+            stopped.wait()
+        finally:
+            stop_scheduler()
+            self.stdout.write(self.style.SUCCESS('Scheduler stopped.'))
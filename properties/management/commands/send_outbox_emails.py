@@ -0,0 +1,45 @@
+"""
+Management command to send queued contact/inquiry emails from the outbox
+Run once from cron, or with --loop as a dedicated worker process.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties.mail import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send pending emails from the OutboundEmail outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of emails sent per SMTP connection',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls in --loop mode',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        while True:
+            sent = drain_outbox(batch_size=batch_size)
+            while sent:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} email(s)'))
+                sent = drain_outbox(batch_size=batch_size)
+            
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
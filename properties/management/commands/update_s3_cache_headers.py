@@ -1,12 +1,57 @@
 """
 Management command to update Cache-Control headers for existing files in S3/DigitalOcean Spaces
 This will improve performance by setting proper cache times for static assets.
+
+Objects are checked concurrently on a bounded thread pool: head_object is
+compared with the wanted Cache-Control/Content-Type, get_object_acl with the
+public-read ACL, and copy_object is only issued for objects that differ in
+either. The ETags of objects already in order are
+kept in a local state file, so later runs skip them without any request.
 """
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from django.core.management.base import BaseCommand
-from django.conf import settings
 import boto3
-import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+ALL_USERS_URI = 'http://acs.amazonaws.com/groups/global/AllUsers'
+
+# Define file extensions that should have long cache times (1 year)
+LONG_CACHE_EXTENSIONS = (
+    '.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.ico',
+    '.woff', '.woff2', '.ttf', '.eot', '.otf',
+    '.css', '.js'
+)
+
+# Content-Type mapping
+CONTENT_TYPE_MAP = {
+    '.webp': 'image/webp',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.ico': 'image/x-icon',
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.ttf': 'font/ttf',
+    '.eot': 'application/vnd.ms-fontobject',
+    '.otf': 'font/otf',
+}
+
+
+def is_public_read(acl):
+    """True if a get_object_acl response grants read access to everyone"""
+    return any(
+        grant['Grantee'].get('URI') == ALL_USERS_URI and grant['Permission'] in ('READ', 'FULL_CONTROL')
+        for grant in acl.get('Grants', [])
+    )
 
 
 class Command(BaseCommand):
@@ -18,32 +63,44 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be updated without actually updating',
         )
+        parser.add_argument(
+            '--prefix',
+            default='',
+            help='Only process keys starting with this prefix (e.g. realInvest/media/listings/)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Number of parallel S3 requests',
+        )
+        parser.add_argument(
+            '--state-file',
+            default=os.path.join(settings.BASE_DIR, '.s3_cache_headers_state.json'),
+            help='File recording the ETags of objects already up to date',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the state file and check every object again',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run even when DEBUG=True (e.g. against a test bucket)',
+        )
 
-    def handle(self, *args, **options):
-        dry_run = options['dry_run']
-        
-        # Check if we're in production mode
-        if settings.DEBUG:
-            self.stdout.write(self.style.WARNING(
-                'This command should only be run in production mode (DEBUG=False)'
-            ))
-            return
-
-        # Get S3 credentials from environment
+    def get_s3_client(self):
+        """S3 client from the environment; returns None if it is not configured"""
         access_key = os.getenv('AWS_ACCESS_KEY_ID')
         secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        bucket_name = os.getenv('AWS_STORAGE_BUCKET_NAME')
         region_name = os.getenv('AWS_S3_REGION_NAME')
         endpoint_url = os.getenv('AWS_S3_ENDPOINT_URL')
 
-        if not all([access_key, secret_key, bucket_name, region_name, endpoint_url]):
-            self.stdout.write(self.style.ERROR(
-                'Missing required S3 environment variables. Please check your .env file.'
-            ))
-            return
+        if not all([access_key, secret_key, region_name, endpoint_url, os.getenv('AWS_STORAGE_BUCKET_NAME')]):
+            return None
 
-        # Initialize S3 client
-        s3_client = boto3.client(
+        return boto3.client(
             's3',
             aws_access_key_id=access_key,
             aws_secret_access_key=secret_key,
@@ -51,93 +108,137 @@ class Command(BaseCommand):
             endpoint_url=endpoint_url
         )
 
-        # Define file extensions that should have long cache times (1 year)
-        long_cache_extensions = (
-            '.webp', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.ico',
-            '.woff', '.woff2', '.ttf', '.eot', '.otf',
-            '.css', '.js'
-        )
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
 
-        # Content-Type mapping
-        content_type_map = {
-            '.webp': 'image/webp',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.svg': 'image/svg+xml',
-            '.ico': 'image/x-icon',
-            '.css': 'text/css',
-            '.js': 'application/javascript',
-            '.woff': 'font/woff',
-            '.woff2': 'font/woff2',
-            '.ttf': 'font/ttf',
-            '.eot': 'application/vnd.ms-fontobject',
-            '.otf': 'font/otf',
-        }
-
-        updated_count = 0
-        skipped_count = 0
+        # Check if we're in production mode
+        if settings.DEBUG and not options['force']:
+            self.stdout.write(self.style.WARNING(
+                'This command should only be run in production mode (DEBUG=False)'
+            ))
+            return
+
+        s3_client = self.get_s3_client()
+        bucket_name = os.getenv('AWS_STORAGE_BUCKET_NAME')
+        if s3_client is None:
+            self.stdout.write(self.style.ERROR(
+                'Missing required S3 environment variables. Please check your .env file.'
+            ))
+            return
 
+        self.state_path = options['state_file']
+        state = {} if options['full'] else self.load_state(bucket_name)
+        counts = {'updated': 0, 'unchanged': 0, 'cached': 0, 'skipped': 0, 'failed': 0}
+
+        def check_object(key, etag):
+            """Runs on the pool: compare headers and copy the object only if needed"""
+            content_type = CONTENT_TYPE_MAP.get(os.path.splitext(key)[1].lower(), 'application/octet-stream')
+            head = s3_client.head_object(Bucket=bucket_name, Key=key)
+            if head.get('CacheControl') == CACHE_CONTROL and head.get('ContentType') == content_type:
+                # Right headers on a private object still need the copy below
+                if is_public_read(s3_client.get_object_acl(Bucket=bucket_name, Key=key)):
+                    return 'unchanged', etag
+            if dry_run:
+                return 'updated', None
+            # Copy object to itself with new metadata
+            result = s3_client.copy_object(
+                Bucket=bucket_name,
+                CopySource={'Bucket': bucket_name, 'Key': key},
+                Key=key,
+                MetadataDirective='REPLACE',
+                CacheControl=CACHE_CONTROL,
+                ContentType=content_type,
+                ACL='public-read'
+            )
+            return 'updated', result.get('CopyObjectResult', {}).get('ETag', etag)
+
+        def collect(futures, block):
+            done, _ = wait(list(futures), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = futures.pop(future)
+                try:
+                    outcome, etag = future.result()
+                except Exception as e:
+                    counts['failed'] += 1
+                    self.stdout.write(self.style.ERROR(f'✗ Error updating {key}: {str(e)}'))
+                    continue
+                counts[outcome] += 1
+                if outcome == 'updated':
+                    self.stdout.write(self.style.SUCCESS(f'{"Would update" if dry_run else "✓ Updated"}: {key}'))
+                if etag:
+                    state[key] = etag
+
+        concurrency = max(options['concurrency'], 1)
+        futures = {}
         try:
-            # List all objects in the bucket
-            self.stdout.write(self.style.SUCCESS(f'Scanning bucket: {bucket_name}'))
-            
+            # List the objects in the bucket
+            self.stdout.write(self.style.SUCCESS(f'Scanning bucket: {bucket_name}/{options["prefix"]}'))
+
             paginator = s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(Bucket=bucket_name)
+            pages = paginator.paginate(Bucket=bucket_name, Prefix=options['prefix'])
 
-            for page in pages:
-                if 'Contents' not in page:
-                    continue
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='s3-headers') as executor:
+                for page in pages:
+                    for obj in page.get('Contents', []):
+                        key = obj['Key']
 
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    file_extension = os.path.splitext(key)[1].lower()
-
-                    # Skip if not a static asset
-                    if file_extension not in long_cache_extensions:
-                        skipped_count += 1
-                        continue
-
-                    # Determine cache control and content type
-                    cache_control = 'public, max-age=31536000, immutable'
-                    content_type = content_type_map.get(file_extension, 'application/octet-stream')
-
-                    if dry_run:
-                        self.stdout.write(
-                            f'Would update: {key}\n'
-                            f'  Cache-Control: {cache_control}\n'
-                            f'  Content-Type: {content_type}'
-                        )
-                    else:
-                        # Copy object to itself with new metadata
-                        try:
-                            s3_client.copy_object(
-                                Bucket=bucket_name,
-                                CopySource={'Bucket': bucket_name, 'Key': key},
-                                Key=key,
-                                MetadataDirective='REPLACE',
-                                CacheControl=cache_control,
-                                ContentType=content_type,
-                                ACL='public-read'
-                            )
-                            self.stdout.write(self.style.SUCCESS(f'✓ Updated: {key}'))
-                            updated_count += 1
-                        except Exception as e:
-                            self.stdout.write(self.style.ERROR(f'✗ Error updating {key}: {str(e)}'))
-
-            # Summary
-            self.stdout.write(self.style.SUCCESS(
-                f'\n{"DRY RUN - " if dry_run else ""}Summary:\n'
-                f'  Updated: {updated_count}\n'
-                f'  Skipped: {skipped_count}\n'
-                f'  Total: {updated_count + skipped_count}'
-            ))
+                        # Skip if not a static asset
+                        if os.path.splitext(key)[1].lower() not in LONG_CACHE_EXTENSIONS:
+                            counts['skipped'] += 1
+                            continue
 
-            if dry_run:
-                self.stdout.write(self.style.WARNING(
-                    '\nThis was a dry run. Run without --dry-run to actually update files.'
-                ))
+                        # Already verified and unchanged since
+                        if state.get(key) == obj['ETag']:
+                            counts['cached'] += 1
+                            continue
+
+                        futures[executor.submit(check_object, key, obj['ETag'])] = key
+                        while len(futures) >= concurrency * 2:
+                            collect(futures, block=True)
+                    collect(futures, block=False)
+                    if not dry_run:
+                        self.save_state(bucket_name, state)
+
+                while futures:
+                    collect(futures, block=True)
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
+        finally:
+            if not dry_run:
+                self.save_state(bucket_name, state)
+
+        # Summary
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{"DRY RUN - " if dry_run else ""}Summary:\n'
+            f'  Updated: {counts["updated"]}\n'
+            f'  Already correct: {counts["unchanged"]}\n'
+            f'  Skipped (state file): {counts["cached"]}\n'
+            f'  Skipped (not a static asset): {counts["skipped"]}\n'
+            f'  Failed: {counts["failed"]}\n'
+            f'  Total: {sum(counts.values())}'
+        ))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                '\nThis was a dry run. Run without --dry-run to actually update files.'
+            ))
+
+    def load_state(self, bucket_name):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f).get(bucket_name, {})
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, bucket_name, state):
+        try:
+            with open(self.state_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[bucket_name] = dict(state)
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.state_path)
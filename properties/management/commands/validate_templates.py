@@ -0,0 +1,39 @@
+"""
+Management command to check that every selectable layout has a template
+
+Each CustomSection.LAYOUT_CHOICES and About.HOMEPAGE_TEMPLATES option is
+rendered through a template picked by name at request time; this fails if
+one of them is missing or does not compile. With --all every project
+template is compiled as well. Suitable as a deploy/CI step.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from properties.template_warmup import compile_templates, layout_template_names, project_template_names
+
+
+class Command(BaseCommand):
+    help = 'Validate that every layout and homepage template option has a compilable template'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Also compile every other project template',
+        )
+
+    def handle(self, *args, **options):
+        layouts = layout_template_names()
+        names = list(layouts)
+        if options['all']:
+            names += [name for name in project_template_names() if name not in layouts]
+
+        errors = compile_templates(names)
+        for name in names:
+            if name in errors:
+                self.stdout.write(self.style.ERROR(f'✗ {name}: {errors[name]}'))
+            elif name in layouts:
+                self.stdout.write(f'✓ {name} - {layouts[name]}')
+
+        if errors:
+            raise CommandError(f'{len(errors)} of {len(names)} templates are missing or invalid')
+        self.stdout.write(self.style.SUCCESS(f'All {len(names)} templates compiled successfully'))
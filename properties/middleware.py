@@ -60,3 +60,54 @@ class SecurityHeadersMiddleware:
         response['Permissions-Policy'] = 'geolocation=(), microphone=(), camera=()'
         
         return response
+
+
+class DBConnectionStatsMiddleware:
+    """
+    Middleware to expose database connection reuse (DB_CONNECTION_STATS_HEADER)
+    age = seconds since the connection was opened, requests = earlier requests
+    it served, opened = connections opened by this worker process
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        from django.conf import settings
+        if getattr(settings, 'DB_CONNECTION_STATS_HEADER', False):
+            from .db_instrumentation import connection_stats
+
+            stats = connection_stats()
+            if stats['age'] is None:
+                response['X-DB-Connection'] = f"closed; opened={stats['opened']}"
+            else:
+                response['X-DB-Connection'] = (
+                    f"age={stats['age']:.1f}; requests={stats['requests']}; opened={stats['opened']}"
+                )
+
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Middleware to keep a visitor on the primary database right after a write
+    Any POST/PUT/PATCH/DELETE sets a cookie for DB_REPLICA_STICKY_SECONDS;
+    replica_reads views read from the primary while it is present
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        from django.conf import settings
+        from .db_router import STICKY_COOKIE, replica_alias
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_alias() is not None:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+
+        return response
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS listing_search_vector_gin "
+        "ON properties_listing USING gin (search_vector)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS listing_search_vector_gin")
+
+
+def populate_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "UPDATE properties_listing SET search_vector = "
+        "setweight(to_tsvector('turkish', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('turkish', coalesce(location, '')), 'B') || "
+        "setweight(to_tsvector('turkish', coalesce(description, '')), 'C')"
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0014_update_favicon_field"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+        # GIN indexes only exist on PostgreSQL; SQLite keeps the state only
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="listing",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="listing_search_vector_gin"
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_gin_index, drop_gin_index),
+            ],
+        ),
+    ]
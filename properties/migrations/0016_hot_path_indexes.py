@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0015_listing_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='construction',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_date'], name='construction_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='construction',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', '-created_date'], name='construction_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_date', '-id'], name='listing_active_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['is_featured', '-created_date', '-id'], name='listing_active_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['property_type', 'status', '-created_date', '-id'], name='listing_active_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', '-created_date', '-id'], name='listing_active_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['location', '-created_date'], name='listing_active_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['listing', 'order'], name='listingimage_listing_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order'], name='reference_active_order_idx'),
+        ),
+    ]
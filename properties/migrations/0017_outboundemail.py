@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0016_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Konu')),
+                ('body', models.TextField(verbose_name='İçerik')),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='Gönderen')),
+                ('recipients', models.TextField(help_text='Virgülle ayrılmış e-posta adresleri', verbose_name='Alıcılar')),
+                ('status', models.CharField(choices=[('pending', 'Bekliyor'), ('sent', 'Gönderildi'), ('failed', 'Başarısız')], default='pending', max_length=10, verbose_name='Durum')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Deneme Sayısı')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Sonraki Deneme')),
+                ('last_error', models.TextField(blank=True, verbose_name='Son Hata')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Oluşturma Tarihi')),
+                ('sent_date', models.DateTimeField(blank=True, null=True, verbose_name='Gönderilme Tarihi')),
+            ],
+            options={
+                'verbose_name': 'Giden E-posta',
+                'verbose_name_plural': 'Giden E-postalar',
+                'ordering': ['-created_date'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
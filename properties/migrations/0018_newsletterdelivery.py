@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0017_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('sent', 'Gönderildi'), ('failed', 'Başarısız')], max_length=10, verbose_name='Durum')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Oluşturma Tarihi')),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='properties.newsletter', verbose_name='Bülten')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='properties.newslettersubscriber', verbose_name='Abone')),
+            ],
+            options={
+                'verbose_name': 'Bülten Teslimatı',
+                'verbose_name_plural': 'Bülten Teslimatları',
+                'constraints': [models.UniqueConstraint(fields=('newsletter', 'subscriber'), name='unique_newsletter_delivery')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('properties', '0018_newsletterdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Kayıt ID')),
+                ('field_name', models.CharField(max_length=50, verbose_name='Alan')),
+                ('source_name', models.CharField(max_length=255, verbose_name='Orijinal Dosya')),
+                ('result_name', models.CharField(blank=True, max_length=255, verbose_name='Optimize Dosya')),
+                ('status', models.CharField(choices=[('pending', 'Bekliyor'), ('processing', 'İşleniyor'), ('done', 'Tamamlandı'), ('failed', 'Başarısız')], default='pending', max_length=10, verbose_name='Durum')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Deneme Sayısı')),
+                ('last_error', models.TextField(blank=True, verbose_name='Son Hata')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Oluşturma Tarihi')),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='Güncelleme Tarihi')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='İçerik Tipi')),
+            ],
+            options={
+                'verbose_name': 'Görsel İşleme',
+                'verbose_name_plural': 'Görsel İşleme Kuyruğu',
+                'ordering': ['-created_date'],
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='properties__content_ab578b_idx'), models.Index(condition=models.Q(('status__in', ['pending', 'processing'])), fields=['updated_date'], name='imagejob_open_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'field_name', 'source_name'), name='unique_image_processing_job')],
+            },
+        ),
+    ]
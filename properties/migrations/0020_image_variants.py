@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0019_imageprocessingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bannerimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Duyarlı görsel boyutları (arka planda oluşturulur)', verbose_name='Görsel Varyantları'),
+        ),
+        migrations.AddField(
+            model_name='construction',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Duyarlı görsel boyutları (arka planda oluşturulur)', verbose_name='Görsel Varyantları'),
+        ),
+        migrations.AddField(
+            model_name='customsection',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Duyarlı görsel boyutları (arka planda oluşturulur)', verbose_name='Görsel Varyantları'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Duyarlı görsel boyutları (arka planda oluşturulur)', verbose_name='Görsel Varyantları'),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Duyarlı görsel boyutları (arka planda oluşturulur)', verbose_name='Görsel Varyantları'),
+        ),
+        migrations.AddField(
+            model_name='referenceimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Duyarlı görsel boyutları (arka planda oluşturulur)', verbose_name='Görsel Varyantları'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_content_stats(apps, schema_editor):
+    """Initial counts; afterwards the signals and reconcile keep them up to date"""
+    ContentStats = apps.get_model('properties', 'ContentStats')
+    db_alias = schema_editor.connection.alias
+    tracked = {'Listing': ('property_type', 'status'), 'Construction': ('status',)}
+    for model_name, dimensions in tracked.items():
+        active = apps.get_model('properties', model_name).objects.using(db_alias).filter(is_active=True)
+        stats = [ContentStats(model_name=model_name.lower(), dimension='all', value='', count=active.count())]
+        for dimension in dimensions:
+            for row in active.order_by().values(dimension).annotate(total=Count('pk')):
+                stats.append(ContentStats(model_name=model_name.lower(), dimension=dimension, value=row[dimension], count=row['total']))
+        ContentStats.objects.using(db_alias).bulk_create(stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0020_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, verbose_name='Model')),
+                ('dimension', models.CharField(choices=[('all', 'Toplam'), ('property_type', 'Emlak Tipi'), ('status', 'Durum')], max_length=20, verbose_name='Boyut')),
+                ('value', models.CharField(blank=True, max_length=50, verbose_name='Değer')),
+                ('count', models.IntegerField(default=0, verbose_name='Aktif Kayıt Sayısı')),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='Güncelleme Tarihi')),
+            ],
+            options={
+                'verbose_name': 'İçerik İstatistiği',
+                'verbose_name_plural': 'İçerik İstatistikleri',
+                'ordering': ['model_name', 'dimension', 'value'],
+                'constraints': [models.UniqueConstraint(fields=('model_name', 'dimension', 'value'), name='unique_content_stat')],
+            },
+        ),
+        migrations.RunPython(populate_content_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0021_content_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], name='listing_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', 'price', 'id'], name='listing_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', 'property_type', 'price', 'id'], name='listing_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', 'property_type', 'area', 'id'], name='listing_type_area_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:30
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_price_try(apps, schema_editor):
+    """No rates exist yet: only TRY prices are known"""
+    Listing = apps.get_model('properties', 'Listing')
+    Listing.objects.using(schema_editor.connection.alias).filter(currency='TRY').update(price_try=F('price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0022_listing_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('TRY', '₺ Türk Lirası'), ('USD', '$ Amerikan Doları'), ('EUR', '€ Euro'), ('GBP', '£ İngiliz Sterlini'), ('AED', 'د.إ Birleşik Arap Emirlikleri Dirhemi'), ('SAR', 'ر.س Suudi Arabistan Riyali'), ('RUB', '₽ Rus Rublesi')], max_length=3, unique=True, verbose_name='Para Birimi')),
+                ('rate', models.DecimalField(decimal_places=6, help_text='1 birimin Türk Lirası karşılığı', max_digits=18, verbose_name='Kur')),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='Güncelleme Tarihi')),
+            ],
+            options={
+                'verbose_name': 'Döviz Kuru',
+                'verbose_name_plural': 'Döviz Kurları',
+                'ordering': ['currency'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='listing',
+            name='listing_active_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='listing',
+            name='listing_status_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='listing',
+            name='listing_type_price_idx',
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='price_try',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Kur tablosuna göre Türk Lirası karşılığı (sıralama ve filtreleme için)', max_digits=18, null=True, verbose_name='Fiyat (TL)'),
+        ),
+        migrations.RunPython(populate_price_try, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price_try', 'id'], name='listing_active_price_try_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', 'price_try', 'id'], name='listing_status_price_try_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['status', 'property_type', 'price_try', 'id'], name='listing_type_price_try_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0023_exchange_rates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='related_updated_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Benzer İlanlar Güncelleme Tarihi'),
+        ),
+        migrations.CreateModel(
+            name='RelatedListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Benzerlik Puanı')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Sıra')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='properties.listing', verbose_name='İlan')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_from', to='properties.listing', verbose_name='Benzer İlan')),
+            ],
+            options={
+                'verbose_name': 'Benzer İlan',
+                'verbose_name_plural': 'Benzer İlanlar',
+                'ordering': ['listing', 'rank'],
+                'indexes': [models.Index(fields=['listing', 'rank'], name='relatedlisting_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'related'), name='unique_related_listing')],
+            },
+        ),
+    ]
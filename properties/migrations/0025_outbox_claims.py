@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0024_related_listings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Alınma Tarihi'),
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Bekliyor'), ('sending', 'Gönderiliyor'), ('sent', 'Gönderildi'), ('failed', 'Başarısız')], default='pending', max_length=10, verbose_name='Durum'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(condition=models.Q(('status', 'sending')), fields=['claimed_at'], name='outbox_sending_idx'),
+        ),
+    ]
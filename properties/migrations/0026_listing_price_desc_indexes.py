@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+# SQLite rejects NULLS LAST in an index definition
+PRICE_DESC_INDEXES = (
+    ("listing_active_price_desc_idx", ""),
+    ("listing_status_price_desc_idx", "status, "),
+    ("listing_type_price_desc_idx", "status, property_type, "),
+)
+
+
+def create_price_desc_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, prefix in PRICE_DESC_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON properties_listing "
+            f"({prefix}price_try DESC NULLS LAST, id DESC) WHERE is_active"
+        )
+
+
+def drop_price_desc_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in PRICE_DESC_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0025_outbox_claims'),
+    ]
+
+    operations = [
+        # The indexes only exist on PostgreSQL; SQLite keeps the state only
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='listing',
+                    index=models.Index(models.OrderBy(models.F('price_try'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('is_active', True)), name='listing_active_price_desc_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='listing',
+                    index=models.Index(models.F('status'), models.OrderBy(models.F('price_try'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('is_active', True)), name='listing_status_price_desc_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='listing',
+                    index=models.Index(models.F('status'), models.F('property_type'), models.OrderBy(models.F('price_try'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('is_active', True)), name='listing_type_price_desc_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_price_desc_indexes, drop_price_desc_indexes),
+            ],
+        ),
+    ]
@@ -1,10 +1,15 @@
 from django.db import models
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.urls import reverse
 from django.utils.text import slugify
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
 import os
+from decimal import Decimal
 
 # Create your models here.
 
@@ -52,6 +57,8 @@ class Listing(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='sale', verbose_name="Durum")
     price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Fiyat", help_text="Emlak fiyatı")
     currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default='TRY', verbose_name="Para Birimi", help_text="Fiyat para birimi")
+    # Maintained from ExchangeRate (see properties.exchange_rates); NULL while the currency has no rate
+    price_try = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True, editable=False, verbose_name="Fiyat (TL)", help_text="Kur tablosuna göre Türk Lirası karşılığı (sıralama ve filtreleme için)")
     location = models.CharField(max_length=255, verbose_name="Konum", help_text="Emlak konumu (şehir, ilçe)")
     address = models.CharField(max_length=500, blank=True, null=True, verbose_name="Adres")
     
@@ -64,6 +71,7 @@ class Listing(models.Model):
     
     # Media
     main_image = models.ImageField(upload_to='listings/', verbose_name="Ana Resim", help_text="Ana emlak resmi")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Görsel Varyantları", help_text="Duyarlı görsel boyutları (arka planda oluşturulur)")
     image_alt_text = models.CharField(max_length=255, blank=True, verbose_name="Resim Alt Yazısı", help_text="Ana resim için SEO alt yazısı")
     
     # Meta information
@@ -71,15 +79,39 @@ class Listing(models.Model):
     is_featured = models.BooleanField(default=False, verbose_name="Öne Çıkan", help_text="Ana sayfada göster")
     created_date = models.DateTimeField(default=timezone.now, verbose_name="Oluşturma Tarihi")
     updated_date = models.DateTimeField(auto_now=True, verbose_name="Güncelleme Tarihi")
+    # Set by properties.related; older than updated_date while the related listings are stale
+    related_updated_date = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Benzer İlanlar Güncelleme Tarihi")
     
     # SEO fields
     meta_title = models.CharField(max_length=60, blank=True, verbose_name="Meta Başlık", help_text="SEO meta başlığı")
     meta_description = models.CharField(max_length=160, blank=True, verbose_name="Meta Açıklama", help_text="SEO meta açıklaması")
     
+    # Full-text search (PostgreSQL only, maintained by properties.search)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    
     class Meta:
         ordering = ['-created_date']
         verbose_name = 'Emlak İlanı'
         verbose_name_plural = 'Emlak İlanları'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='listing_search_vector_gin'),
+            # Partial indexes for the public query shapes (always is_active=True)
+            models.Index(fields=['-created_date', '-id'], name='listing_active_recent_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['is_featured', '-created_date', '-id'], name='listing_active_featured_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['property_type', 'status', '-created_date', '-id'], name='listing_active_type_status_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['status', '-created_date', '-id'], name='listing_active_status_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['location', '-created_date'], name='listing_active_location_idx', condition=models.Q(is_active=True)),
+            # Price (in TRY)/area ranges and sorts, alone or within status and type
+            models.Index(fields=['price_try', 'id'], name='listing_active_price_try_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['status', 'price_try', 'id'], name='listing_status_price_try_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['status', 'property_type', 'price_try', 'id'], name='listing_type_price_try_idx', condition=models.Q(is_active=True)),
+            # price_desc orders by price_try DESC NULLS LAST, which a backward scan of
+            # the indexes above does not give (NULLS FIRST); PostgreSQL only, see 0026
+            models.Index(models.F('price_try').desc(nulls_last=True), models.F('id').desc(), name='listing_active_price_desc_idx', condition=models.Q(is_active=True)),
+            models.Index('status', models.F('price_try').desc(nulls_last=True), models.F('id').desc(), name='listing_status_price_desc_idx', condition=models.Q(is_active=True)),
+            models.Index('status', 'property_type', models.F('price_try').desc(nulls_last=True), models.F('id').desc(), name='listing_type_price_desc_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['status', 'property_type', 'area', 'id'], name='listing_type_area_idx', condition=models.Q(is_active=True)),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -90,6 +122,7 @@ class Listing(models.Model):
             self.meta_title = self.title[:60]
         if not self.meta_description:
             self.meta_description = self.description[:160]
+        self.price_try = ExchangeRate.convert_to_try(self.price, self.currency)
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -127,6 +160,7 @@ class ListingImage(models.Model):
     """
     listing = models.ForeignKey(Listing, related_name='images', on_delete=models.CASCADE, verbose_name="İlan")
     image = models.ImageField(upload_to='listings/gallery/', verbose_name="Resim")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Görsel Varyantları", help_text="Duyarlı görsel boyutları (arka planda oluşturulur)")
     alt_text = models.CharField(max_length=255, blank=True, verbose_name="Alt Yazı")
     order = models.IntegerField(default=0, verbose_name="Sıra")
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Yüklenme Tarihi")
@@ -135,6 +169,9 @@ class ListingImage(models.Model):
         ordering = ['order']
         verbose_name = 'İlan Resmi'
         verbose_name_plural = 'İlan Resimleri'
+        indexes = [
+            models.Index(fields=['listing', 'order'], name='listingimage_listing_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.listing.title} resmi"
@@ -161,6 +198,7 @@ class Construction(models.Model):
     
     # Media
     main_image = models.ImageField(upload_to='construction/', verbose_name="Ana Resim", help_text="Ana proje resmi")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Görsel Varyantları", help_text="Duyarlı görsel boyutları (arka planda oluşturulur)")
     image_alt_text = models.CharField(max_length=255, blank=True, verbose_name="Resim Alt Yazısı")
     
     # Meta
@@ -175,6 +213,10 @@ class Construction(models.Model):
         ordering = ['-created_date']
         verbose_name = 'İnşaat Projesi'
         verbose_name_plural = 'İnşaat Projeleri'
+        indexes = [
+            models.Index(fields=['-created_date'], name='construction_active_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['status', '-created_date'], name='construction_status_idx', condition=models.Q(is_active=True)),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -486,6 +528,7 @@ class BannerImage(models.Model):
         verbose_name="Banner Görseli",
         help_text="Banner olarak kullanılacak görsel. Önerilen boyut: 1920x1080 piksel (16:9 en-boy oranı). Tüm banner görselleri aynı boyutta olmalıdır."
     )
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Görsel Varyantları", help_text="Duyarlı görsel boyutları (arka planda oluşturulur)")
     alt_text = models.CharField(
         max_length=255,
         blank=True,
@@ -623,6 +666,7 @@ class CustomSection(models.Model):
     card_title_3 = models.CharField(max_length=100, blank=True, verbose_name="Kart 3 Başlık")
     card_content_3 = models.TextField(blank=True, verbose_name="Kart 3 İçerik")
     card_image_3 = models.ImageField(upload_to='custom_sections/cards/', blank=True, null=True, verbose_name="Kart 3 Resim")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Görsel Varyantları", help_text="Duyarlı görsel boyutları (arka planda oluşturulur)")
     
     # Display options
     background_color = models.CharField(max_length=20, blank=True, verbose_name="Arka Plan Rengi", help_text="HEX renk kodu (örn: #ffffff)")
@@ -660,6 +704,9 @@ class Reference(models.Model):
         ordering = ['order']
         verbose_name = 'Referans'
         verbose_name_plural = 'Referanslar'
+        indexes = [
+            models.Index(fields=['order'], name='reference_active_order_idx', condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return self.title
@@ -671,6 +718,7 @@ class ReferenceImage(models.Model):
     """
     reference = models.ForeignKey(Reference, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='references/images/', verbose_name="Resim")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Görsel Varyantları", help_text="Duyarlı görsel boyutları (arka planda oluşturulur)")
     alt_text = models.CharField(max_length=255, blank=True, verbose_name="Alternatif Metin")
     order = models.IntegerField(default=0, verbose_name="Sıra")
     
@@ -854,143 +902,39 @@ class Newsletter(models.Model):
     def __str__(self):
         return self.title
     
-    def _send_newsletter_background(self):
+    def _send_newsletter_background(self, resume=None):
         """
         Send newsletter in background (called by APScheduler)
         """
-        from django.core.mail import EmailMultiAlternatives, get_connection
-        from django.urls import reverse
-        from django.conf import settings
-        from django.utils import timezone
-        from django.template.loader import render_to_string
-        import datetime
-        
-        # Log start
-        NewsletterLog.log_info(self, f'Zamanlanmış bülten gönderimi başlatıldı (APScheduler): {self.title}')
-        
-        # Get active subscribers
-        subscribers = NewsletterSubscriber.objects.filter(is_active=True)
-        self.total_recipients = subscribers.count()
-        
-        if self.total_recipients == 0:
-            NewsletterLog.log_warning(self, 'Aktif abone bulunamadı. Bülten gönderimi atlandı.')
-            self.status = 'failed'
-            self.save()
-            return
-        
-        # Update status to sending
-        self.status = 'sending'
-        self.save()
-        
-        sent_count = 0
-        failed_count = 0
-        
-        # Get SMTP settings
-        site_settings = SiteSettings.objects.first()
+        from .newsletter import deliver_newsletter
         
-        if not site_settings or not site_settings.smtp_host or not site_settings.smtp_username:
-            NewsletterLog.log_error(self, 'SMTP ayarları bulunamadı veya yapılandırılmamış.')
-            self.status = 'failed'
-            self.save()
-            return
-        
-        # Create SMTP connection
-        try:
-            connection = get_connection(
-                backend='django.core.mail.backends.smtp.EmailBackend',
-                host=site_settings.smtp_host,
-                port=site_settings.smtp_port,
-                username=site_settings.smtp_username,
-                password=site_settings.smtp_password,
-                use_tls=site_settings.smtp_use_tls,
-                fail_silently=False,
-            )
-            NewsletterLog.log_success(self, f'SMTP bağlantısı kuruldu: {site_settings.smtp_host}:{site_settings.smtp_port}')
-        except Exception as e:
-            NewsletterLog.log_error(self, f'SMTP bağlantısı başarısız', error_details=str(e))
-            self.status = 'failed'
-            self.save()
-            return
-        
-        # Send to each subscriber
-        site_domain = getattr(settings, 'SITE_DOMAIN', 'localhost:8000')
-        site_protocol = getattr(settings, 'SITE_PROTOCOL', 'http')
-        
-        for subscriber in subscribers:
-            try:
-                # Generate unsubscribe URL
-                unsubscribe_path = reverse('newsletter_unsubscribe', args=[subscriber.unsubscribe_token])
-                unsubscribe_url = f"{site_protocol}://{site_domain}{unsubscribe_path}"
-                
-                # Generate absolute logo URL for email
-                logo_url = None
-                if site_settings.logo:
-                    # Logo URL is already absolute from CDN, use it directly
-                    logo_url = site_settings.logo.url
-                    NewsletterLog.log_info(self, f'Logo URL from storage: {logo_url}')
-                    # If it's a relative path, make it absolute
-                    if not logo_url.startswith('http'):
-                        logo_url = f"{site_protocol}://{site_domain}{logo_url}"
-                        NewsletterLog.log_info(self, f'Logo URL converted to absolute: {logo_url}')
-                    else:
-                        NewsletterLog.log_info(self, f'Logo URL is already absolute: {logo_url}')
-                
-                # Render email template with context
-                context = {
-                    'newsletter': self,
-                    'subscriber': subscriber,
-                    'site_settings': site_settings,
-                    'unsubscribe_url': unsubscribe_url,
-                    'logo_url': logo_url,
-                    'current_year': datetime.datetime.now().year,
-                }
-                
-                html_content = render_to_string('emails/newsletter.html', context)
-                
-                # Plain text version (strip HTML tags)
-                from django.utils.html import strip_tags
-                plain_content = strip_tags(self.content)
-                
-                # Send email
-                email = EmailMultiAlternatives(
-                    subject=self.subject,
-                    body=plain_content,
-                    from_email=site_settings.email_from if site_settings.email_from else site_settings.email,
-                    to=[subscriber.email],
-                    connection=connection
-                )
-                email.attach_alternative(html_content, "text/html")
-                email.send()
-                
-                sent_count += 1
-                NewsletterLog.log_success(self, 'Email başarıyla gönderildi', subscriber_email=subscriber.email)
-                
-            except Exception as e:
-                failed_count += 1
-                NewsletterLog.log_error(self, 'Email gönderimi başarısız', subscriber_email=subscriber.email, error_details=str(e))
-        
-        # Close connection
-        try:
-            connection.close()
-        except:
-            pass
-        
-        # Update stats and status
-        self.sent_count = sent_count
-        self.failed_count = failed_count
-        self.sent_date = timezone.now()
-        
-        if sent_count == 0:
-            self.status = 'failed'
-            NewsletterLog.log_error(self, f'Bülten gönderimi başarısız: Hiçbir email gönderilemedi ({failed_count} hata)')
-        elif failed_count == 0:
-            self.status = 'sent'
-            NewsletterLog.log_success(self, f'Bülten başarıyla gönderildi: {sent_count}/{self.total_recipients} email')
-        else:
-            self.status = 'sent'
-            NewsletterLog.log_warning(self, f'Kısmi başarı: {sent_count} başarılı, {failed_count} başarısız')
-        
-        self.save()
+        return deliver_newsletter(self, source=' (APScheduler)', resume=resume)
+
+
+class NewsletterDelivery(models.Model):
+    """
+    Per-recipient delivery state of a newsletter campaign
+    Written in batches while sending so an interrupted campaign can resume
+    """
+    STATUS_CHOICES = (
+        ('sent', 'Gönderildi'),
+        ('failed', 'Başarısız'),
+    )
+    
+    newsletter = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='deliveries', verbose_name="Bülten")
+    subscriber = models.ForeignKey(NewsletterSubscriber, on_delete=models.CASCADE, related_name='deliveries', verbose_name="Abone")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name="Durum")
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name="Oluşturma Tarihi")
+    
+    class Meta:
+        verbose_name = 'Bülten Teslimatı'
+        verbose_name_plural = 'Bülten Teslimatları'
+        constraints = [
+            models.UniqueConstraint(fields=['newsletter', 'subscriber'], name='unique_newsletter_delivery'),
+        ]
+    
+    def __str__(self):
+        return f"{self.newsletter} - {self.subscriber} ({self.get_status_display()})"
 
 
 class PopupSettings(models.Model):
@@ -1165,3 +1109,197 @@ class NewsletterLog(models.Model):
             error_details=error_details
         )
 
+
+
+class OutboundEmail(models.Model):
+    """
+    Email outbox - notification emails queued by views and sent by a worker
+    (see properties.mail.drain_outbox)
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Bekliyor'),
+        ('sending', 'Gönderiliyor'),
+        ('sent', 'Gönderildi'),
+        ('failed', 'Başarısız'),
+    )
+    
+    subject = models.CharField(max_length=255, verbose_name="Konu")
+    body = models.TextField(verbose_name="İçerik")
+    from_email = models.CharField(max_length=255, blank=True, verbose_name="Gönderen")
+    recipients = models.TextField(verbose_name="Alıcılar", help_text="Virgülle ayrılmış e-posta adresleri")
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Durum")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Deneme Sayısı")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Sonraki Deneme")
+    last_error = models.TextField(blank=True, verbose_name="Son Hata")
+    # Set when a worker claims the row ('sending'); a claim older than
+    # OUTBOX_STALE_MINUTES belongs to a dead worker and is claimed again
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Alınma Tarihi")
+    
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name="Oluşturma Tarihi")
+    sent_date = models.DateTimeField(null=True, blank=True, verbose_name="Gönderilme Tarihi")
+    
+    class Meta:
+        verbose_name = 'Giden E-posta'
+        verbose_name_plural = 'Giden E-postalar'
+        ordering = ['-created_date']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='outbox_pending_idx', condition=models.Q(status='pending')),
+            models.Index(fields=['claimed_at'], name='outbox_sending_idx', condition=models.Q(status='sending')),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
+    
+    def get_recipient_list(self):
+        return [email.strip() for email in self.recipients.split(',') if email.strip()]
+
+
+class ImageProcessingJob(models.Model):
+    """
+    Background WebP optimization of an uploaded image
+    (see properties.image_pipeline). The original file is stored by the
+    request; the worker swaps in the optimized file when it is ready.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Bekliyor'),
+        ('processing', 'İşleniyor'),
+        ('done', 'Tamamlandı'),
+        ('failed', 'Başarısız'),
+    )
+    
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="İçerik Tipi")
+    object_id = models.PositiveBigIntegerField(verbose_name="Kayıt ID")
+    content_object = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=50, verbose_name="Alan")
+    source_name = models.CharField(max_length=255, verbose_name="Orijinal Dosya")
+    result_name = models.CharField(max_length=255, blank=True, verbose_name="Optimize Dosya")
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Durum")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Deneme Sayısı")
+    last_error = models.TextField(blank=True, verbose_name="Son Hata")
+    
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name="Oluşturma Tarihi")
+    updated_date = models.DateTimeField(auto_now=True, verbose_name="Güncelleme Tarihi")
+    
+    class Meta:
+        verbose_name = 'Görsel İşleme'
+        verbose_name_plural = 'Görsel İşleme Kuyruğu'
+        ordering = ['-created_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'field_name', 'source_name'],
+                name='unique_image_processing_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'object_id']),
+            models.Index(fields=['updated_date'], name='imagejob_open_idx', condition=models.Q(status__in=['pending', 'processing'])),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_name} ({self.get_status_display()})"
+    
+    @classmethod
+    def status_for(cls, instance):
+        """
+        Processing status of an object's images: the status of its least
+        finished job ('processing' before 'pending' before 'failed'), or
+        'done' when nothing is outstanding
+        """
+        statuses = set(
+            cls.objects.filter(
+                content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk
+            ).values_list('status', flat=True)
+        )
+        for status in ('processing', 'pending', 'failed'):
+            if status in statuses:
+                return status
+        return 'done'
+
+
+class ContentStats(models.Model):
+    """
+    Active row counts of public content, in total and per choice field
+    (see properties.content_stats). Kept up to date by the signals and
+    reconciled periodically, so pages never run COUNT queries for them.
+    """
+    DIMENSION_CHOICES = (
+        ('all', 'Toplam'),
+        ('property_type', 'Emlak Tipi'),
+        ('status', 'Durum'),
+    )
+    
+    model_name = models.CharField(max_length=50, verbose_name="Model")
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES, verbose_name="Boyut")
+    value = models.CharField(max_length=50, blank=True, verbose_name="Değer")
+    count = models.IntegerField(default=0, verbose_name="Aktif Kayıt Sayısı")
+    
+    updated_date = models.DateTimeField(auto_now=True, verbose_name="Güncelleme Tarihi")
+    
+    class Meta:
+        verbose_name = 'İçerik İstatistiği'
+        verbose_name_plural = 'İçerik İstatistikleri'
+        ordering = ['model_name', 'dimension', 'value']
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'dimension', 'value'], name='unique_content_stat'),
+        ]
+    
+    def __str__(self):
+        label = self.get_dimension_display() if self.dimension == 'all' else f"{self.get_dimension_display()}: {self.value}"
+        return f"{self.model_name} - {label}: {self.count}"
+
+
+class ExchangeRate(models.Model):
+    """
+    Türk Lirası value of one unit of a listing currency. Listing.price_try is
+    recomputed in bulk whenever a rate changes (see properties.exchange_rates).
+    """
+    currency = models.CharField(max_length=3, choices=Listing.CURRENCY_CHOICES, unique=True, verbose_name="Para Birimi")
+    rate = models.DecimalField(max_digits=18, decimal_places=6, verbose_name="Kur", help_text="1 birimin Türk Lirası karşılığı")
+    updated_date = models.DateTimeField(auto_now=True, verbose_name="Güncelleme Tarihi")
+    
+    BASE_CURRENCY = 'TRY'
+    
+    class Meta:
+        verbose_name = 'Döviz Kuru'
+        verbose_name_plural = 'Döviz Kurları'
+        ordering = ['currency']
+    
+    def __str__(self):
+        return f"{self.currency}: {self.rate} ₺"
+    
+    @classmethod
+    def convert_to_try(cls, amount, currency):
+        """TRY value of an amount, or None if the currency has no rate"""
+        if amount is None or currency == cls.BASE_CURRENCY:
+            return amount
+        rate = cls.objects.filter(currency=currency).values_list('rate', flat=True).first()
+        if rate is None:
+            return None
+        return (Decimal(amount) * rate).quantize(Decimal('0.01'))
+
+
+class RelatedListing(models.Model):
+    """
+    Precomputed most similar active listings of a listing, best first
+    (see properties.related), so the detail page reads them with one lookup
+    """
+    listing = models.ForeignKey(Listing, related_name='related_entries', on_delete=models.CASCADE, verbose_name="İlan")
+    related = models.ForeignKey(Listing, related_name='related_from', on_delete=models.CASCADE, verbose_name="Benzer İlan")
+    score = models.FloatField(verbose_name="Benzerlik Puanı")
+    rank = models.PositiveSmallIntegerField(verbose_name="Sıra")
+    
+    class Meta:
+        verbose_name = 'Benzer İlan'
+        verbose_name_plural = 'Benzer İlanlar'
+        ordering = ['listing', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'related'], name='unique_related_listing'),
+        ]
+        indexes = [
+            models.Index(fields=['listing', 'rank'], name='relatedlisting_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.listing} -> {self.related} ({self.score:.2f})"
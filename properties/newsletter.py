@@ -0,0 +1,487 @@
+"""
+Newsletter delivery engine
+
+One code path for every way a campaign is sent (admin action, APScheduler job
+and the cron management command). The email template is rendered once per
+campaign and only the unsubscribe URL is substituted per subscriber. Messages
+are sent by a pool of worker threads, each holding its own persistent SMTP
+connection, optionally throttled to a messages-per-second limit.
+
+Worker threads never touch the database: they report results back through a
+queue and the calling thread does all logging and bookkeeping. Log entries are
+buffered and bulk-inserted; per-recipient successes are only counted unless
+NEWSLETTER_LOG_RECIPIENTS is enabled. Per-recipient
+outcomes are checkpointed to NewsletterDelivery in batches, so a campaign
+left in 'sending' by a crash resumes with the subscribers not yet sent to
+(at most one unflushed batch is sent twice).
+"""
+import datetime
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .mail import get_site_email_connection
+
+logger = logging.getLogger(__name__)
+
+UNSUBSCRIBE_PLACEHOLDER = '__UNSUBSCRIBE_URL__'
+
+
+class DeliveryResult(namedtuple('DeliveryResult', ['total', 'sent', 'failed', 'elapsed', 'error', 'run_sent'])):
+    """Campaign totals (including earlier resumed runs) and this run's timing"""
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """Messages sent per second in this run"""
+        return self.run_sent / self.elapsed if self.elapsed else 0.0
+
+
+_STOP = object()
+
+
+def get_base_url():
+    """Absolute site URL used for links in emails sent outside a request"""
+    site_domain = getattr(settings, 'SITE_DOMAIN', 'localhost:8000')
+    site_protocol = getattr(settings, 'SITE_PROTOCOL', 'http')
+    return f"{site_protocol}://{site_domain}"
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls evenly at `rate` per second (0 = unlimited)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RenderedNewsletter:
+    """The campaign rendered once, with per-subscriber substitution"""
+
+    def __init__(self, newsletter, site_settings, base_url):
+        self.newsletter = newsletter
+        self.base_url = base_url
+        self.from_email = site_settings.email_from or site_settings.email
+
+        logo_url = None
+        if site_settings.logo:
+            logo_url = site_settings.logo.url
+            if not logo_url.startswith('http'):
+                logo_url = f"{base_url}{logo_url}"
+        self.logo_url = logo_url
+
+        self.html = render_to_string('emails/newsletter.html', {
+            'newsletter': newsletter,
+            'site_settings': site_settings,
+            'unsubscribe_url': UNSUBSCRIBE_PLACEHOLDER,
+            'logo_url': logo_url,
+            'current_year': datetime.datetime.now().year,
+        })
+        self.text = strip_tags(newsletter.content)
+
+    def unsubscribe_url(self, token):
+        return f"{self.base_url}{reverse('newsletter_unsubscribe', args=[token])}"
+
+    def build_message(self, email, token, connection):
+        message = EmailMultiAlternatives(
+            subject=self.newsletter.subject,
+            body=self.text,
+            from_email=self.from_email,
+            to=[email],
+            connection=connection,
+        )
+        message.attach_alternative(self.html.replace(UNSUBSCRIBE_PLACEHOLDER, self.unsubscribe_url(token)), 'text/html')
+        return message
+
+
+def _worker(rendered, site_settings, jobs, results, limiter):
+    """Send jobs over one persistent connection until the stop marker arrives"""
+    connection = get_site_email_connection(site_settings)
+    is_open = False
+    try:
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                break
+            _, email, token = job
+            try:
+                if not is_open:
+                    connection.open()
+                    is_open = True
+                limiter.wait()
+                rendered.build_message(email, token, connection).send()
+                results.put((job, None))
+            except Exception as e:
+                results.put((job, e))
+                # Drop a possibly broken connection; the next job reconnects
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                is_open = False
+    finally:
+        if is_open:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+class NewsletterSender:
+    """
+    Send one campaign to a stream of (subscriber_id, email, unsubscribe_token)
+    tuples
+
+    on_result(recipient, error) is called in the calling thread for every
+    recipient tuple; error is None on success. on_tick(), if given, is called
+    in the calling thread every ~0.1 seconds whether or not results arrive.
+    """
+
+    def __init__(self, newsletter, site_settings, base_url=None, workers=None, rate_limit=None):
+        self.rendered = RenderedNewsletter(newsletter, site_settings, base_url or get_base_url())
+        self.site_settings = site_settings
+        self.workers = max(int(workers or getattr(settings, 'NEWSLETTER_SEND_WORKERS', 4)), 1)
+        rate = getattr(settings, 'NEWSLETTER_SEND_RATE', 0) if rate_limit is None else rate_limit
+        self.limiter = RateLimiter(rate)
+
+    def send(self, recipients, on_result, on_tick=None):
+        jobs = queue.Queue(maxsize=self.workers * 4)
+        results = queue.Queue()
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(self.rendered, self.site_settings, jobs, results, self.limiter),
+                name=f'newsletter-sender-{i}',
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def drain(block=False):
+            while True:
+                try:
+                    recipient, error = results.get(block=block, timeout=0.1 if block else None)
+                except queue.Empty:
+                    if on_tick:
+                        on_tick()
+                    return
+                on_result(recipient, error)
+
+        try:
+            for recipient in recipients:
+                while True:
+                    try:
+                        jobs.put(recipient, timeout=0.1)
+                        break
+                    except queue.Full:
+                        drain()
+                drain()
+        finally:
+            for _ in threads:
+                jobs.put(_STOP)
+            while any(thread.is_alive() for thread in threads):
+                drain(block=True)
+            drain()
+
+
+class DeliveryCheckpoint:
+    """
+    Buffers per-recipient outcomes and writes them to NewsletterDelivery
+    every `batch_size` results; each flush also refreshes the campaign
+    heartbeat (Newsletter.updated_date) used for stale detection. tick()
+    flushes every NEWSLETTER_HEARTBEAT_SECONDS, so the heartbeat stays fresh
+    while the SMTP workers are blocked and no result arrives.
+    """
+
+    def __init__(self, newsletter, batch_size=None):
+        self.newsletter = newsletter
+        self.batch_size = batch_size or getattr(settings, 'NEWSLETTER_CHECKPOINT_SIZE', 200)
+        self.max_interval = getattr(settings, 'NEWSLETTER_HEARTBEAT_SECONDS', 60)
+        self.last_flush = time.monotonic()
+        self.pending = []
+        self.sent = 0
+        self.failed = 0
+
+    def add(self, subscriber_id, sent):
+        from .models import NewsletterDelivery
+
+        if sent:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self.pending.append(NewsletterDelivery(
+            newsletter=self.newsletter,
+            subscriber_id=subscriber_id,
+            status='sent' if sent else 'failed',
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        else:
+            self.tick()
+
+    def tick(self):
+        if time.monotonic() - self.last_flush >= self.max_interval:
+            self.flush()
+
+    def flush(self):
+        from .models import Newsletter, NewsletterDelivery
+
+        if self.pending:
+            # A resumed run retries the failed recipients: overwrite their rows
+            NewsletterDelivery.objects.bulk_create(
+                self.pending,
+                update_conflicts=True,
+                unique_fields=['newsletter', 'subscriber'],
+                update_fields=['status'],
+            )
+            self.pending = []
+        Newsletter.objects.filter(pk=self.newsletter.pk).update(updated_date=timezone.now())
+        self.last_flush = time.monotonic()
+
+
+class NewsletterLogBuffer:
+    """
+    Buffered NewsletterLog writer
+
+    Entries are accumulated in memory and written with one bulk_create every
+    `batch_size` entries or `flush_interval` seconds; callers must flush() when
+    the campaign finishes or fails. Per-recipient successes are only counted
+    unless `log_recipients` is enabled; failures are always logged.
+    """
+
+    def __init__(self, newsletter, batch_size=None, flush_interval=None, log_recipients=None):
+        self.newsletter = newsletter
+        self.batch_size = batch_size or getattr(settings, 'NEWSLETTER_LOG_BATCH_SIZE', 500)
+        self.flush_interval = getattr(settings, 'NEWSLETTER_LOG_FLUSH_SECONDS', 5) if flush_interval is None else flush_interval
+        self.log_recipients = getattr(settings, 'NEWSLETTER_LOG_RECIPIENTS', False) if log_recipients is None else log_recipients
+        self.last_flush = time.monotonic()
+        self.pending = []
+        self.success_count = 0
+        self.error_count = 0
+
+    def _add(self, log_type, message, subscriber_email=None, error_details=None):
+        from .models import NewsletterLog
+
+        self.pending.append(NewsletterLog(
+            newsletter=self.newsletter,
+            log_type=log_type,
+            message=message,
+            subscriber_email=subscriber_email,
+            error_details=error_details,
+        ))
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def info(self, message):
+        self._add('info', message)
+
+    def success(self, message):
+        self._add('success', message)
+
+    def warning(self, message, error_details=None):
+        self._add('warning', message, error_details=error_details)
+
+    def error(self, message, error_details=None):
+        self._add('error', message, error_details=error_details)
+
+    def recipient_success(self, email):
+        self.success_count += 1
+        if self.log_recipients:
+            self._add('success', 'Email başarıyla gönderildi', subscriber_email=email)
+
+    def recipient_error(self, email, error):
+        self.error_count += 1
+        self._add('error', 'Email gönderimi başarısız', subscriber_email=email, error_details=str(error))
+
+    def flush(self):
+        from .models import NewsletterLog
+
+        if self.pending:
+            NewsletterLog.objects.bulk_create(self.pending)
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+
+def delivery_totals(newsletter):
+    """(sent, failed) counts recorded for a campaign across all runs"""
+    from django.db.models import Count, Q
+
+    totals = newsletter.deliveries.aggregate(
+        sent=Count('pk', filter=Q(status='sent')),
+        failed=Count('pk', filter=Q(status='failed')),
+    )
+    return totals['sent'], totals['failed']
+
+
+def claim_next_newsletter(now=None):
+    """
+    Atomically claim the next campaign to send, or return None
+
+    Returns (newsletter, resume). Interrupted campaigns ('sending' with a
+    heartbeat older than NEWSLETTER_STALE_MINUTES) come first, then due
+    'scheduled' ones. Candidate rows are locked with SKIP LOCKED and the
+    claim is a compare-and-set on status/heartbeat, so two processes never
+    claim the same campaign.
+    """
+    from .models import Newsletter
+
+    now = now or timezone.now()
+    stale_before = now - timedelta(minutes=getattr(settings, 'NEWSLETTER_STALE_MINUTES', 10))
+    candidates = (
+        (True, {'status': 'sending', 'updated_date__lt': stale_before}, {'updated_date': now}),
+        (False, {'status': 'scheduled', 'scheduled_date__lte': now}, {'status': 'sending', 'updated_date': now}),
+    )
+    for resume, conditions, claim in candidates:
+        with transaction.atomic():
+            pks = list(
+                Newsletter.objects.select_for_update(skip_locked=True)
+                .filter(**conditions)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:5]
+            )
+            for pk in pks:
+                if Newsletter.objects.filter(pk=pk, **conditions).update(**claim):
+                    return Newsletter.objects.get(pk=pk), resume
+    return None
+
+
+def claim_newsletter(newsletter):
+    """
+    Move a campaign that is not yet sending to 'sending' (compare-and-set)
+    Returns False if another process already started or finished it.
+    """
+    from .models import Newsletter
+
+    claimed = Newsletter.objects.filter(pk=newsletter.pk).exclude(status__in=['sending', 'sent']).update(
+        status='sending', updated_date=timezone.now()
+    )
+    if claimed:
+        newsletter.status = 'sending'
+    return bool(claimed)
+
+
+def deliver_newsletter(newsletter, base_url=None, source='', workers=None, rate_limit=None, resume=None):
+    """
+    Send a campaign to all active subscribers and record the outcome
+
+    Handles the status transitions, NewsletterLog entries (through a
+    NewsletterLogBuffer) and statistics for the campaign. A campaign already
+    in 'sending' is resumed (unless resume=False, used for campaigns just
+    claimed): subscribers already sent to are skipped and failed ones are
+    retried, while a new send clears the rows of earlier runs. Returns a DeliveryResult; `error` is set when the campaign could
+    not be started (no subscribers, SMTP not configured).
+    """
+    log = NewsletterLogBuffer(newsletter)
+    try:
+        if resume is None:
+            resume = newsletter.status == 'sending'
+        return _deliver(newsletter, log, base_url, source, workers, rate_limit, resume)
+    finally:
+        log.flush()
+
+
+def _deliver(newsletter, log, base_url, source, workers, rate_limit, resuming):
+    from django.db.models import Exists, OuterRef
+    from .models import NewsletterDelivery, NewsletterSubscriber, SiteSettings
+
+    if resuming:
+        log.warning(f'Yarıda kalan bülten gönderimi devam ettiriliyor{source}: {newsletter.title}')
+    else:
+        log.info(f'Bülten gönderimi başlatıldı{source}: {newsletter.title}')
+
+    subscribers = NewsletterSubscriber.objects.filter(is_active=True)
+    if not resuming:
+        newsletter.total_recipients = subscribers.count()
+
+    def abort(message, error_details=None):
+        log.error(message, error_details=error_details)
+        newsletter.status = 'failed'
+        newsletter.save()
+        return DeliveryResult(newsletter.total_recipients, 0, 0, 0.0, message, 0)
+
+    if newsletter.total_recipients == 0:
+        return abort('Aktif abone bulunamadı. Bülten gönderimi atlandı.')
+
+    site_settings = SiteSettings.objects.first()
+    if not site_settings or not site_settings.smtp_host or not site_settings.smtp_username:
+        return abort('SMTP ayarları bulunamadı veya yapılandırılmamış.')
+
+    newsletter.status = 'sending'
+    newsletter.save()
+    if not resuming:
+        # A new send starts from scratch; rows of an earlier run would skip subscribers
+        newsletter.deliveries.all().delete()
+
+    already_delivered = NewsletterDelivery.objects.filter(
+        newsletter=newsletter, subscriber=OuterRef('pk'), status='sent'
+    )
+    pending = subscribers.exclude(Exists(already_delivered))
+
+    sender = NewsletterSender(newsletter, site_settings, base_url=base_url, workers=workers, rate_limit=rate_limit)
+    log.info(
+        f'Toplam {newsletter.total_recipients} aboneye {sender.workers} bağlantı ile gönderilecek '
+        f'(SMTP: {site_settings.smtp_host}:{site_settings.smtp_port})'
+    )
+
+    checkpoint = DeliveryCheckpoint(newsletter)
+
+    def on_result(recipient, error):
+        subscriber_id, email, _ = recipient
+        checkpoint.add(subscriber_id, error is None)
+        if error is None:
+            log.recipient_success(email)
+        else:
+            log.recipient_error(email, error)
+
+    started = time.monotonic()
+    recipients = pending.order_by('pk').values_list('pk', 'email', 'unsubscribe_token').iterator(chunk_size=2000)
+    try:
+        sender.send(recipients, on_result, on_tick=checkpoint.tick)
+    finally:
+        checkpoint.flush()
+    elapsed = time.monotonic() - started
+
+    sent, failed = delivery_totals(newsletter)
+    result = DeliveryResult(newsletter.total_recipients, sent, failed, elapsed, None, checkpoint.sent)
+    newsletter.sent_count = result.sent
+    newsletter.failed_count = result.failed
+    newsletter.sent_date = timezone.now()
+
+    throughput = f'{elapsed:.1f} sn, {result.rate:.1f} email/sn'
+    if result.sent == 0:
+        newsletter.status = 'failed'
+        log.error(f'Bülten gönderimi başarısız: Hiçbir email gönderilemedi ({result.failed} hata)')
+    elif result.failed == 0:
+        newsletter.status = 'sent'
+        log.success(f'Bülten başarıyla gönderildi: {result.sent}/{result.total} email ({throughput})')
+    else:
+        newsletter.status = 'sent'
+        log.warning(f'Kısmi başarı: {result.sent} başarılı, {result.failed} başarısız ({throughput})')
+
+    newsletter.save()
+    logger.info(f"Newsletter '{newsletter.title}': {result.sent}/{result.total} sent in {throughput}")
+    return result
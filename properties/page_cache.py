@@ -0,0 +1,232 @@
+"""
+Rendered HTML cache for the public pages of anonymous visitors
+
+Entries are keyed on the path, the normalized query string and the active
+homepage template. Every entry records the versions of the content groups
+it was rendered from ('site', 'home', 'listing:<pk>', ...); the signals
+bump only the groups an edit touches (see invalidate_instance), so an admin
+change is visible on the next request without flushing unrelated pages.
+
+Requests carrying a session cookie or pending flash messages, and logged-in
+users, always get a full render. CSRF tokens are stored as a placeholder
+and filled in per request. On a miss one request renders while concurrent
+ones wait briefly for its result (stampede protection).
+"""
+import hashlib
+import re
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .conditional import is_cacheable
+from .db_router import use_primary
+
+PAGE_KEY_PREFIX = 'properties:page'
+VERSION_KEY_PREFIX = 'properties:page_version'
+CSRF_PLACEHOLDER = '__PAGE_CACHE_CSRF_TOKEN__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+TRACKING_PARAMS = ('fbclid', 'gclid', 'yclid', 'msclkid')
+
+# SEOSettings.page_type -> page group; other page types are not cached
+SEO_PAGE_GROUPS = {
+    'home': 'home',
+    'listings': 'listings',
+    'construction': 'construction',
+    'references': 'references',
+}
+
+
+def _version_key(group):
+    return f'{VERSION_KEY_PREFIX}:{hashlib.md5(group.encode()).hexdigest()}'
+
+
+def get_versions(groups):
+    """Current version of each group, creating missing ones"""
+    keys = {_version_key(group): group for group in groups}
+    found = cache.get_many(list(keys))
+    for key, group in keys.items():
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            found[key] = cache.get(key)
+    return {group: found[key] for key, group in keys.items()}
+
+
+def bump(*groups):
+    """Invalidate every cached page rendered from one of the groups"""
+    cache.set_many({_version_key(group): uuid.uuid4().hex for group in groups}, timeout=None)
+
+
+def depends_on(request, *groups):
+    """Called by a view to record extra groups its page was rendered from"""
+    request.__dict__.setdefault('_page_cache_groups', set()).update(groups)
+
+
+def listing_group(pk):
+    return f'listing:{pk}'
+
+
+def location_group(location):
+    return f'location:{location}'
+
+
+def normalized_query(request):
+    """Sorted query string without tracking parameters"""
+    items = sorted(
+        (key, value) for key, values in request.GET.lists() for value in values
+        if not key.startswith('utm_') and key not in TRACKING_PARAMS
+    )
+    return '&'.join(f'{key}={value}' for key, value in items)
+
+
+def page_key(request):
+    from .snapshot import get_site_snapshot
+
+    about = get_site_snapshot().about
+    homepage_template = about.homepage_template if about else ''
+    raw = '|'.join([request.path, normalized_query(request), homepage_template])
+    return f'{PAGE_KEY_PREFIX}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def should_cache(request):
+    if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    return is_cacheable(request)
+
+
+def _is_fresh(entry):
+    return entry is not None and get_versions(entry['versions']) == entry['versions']
+
+
+def _from_entry(request, entry, state):
+    content = entry['content']
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content, content_type=entry['content_type'])
+    response['X-Page-Cache'] = state
+    return response
+
+
+def _storable(request, response):
+    session = getattr(request, 'session', None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not (session is not None and session.modified)
+        and is_cacheable(request)
+    )
+
+
+def cached_page(*groups):
+    """
+    Cache the rendered page of a view; ``groups`` are the content groups it
+    always depends on besides 'site' (formatted with the URL kwargs)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not should_cache(request):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request)
+            entry = cache.get(key)
+            if _is_fresh(entry):
+                return _from_entry(request, entry, 'HIT')
+
+            static_groups = ['site'] + [group.format(**kwargs) for group in groups]
+            # Versions are read before rendering: an edit committed meanwhile
+            # leaves the entry stale instead of hiding behind it
+            versions = get_versions(static_groups)
+            lock_key = f'{key}:lock'
+            timeout = getattr(settings, 'PAGE_CACHE_LOCK_SECONDS', 10)
+            if not cache.add(lock_key, 1, timeout=timeout):
+                deadline = time.monotonic() + getattr(settings, 'PAGE_CACHE_WAIT_SECONDS', 2)
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+                    if _is_fresh(entry):
+                        return _from_entry(request, entry, 'HIT')
+                # The filling request is slow or died; render without storing
+                response = view(request, *args, **kwargs)
+                response['X-Page-Cache'] = 'MISS'
+                return response
+
+            try:
+                # Fill from the primary: a lagging replica would store old
+                # content under the new versions
+                with use_primary():
+                    response = view(request, *args, **kwargs)
+                if _storable(request, response):
+                    extra = request.__dict__.get('_page_cache_groups', set()) - set(versions)
+                    versions.update(get_versions(extra))
+                    content = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+                    cache.set(key, {
+                        'content': content,
+                        'content_type': response['Content-Type'],
+                        'versions': versions,
+                    }, timeout=getattr(settings, 'PAGE_CACHE_TIMEOUT', 6 * 3600))
+                response['X-Page-Cache'] = 'MISS'
+                return response
+            finally:
+                cache.delete(lock_key)
+        return wrapper
+    return decorator
+
+
+def _has_active_changed(model):
+    """
+    The navigation shows the listings/construction links only while an active
+    row exists; report when that flips so every page is invalidated
+    """
+    has_active = model._default_manager.filter(is_active=True).exists()
+    key = f'{PAGE_KEY_PREFIX}:has_active:{model._meta.model_name}'
+    if cache.get(key) == has_active:
+        return False
+    cache.set(key, has_active, timeout=None)
+    return True
+
+
+def groups_for(instance):
+    """Page groups rendered from a row of one of the public content models"""
+    from .models import (
+        About, BannerImage, Construction, ConstructionImage, CustomSection, Listing,
+        ListingImage, NavigationSettings, PopupSettings, Reference, ReferenceImage,
+        ReferenceVideo, SEOSettings, SiteSettings, VisibleCustomSection,
+    )
+
+    if isinstance(instance, Listing):
+        groups = {'home', 'listings', listing_group(instance.pk), location_group(instance.location)}
+        if _has_active_changed(Listing):
+            groups.add('site')
+        return groups
+    if isinstance(instance, ListingImage):
+        return {'home', 'listings', listing_group(instance.listing_id)}
+    if isinstance(instance, Construction):
+        return {'construction', 'site'} if _has_active_changed(Construction) else {'construction'}
+    if isinstance(instance, ConstructionImage):
+        return {'construction'}
+    if isinstance(instance, (Reference, ReferenceImage, ReferenceVideo)):
+        return {'references'}
+    if isinstance(instance, (BannerImage, CustomSection, VisibleCustomSection)):
+        return {'home'}
+    if isinstance(instance, SEOSettings):
+        return {SEO_PAGE_GROUPS[instance.page_type]} if instance.page_type in SEO_PAGE_GROUPS else set()
+    if isinstance(instance, (About, SiteSettings, NavigationSettings, PopupSettings)):
+        # Navigation, footer, popup and homepage template are on every page
+        return {'site'}
+    return set()
+
+
+def invalidate_instance(instance):
+    groups = groups_for(instance)
+    if groups:
+        bump(*groups)
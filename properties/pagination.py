@@ -0,0 +1,190 @@
+"""
+Keyset (seek) pagination for listings
+
+Pages are addressed by an opaque cursor holding the ``(created_date, id)`` key
+of the row at the page boundary, so every page is an indexed range scan instead
+of ``COUNT(*)`` + ``OFFSET``. ``KeysetPage`` exposes the parts of Django's
+``Page`` API the templates use, and ``page(number)`` is supported through
+cached page boundaries for the sitemap.
+"""
+import base64
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .snapshot import get_settings_version
+
+KEY_ORDERING = ('-created_date', '-id')
+
+
+def encode_cursor(direction, obj_key, number):
+    """Encode a page boundary as a URL-safe opaque string"""
+    created_date, pk = obj_key
+    payload = json.dumps([direction, created_date.isoformat(), pk, number], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (direction, (created_date, id), number) or None for a bad cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, created_date, pk, number = json.loads(base64.urlsafe_b64decode(padded))
+        created_date = parse_datetime(created_date)
+        if direction not in ('n', 'p') or created_date is None:
+            return None
+        return direction, (created_date, int(pk)), max(int(number), 1)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    A page of results compatible with the Page attributes used in templates
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<KeysetPage {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor('n', _key(self.object_list[-1]), self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor('p', _key(self.object_list[0]), self.number - 1)
+
+
+def _key(obj):
+    return obj.created_date, obj.pk
+
+
+class KeysetPaginator:
+    """
+    Cursor-based paginator over a queryset ordered by (-created_date, -id)
+
+    ``count`` is served from the cache and keyed on the query and the global
+    settings version, which is bumped whenever a Listing or Construction changes.
+    """
+
+    def __init__(self, object_list, per_page, cache_timeout=300):
+        self.object_list = object_list.order_by(*KEY_ORDERING)
+        self.per_page = int(per_page)
+        self.cache_timeout = cache_timeout
+
+    def _cache_key(self, name):
+        query_hash = hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+        return f'properties:keyset:{name}:{get_settings_version()}:{query_hash}:{self.per_page}'
+
+    @property
+    def count(self):
+        return cache.get_or_set(self._cache_key('count'), self.object_list.count, self.cache_timeout)
+
+    @property
+    def num_pages(self):
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, cursor=None):
+        """Return the page addressed by cursor, or the first page if it is missing or invalid"""
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return self._forward(None, 1)
+        direction, key, number = decoded
+        if direction == 'p':
+            return self._backward(key, number)
+        return self._forward(key, number)
+
+    def _forward(self, key, number):
+        qs = self.object_list
+        if key is not None:
+            created_date, pk = key
+            qs = qs.filter(Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=pk))
+        rows = list(qs[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page], number, self, has_next, key is not None)
+
+    def _backward(self, key, number):
+        created_date, pk = key
+        qs = self.object_list.filter(
+            Q(created_date__gt=created_date) | Q(created_date=created_date, id__gt=pk)
+        ).order_by('created_date', 'id')
+        rows = list(qs[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return KeysetPage(rows, number if has_previous else 1, self, True, has_previous)
+
+    def page_boundaries(self):
+        """
+        Keys of the last row of each page, read in one narrow pass over the
+        (created_date, id) columns and cached like ``count``
+        """
+        def compute():
+            keys = self.object_list.values_list('created_date', 'id')
+            return [key for i, key in enumerate(keys.iterator(), 1) if i % self.per_page == 0]
+        return cache.get_or_set(self._cache_key('boundaries'), compute, self.cache_timeout)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1 or number > self.num_pages:
+            raise EmptyPage('That page contains no results')
+        return number
+
+    def page(self, number):
+        """Numbered access (used by the sitemap framework) via seek on cached boundaries"""
+        number = self.validate_number(number)
+        key = None
+        if number > 1:
+            boundaries = self.page_boundaries()
+            if number - 2 >= len(boundaries):
+                raise EmptyPage('That page contains no results')
+            key = boundaries[number - 2]
+        return self._forward(key, number)
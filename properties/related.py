@@ -0,0 +1,246 @@
+"""
+Precomputed related listings (RelatedListing)
+
+Listings are compared on their location words, property type, TRY price
+band and area band; only listings with the same status (sale/rent) are
+related. The location score weights every shared word by its rarity, so a
+shared district counts more than a shared city, and divides by the
+listing's own location weight: "Moda, Kadıköy, İstanbul" is related to
+"Kadıköy / İstanbul" although the strings differ.
+
+Type and bands only take a few values, so listings are grouped by that
+profile and the profile scores are computed once per pair of profiles. A
+listing is scored against the listings sharing one of its location words
+(an inverted index, rarest words first, bounded by MAX_CANDIDATES) plus the
+best scoring profiles, never against the whole table.
+
+rebuild() recomputes every listing (nightly and from the
+rebuild_related_listings command); refresh() recomputes the listings saved
+since their last computation, the lists they appeared in and the lists
+they now enter (every minute).
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from . import page_cache
+from .autocomplete import WORD_RE, ascii_fold
+from .facets import AREA_BANDS, PRICE_BANDS, band_index
+
+logger = logging.getLogger(__name__)
+
+# Related listings stored per listing; more than the detail page shows so it
+# can skip ones deactivated since the last computation
+RELATED_COUNT = 6
+WEIGHTS = {'location': 4.0, 'property_type': 2.0, 'price': 1.5, 'area': 1.0}
+# Listings sharing a location word that are scored per listing
+MAX_CANDIDATES = 200
+# More stale listings than this are cheaper to handle with a full rebuild
+REBUILD_THRESHOLD = 500
+
+FEATURE_FIELDS = ('pk', 'location', 'property_type', 'status', 'price_try', 'area')
+
+
+def location_tokens(location):
+    """Words of a location, case and accent folded"""
+    return frozenset(WORD_RE.findall(ascii_fold(location or '')))
+
+
+def _band_score(first, second):
+    """1 for the same band, 0.5 for neighbouring bands"""
+    if first is None or second is None:
+        return 0.0
+    return max(0.0, 1 - abs(first - second) / 2)
+
+
+def profile_score(first, second):
+    """Similarity of two (property type, price band, area band) profiles"""
+    return (
+        WEIGHTS['property_type'] * (first[0] == second[0])
+        + WEIGHTS['price'] * _band_score(first[1], second[1])
+        + WEIGHTS['area'] * _band_score(first[2], second[2])
+    )
+
+
+class RelatedScorer:
+    """Similarity of the active listings, from one query over their features"""
+
+    def __init__(self, rows):
+        self.status = {}
+        self.tokens = {}
+        self.profiles = {}
+        self.postings = defaultdict(list)  # (status, token) -> pks, newest first
+        self.members = defaultdict(list)  # (status, profile) -> pks, newest first
+        for pk, location, property_type, status, price_try, area in sorted(rows, key=lambda row: -row[0]):
+            profile = (property_type, band_index(PRICE_BANDS, price_try), band_index(AREA_BANDS, area))
+            self.status[pk], self.profiles[pk] = status, profile
+            self.tokens[pk] = location_tokens(location)
+            for token in self.tokens[pk]:
+                self.postings[(status, token)].append(pk)
+            self.members[(status, profile)].append(pk)
+
+        frequency = Counter()
+        for (_, token), pks in self.postings.items():
+            frequency[token] += len(pks)
+        total = len(self.status)
+        self.rarity = {token: math.log(1 + total / count) for token, count in frequency.items()}
+
+        # Scores of the profile pairs, and the other profiles of the same
+        # status best first per profile
+        self._profile_scores = {}
+        self._ranked_profiles = {}
+        by_status = defaultdict(list)
+        for status, profile in self.members:
+            by_status[status].append(profile)
+        for status, profiles in by_status.items():
+            for profile in profiles:
+                for other in profiles:
+                    self._profile_scores[(profile, other)] = profile_score(profile, other)
+                self._ranked_profiles[(status, profile)] = sorted(
+                    profiles, key=lambda other: -self._profile_scores[(profile, other)]
+                )
+
+    @classmethod
+    def load(cls):
+        from .models import Listing
+
+        return cls(Listing.objects.filter(is_active=True).values_list(*FEATURE_FIELDS))
+
+    def _location_weight(self, pk):
+        return sum(self.rarity[token] for token in self.tokens[pk])
+
+    def score(self, pk, other):
+        """Similarity of another listing to a listing (0 across statuses)"""
+        if self.status[pk] != self.status[other]:
+            return 0.0
+        location = 0.0
+        weight = self._location_weight(pk)
+        if weight:
+            location = sum(self.rarity[token] for token in self.tokens[pk] & self.tokens[other]) / weight
+        return WEIGHTS['location'] * location + self._profile_scores[(self.profiles[pk], self.profiles[other])]
+
+    def candidates(self, pk):
+        """{other pk: shared location weight} of the listings sharing a location word"""
+        status = self.status[pk]
+        shared = Counter()
+        for token in sorted(self.tokens[pk], key=lambda token: -self.rarity[token]):
+            budget = MAX_CANDIDATES - len(shared)
+            if budget <= 0:
+                break
+            rarity = self.rarity[token]
+            for other in islice(self.postings[(status, token)], budget + 1):
+                shared[other] += rarity
+        shared.pop(pk, None)
+        return shared
+
+    def top(self, pk, limit=RELATED_COUNT):
+        """[(other pk, score)] of the most similar listings, best first"""
+        status, profile = self.status[pk], self.profiles[pk]
+        factor = WEIGHTS['location'] / (self._location_weight(pk) or 1.0)
+        profiles, profile_scores = self.profiles, self._profile_scores
+        scores = {
+            other: factor * shared + profile_scores[(profile, profiles[other])]
+            for other, shared in self.candidates(pk).items()
+        }
+        # Listings without a common location word only score on their profile
+        filled = 0
+        for other_profile in self._ranked_profiles[(status, profile)]:
+            if filled >= limit:
+                break
+            for other in self.members[(status, other_profile)]:
+                if other != pk and other not in scores:
+                    scores[other] = profile_scores[(profile, other_profile)]
+                    filled += 1
+                    if filled >= limit:
+                        break
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+def _entries(scorer, pks):
+    from .models import RelatedListing
+
+    return [
+        RelatedListing(listing_id=pk, related_id=other, score=score, rank=rank)
+        for pk in pks if pk in scorer.status
+        for rank, (other, score) in enumerate(scorer.top(pk))
+    ]
+
+
+def _store(scorer, pks, now):
+    """Replace the stored related listings of some listings"""
+    from .models import Listing, RelatedListing
+
+    pks = list(pks)
+    entries = _entries(scorer, pks)
+    with transaction.atomic():
+        RelatedListing.objects.filter(listing_id__in=pks).delete()
+        RelatedListing.objects.bulk_create(entries, batch_size=5000)
+        Listing.objects.filter(pk__in=pks).update(related_updated_date=now)
+    page_cache.bump(*(page_cache.listing_group(pk) for pk in pks))
+
+
+def rebuild():
+    """Recompute the related listings of every listing; returns the count"""
+    from .models import Listing, RelatedListing
+
+    now = timezone.now()
+    scorer = RelatedScorer.load()
+    entries = _entries(scorer, scorer.status)
+    with transaction.atomic():
+        RelatedListing.objects.all().delete()
+        RelatedListing.objects.bulk_create(entries, batch_size=5000)
+        Listing.objects.update(related_updated_date=now)
+    page_cache.bump(*(page_cache.listing_group(pk) for pk in scorer.status))
+    logger.info(f"Related listings rebuilt for {len(scorer.status)} listings")
+    return len(scorer.status)
+
+
+def stale_listings():
+    """Listings (active or not) saved since their related listings were computed"""
+    from .models import Listing
+
+    return Listing.objects.filter(
+        Q(related_updated_date__isnull=True) | Q(related_updated_date__lt=F('updated_date'))
+    )
+
+
+def refresh(limit=REBUILD_THRESHOLD):
+    """
+    Incremental refresh for the stale listings: their own lists, the lists
+    they appeared in and the lists they now rank in. Returns the number of
+    recomputed listings.
+    """
+    from .models import RelatedListing
+
+    now = timezone.now()
+    stale = list(stale_listings().values_list('pk', flat=True)[:limit + 1])
+    if not stale:
+        return 0
+    if len(stale) > limit:
+        return rebuild()
+
+    scorer = RelatedScorer.load()
+    affected = set(stale)
+    affected.update(RelatedListing.objects.filter(related_id__in=stale).values_list('listing_id', flat=True))
+    for pk in stale:
+        if pk not in scorer.status:
+            continue
+        candidates = [other for other in scorer.candidates(pk) if other not in affected]
+        thresholds = {
+            row['listing_id']: row
+            for row in RelatedListing.objects.filter(listing_id__in=candidates)
+            .values('listing_id').annotate(lowest=Min('score'), total=Count('pk'))
+        }
+        for other in candidates:
+            row = thresholds.get(other)
+            if row is None or row['total'] < RELATED_COUNT or scorer.score(other, pk) > row['lowest']:
+                affected.add(other)
+
+    _store(scorer, affected, now)
+    return len(affected)
@@ -1,44 +1,262 @@
 """
 Newsletter Scheduler Service
 Automatically sends scheduled newsletters using APScheduler
+
+The scheduler may be started in several processes (gunicorn workers, the
+dedicated `manage.py run_scheduler` process), but only the process holding
+the leader lock runs the jobs: a PostgreSQL session advisory lock, or an
+exclusive file lock on other databases. If the leader dies its lock is
+released and another process takes over on its next tick.
 """
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from django.conf import settings
+from django.db import connections
 from django.utils import timezone
+from functools import wraps
 import logging
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
 scheduler = BackgroundScheduler(timezone=str(timezone.get_current_timezone()))
 
+# Application-wide key for pg_try_advisory_lock
+SCHEDULER_LOCK_ID = 7315420196
+
+
+class LeaderLock:
+    """
+    Non-blocking, process-wide scheduler leadership
+
+    On PostgreSQL the advisory lock is held on a dedicated connection that
+    Django's request cycle never closes; the server releases it when the
+    process exits. A process that is not the leader keeps that connection to
+    retry on, rather than connecting again on every job tick. Elsewhere (and behind a transaction pooler) an exclusive
+    flock on SCHEDULER_LOCK_FILE is used, which only coordinates processes on
+    the same host.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self._connection = None
+        self._probe = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def held(self):
+        return self._connection is not None or self._file is not None
+
+    def acquire(self):
+        """Return True if this process is (or has just become) the leader"""
+        with self._lock:
+            if self._connection is not None and not self._connection_alive():
+                logger.warning("Scheduler leader lock connection lost, re-electing")
+                self._close_connection()
+            if self.held:
+                return True
+            # Session advisory locks do not survive pgbouncer transaction pooling
+            if connections[self.using].vendor == 'postgresql' and settings.DB_POOL_MODE != 'transaction':
+                return self._acquire_advisory_lock()
+            return self._acquire_file_lock()
+
+    def release(self):
+        with self._lock:
+            self._close_connection()
+            self._close_probe()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _acquire_advisory_lock(self):
+        if self._probe is None:
+            wrapper = connections[self.using]
+            self._probe = wrapper.get_new_connection(wrapper.get_connection_params())
+            self._probe.autocommit = True
+        try:
+            with self._probe.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [SCHEDULER_LOCK_ID])
+                acquired = cursor.fetchone()[0]
+        except Exception:
+            # Reconnect on the next tick
+            self._close_probe()
+            raise
+        if acquired:
+            # The lock lives on the session that took it
+            self._connection, self._probe = self._probe, None
+            logger.info(f"Process {os.getpid()} is the scheduler leader (advisory lock)")
+        return acquired
+
+    def _acquire_file_lock(self):
+        if fcntl is None:
+            # No locking primitive available: assume a single process
+            self._file = open(os.devnull)
+            return True
+        path = getattr(settings, 'SCHEDULER_LOCK_FILE', None) or os.path.join(tempfile.gettempdir(), 'realinvest-scheduler.lock')
+        lock_file = open(path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        logger.info(f"Process {os.getpid()} is the scheduler leader (file lock {path})")
+        return True
+
+    def _connection_alive(self):
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _close_probe(self):
+        if self._probe is not None:
+            try:
+                self._probe.close()
+            except Exception:
+                pass
+            self._probe = None
+
+
+leader_lock = LeaderLock()
+
+
+def leader_only(func):
+    """Run a scheduler job only in the process holding the leader lock"""
+    @wraps(func)
+    def wrapper():
+        try:
+            if not leader_lock.acquire():
+                return
+        except Exception as e:
+            logger.error(f"Scheduler leader election failed: {str(e)}")
+            return
+        func()
+    return wrapper
+
 
 def check_and_send_newsletters():
     """
-    Check for scheduled newsletters and send them if time has come
+    Claim and send due scheduled newsletters, and resume campaigns whose send
+    was interrupted
     This function runs every minute
     """
-    from properties.models import Newsletter
-    
-    now = timezone.now()
+    from properties.newsletter import claim_next_newsletter
     
-    # Get all scheduled newsletters whose time has come
-    newsletters = Newsletter.objects.filter(
-        status='scheduled',
-        scheduled_date__lte=now
-    )
-    
-    for newsletter in newsletters:
-        logger.info(f"Processing scheduled newsletter: {newsletter.title}")
+    # Campaigns are claimed one at a time so each claim's heartbeat is fresh
+    # when its send starts
+    while True:
+        claimed = claim_next_newsletter()
+        if claimed is None:
+            break
+        newsletter, resume = claimed
+        logger.info(f"Processing {'interrupted' if resume else 'scheduled'} newsletter: {newsletter.title}")
         
         try:
             # Call the background send method
-            newsletter._send_newsletter_background()
+            newsletter._send_newsletter_background(resume=resume)
             logger.info(f"Successfully sent newsletter: {newsletter.title}")
         except Exception as e:
             logger.error(f"Error sending newsletter {newsletter.title}: {str(e)}")
 
 
+def send_outbox_emails():
+    """
+    Send queued contact and inquiry emails
+    This function runs every 30 seconds
+    """
+    from properties.mail import drain_outbox
+    
+    try:
+        sent = drain_outbox()
+        if sent:
+            logger.info(f"Sent {sent} outbox email(s)")
+    except Exception as e:
+        logger.error(f"Error draining email outbox: {str(e)}")
+
+
+def process_image_jobs():
+    """
+    Optimize uploaded images whose background job was not run
+    (worker restart, crash)
+    This function runs every minute
+    """
+    from properties.image_pipeline import process_pending_jobs
+    
+    try:
+        processed = process_pending_jobs()
+        if processed:
+            logger.info(f"Optimized {processed} queued image(s)")
+    except Exception as e:
+        logger.error(f"Error processing image jobs: {str(e)}")
+
+
+def reconcile_content_stats():
+    """
+    Correct the denormalized active counts if they drifted (raw SQL,
+    QuerySet.update() outside update_queryset)
+    This function runs every hour
+    """
+    from properties.content_stats import reconcile
+    from properties.snapshot import bump_settings_version
+    
+    try:
+        corrected = reconcile()
+        if corrected:
+            bump_settings_version()
+            logger.info(f"Corrected {corrected} content stat(s)")
+    except Exception as e:
+        logger.error(f"Error reconciling content stats: {str(e)}")
+
+
+def refresh_related_listings():
+    """
+    Recompute the related listings of the listings saved since their last
+    computation and of the listings they affect
+    This function runs every minute
+    """
+    from properties.related import refresh
+    
+    try:
+        refreshed = refresh()
+        if refreshed:
+            logger.info(f"Refreshed related listings of {refreshed} listing(s)")
+    except Exception as e:
+        logger.error(f"Error refreshing related listings: {str(e)}")
+
+
+def rebuild_related_listings():
+    """
+    Recompute the related listings of every listing (exchange rate changes
+    and bulk updates do not mark listings stale)
+    This function runs every day
+    """
+    from properties.related import rebuild
+    
+    try:
+        rebuild()
+    except Exception as e:
+        logger.error(f"Error rebuilding related listings: {str(e)}")
+
+
 def start_scheduler():
     """
     Start the background scheduler
@@ -50,13 +268,56 @@ def start_scheduler():
     
     # Add job to check newsletters every minute
     scheduler.add_job(
-        check_and_send_newsletters,
+        leader_only(check_and_send_newsletters),
         trigger=IntervalTrigger(minutes=1),
         id='newsletter_check',
         name='Check and send scheduled newsletters',
         replace_existing=True,
     )
     
+    # Add job to send queued notification emails
+    scheduler.add_job(
+        leader_only(send_outbox_emails),
+        trigger=IntervalTrigger(seconds=30),
+        id='outbox_send',
+        name='Send queued outbox emails',
+        replace_existing=True,
+    )
+    
+    # Add job to pick up image optimizations left behind
+    scheduler.add_job(
+        leader_only(process_image_jobs),
+        trigger=IntervalTrigger(minutes=1),
+        id='image_processing',
+        name='Process queued image optimizations',
+        replace_existing=True,
+    )
+    
+    # Add job to reconcile the denormalized active counts
+    scheduler.add_job(
+        leader_only(reconcile_content_stats),
+        trigger=IntervalTrigger(hours=1),
+        id='content_stats_reconcile',
+        name='Reconcile content stats',
+        replace_existing=True,
+    )
+    
+    # Add jobs to keep the precomputed related listings fresh
+    scheduler.add_job(
+        leader_only(refresh_related_listings),
+        trigger=IntervalTrigger(minutes=1),
+        id='related_listings_refresh',
+        name='Refresh stale related listings',
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        leader_only(rebuild_related_listings),
+        trigger=IntervalTrigger(days=1),
+        id='related_listings_rebuild',
+        name='Rebuild related listings',
+        replace_existing=True,
+    )
+    
     scheduler.start()
     logger.info("Newsletter scheduler started - checking every minute")
 
@@ -68,3 +329,4 @@ def stop_scheduler():
     if scheduler.running:
         scheduler.shutdown()
         logger.info("Newsletter scheduler stopped")
+    leader_lock.release()
@@ -0,0 +1,61 @@
+"""
+Full-text search for listings
+
+On PostgreSQL listings carry a stored ``search_vector`` (Turkish stemming,
+weighted title > location > description) backed by a GIN index, and results
+are ranked. Other databases (SQLite in development) fall back to the old
+``icontains`` matching.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q
+
+SEARCH_CONFIG = 'turkish'
+
+
+def search_enabled():
+    """Full-text search needs PostgreSQL"""
+    return connection.vendor == 'postgresql'
+
+
+def listing_search_vector():
+    """Weighted search vector expression for Listing rows"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('location', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(queryset):
+    """
+    Recompute search_vector for the given Listing queryset in one UPDATE
+    (no-op outside PostgreSQL)
+    """
+    if not search_enabled():
+        return 0
+    return queryset.update(search_vector=listing_search_vector())
+
+
+def search_listings(queryset, query):
+    """
+    Filter a Listing queryset by a user search string
+
+    Returns the queryset ranked by relevance (then newest first) on
+    PostgreSQL, or filtered with icontains elsewhere.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if not search_enabled():
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(location__icontains=query)
+        )
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-rank', '-created_date', '-id')
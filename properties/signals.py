@@ -1,144 +1,110 @@
 """
-Django signals for automatic image optimization
+Django signals for automatic image optimization and settings cache invalidation
 """
-from django.db.models.signals import pre_save
+import copy
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from .models import (
     Listing, ListingImage, Construction, ConstructionImage,
-    BannerImage, CustomSection, ReferenceImage, SEOSettings, SiteSettings
+    BannerImage, CustomSection, ReferenceImage, SEOSettings, SiteSettings,
+    About, PopupSettings, NavigationSettings, Reference, ReferenceVideo, VisibleCustomSection, ExchangeRate
+)
+from . import autocomplete, content_stats, exchange_rates
+from .image_pipeline import enqueue_images, image_fields
+from .page_cache import invalidate_instance
+from .search import update_search_vector
+from .snapshot import bump_settings_version
+
+
+# Models with images optimized by the background pipeline (see image_pipeline.IMAGE_SPECS)
+IMAGE_MODELS = (
+    Listing, ListingImage, Construction, ConstructionImage,
+    BannerImage, CustomSection, ReferenceImage, SEOSettings, SiteSettings,
+)
+
+
+def queue_image_processing(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Queue WebP optimization of newly stored images; the request only stores the original"""
+    if raw:
+        return
+    if update_fields is not None and not set(image_fields(sender)).intersection(update_fields):
+        return
+    enqueue_images(instance)
+
+
+for _model in IMAGE_MODELS:
+    post_save.connect(queue_image_processing, sender=_model, dispatch_uid=f'image_processing_{_model.__name__}')
+
+
+SEARCH_FIELDS = {'title', 'location', 'description'}
+
+
+@receiver(post_save, sender=Listing)
+def refresh_listing_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text search vector in sync with the listing text"""
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    update_search_vector(Listing.objects.filter(pk=instance.pk))
+
+
+# Active counts per model/type/status (see content_stats.py); connected before
+# the snapshot receivers so a rebuilt snapshot already sees the new counts
+for _model in (Listing, Construction):
+    pre_save.connect(content_stats.remember_previous, sender=_model, dispatch_uid=f'content_stats_pre_save_{_model.__name__}')
+    post_save.connect(content_stats.track_save, sender=_model, dispatch_uid=f'content_stats_save_{_model.__name__}')
+    post_delete.connect(content_stats.track_delete, sender=_model, dispatch_uid=f'content_stats_delete_{_model.__name__}')
+
+
+# Search-as-you-type index of this process (see autocomplete.py)
+pre_save.connect(autocomplete.remember_previous, sender=Listing, dispatch_uid='autocomplete_pre_save')
+post_save.connect(autocomplete.track_save, sender=Listing, dispatch_uid='autocomplete_save')
+post_delete.connect(autocomplete.track_delete, sender=Listing, dispatch_uid='autocomplete_delete')
+
+
+# Listing.price_try follows the exchange rates (see exchange_rates.py)
+post_save.connect(exchange_rates.rate_changed, sender=ExchangeRate, dispatch_uid='exchange_rate_save')
+post_delete.connect(exchange_rates.rate_changed, sender=ExchangeRate, dispatch_uid='exchange_rate_delete')
+
+
+# Models whose rows feed the about_info context processor snapshot, plus the
+# rest of the public page content: the shared version also validates the
+# ETags of conditional GETs (see conditional.py)
+SNAPSHOT_MODELS = (
+    About, SiteSettings, PopupSettings, NavigationSettings, Listing, Construction,
+    ListingImage, ConstructionImage, BannerImage, CustomSection, VisibleCustomSection,
+    Reference, ReferenceImage, ReferenceVideo, SEOSettings,
 )
-from .utils import optimize_image
-
-
-@receiver(pre_save, sender=Listing)
-def optimize_listing_image(sender, instance, **kwargs):
-    """Convert listing main image to WebP"""
-    if instance.main_image and hasattr(instance.main_image, 'file'):
-        if not instance.main_image.name.endswith('.webp'):
-            instance.main_image = optimize_image(
-                instance.main_image,
-                max_width=1920,
-                max_height=1080,
-                quality=85
-            )
-
-
-@receiver(pre_save, sender=ListingImage)
-def optimize_listing_gallery_image(sender, instance, **kwargs):
-    """Convert listing gallery images to WebP"""
-    if instance.image and hasattr(instance.image, 'file'):
-        if not instance.image.name.endswith('.webp'):
-            instance.image = optimize_image(
-                instance.image,
-                max_width=1920,
-                max_height=1080,
-                quality=85
-            )
-
-
-@receiver(pre_save, sender=Construction)
-def optimize_construction_image(sender, instance, **kwargs):
-    """Convert construction main image to WebP"""
-    if instance.main_image and hasattr(instance.main_image, 'file'):
-        if not instance.main_image.name.endswith('.webp'):
-            instance.main_image = optimize_image(
-                instance.main_image,
-                max_width=1920,
-                max_height=1080,
-                quality=85
-            )
-
-
-@receiver(pre_save, sender=ConstructionImage)
-def optimize_construction_gallery_image(sender, instance, **kwargs):
-    """Convert construction gallery images to WebP"""
-    if instance.image and hasattr(instance.image, 'file'):
-        if not instance.image.name.endswith('.webp'):
-            instance.image = optimize_image(
-                instance.image,
-                max_width=1920,
-                max_height=1080,
-                quality=85
-            )
-
-
-@receiver(pre_save, sender=BannerImage)
-def optimize_banner_image(sender, instance, **kwargs):
-    """Convert banner images to WebP"""
-    if instance.image and hasattr(instance.image, 'file'):
-        if not instance.image.name.endswith('.webp'):
-            instance.image = optimize_image(
-                instance.image,
-                max_width=1920,
-                max_height=1080,
-                quality=90  # Higher quality for banner images
-            )
-
-
-@receiver(pre_save, sender=CustomSection)
-def optimize_custom_section_images(sender, instance, **kwargs):
-    """Convert custom section images to WebP"""
-    # Main image
-    if instance.main_image and hasattr(instance.main_image, 'file'):
-        if not instance.main_image.name.endswith('.webp'):
-            instance.main_image = optimize_image(
-                instance.main_image,
-                max_width=1920,
-                max_height=1080,
-                quality=85
-            )
-    
-    # Card images
-    for i in range(1, 4):
-        card_image = getattr(instance, f'card_image_{i}', None)
-        if card_image and hasattr(card_image, 'file'):
-            if not card_image.name.endswith('.webp'):
-                setattr(
-                    instance,
-                    f'card_image_{i}',
-                    optimize_image(card_image, max_width=800, max_height=600, quality=85)
-                )
-
-
-@receiver(pre_save, sender=ReferenceImage)
-def optimize_reference_image(sender, instance, **kwargs):
-    """Convert reference images to WebP"""
-    if instance.image and hasattr(instance.image, 'file'):
-        if not instance.image.name.endswith('.webp'):
-            instance.image = optimize_image(
-                instance.image,
-                max_width=1920,
-                max_height=1080,
-                quality=85
-            )
-
-
-@receiver(pre_save, sender=SEOSettings)
-def optimize_seo_og_image(sender, instance, **kwargs):
-    """Convert SEO Open Graph images to WebP"""
-    if instance.og_image and hasattr(instance.og_image, 'file'):
-        if not instance.og_image.name.endswith('.webp'):
-            instance.og_image = optimize_image(
-                instance.og_image,
-                max_width=1200,
-                max_height=630,  # Standard OG image size
-                quality=90
-            )
-
-
-@receiver(pre_save, sender=SiteSettings)
-def optimize_site_settings_images(sender, instance, **kwargs):
-    """Convert site settings images (logo only) to WebP - Skip favicon (.ico files)"""
-    # Logo
-    if instance.logo and hasattr(instance.logo, 'file'):
-        if not instance.logo.name.endswith('.webp'):
-            instance.logo = optimize_image(
-                instance.logo,
-                max_width=500,
-                max_height=500,
-                quality=90
-            )
-    
-    # Favicon - DO NOT convert .ico files to WebP
-    # .ico files should remain in their original format for browser compatibility
-    # No conversion needed for favicon
+
+
+def invalidate_site_snapshot(sender, **kwargs):
+    """
+    Bump the shared settings version so every worker rebuilds its snapshot;
+    after the commit, or a concurrent rebuild would store the old rows under
+    the new version
+    """
+    transaction.on_commit(bump_settings_version)
+
+
+for _model in SNAPSHOT_MODELS:
+    post_save.connect(invalidate_site_snapshot, sender=_model, dispatch_uid=f'snapshot_save_{_model.__name__}')
+    post_delete.connect(invalidate_site_snapshot, sender=_model, dispatch_uid=f'snapshot_delete_{_model.__name__}')
+
+
+def invalidate_cached_pages(sender, instance, raw=False, **kwargs):
+    """
+    Drop only the cached pages rendered from the changed row (see
+    page_cache.groups_for), once committed so no page is rendered from the
+    old rows under the new versions
+    """
+    if raw:
+        return
+    # delete() clears the pk of the instance before the callback runs
+    changed = copy.copy(instance)
+    transaction.on_commit(lambda: invalidate_instance(changed))
+
+
+for _model in SNAPSHOT_MODELS:
+    post_save.connect(invalidate_cached_pages, sender=_model, dispatch_uid=f'page_cache_save_{_model.__name__}')
+    post_delete.connect(invalidate_cached_pages, sender=_model, dispatch_uid=f'page_cache_delete_{_model.__name__}')
@@ -2,6 +2,7 @@ from django.contrib.sitemaps import Sitemap
 from django.urls import reverse
 from django.conf import settings
 from .models import Listing, Construction
+from .pagination import KeysetPaginator
 
 
 class ListingSitemap(Sitemap):
@@ -14,6 +15,10 @@ class ListingSitemap(Sitemap):
     def items(self):
         return Listing.objects.filter(is_active=True)
 
+    @property
+    def paginator(self):
+        return KeysetPaginator(self._items(), self.limit)
+
     def lastmod(self, obj):
         return obj.updated_date
 
@@ -0,0 +1,112 @@
+"""
+Process-local snapshot of the global site settings
+
+The ``about_info`` context processor runs on every render. Instead of hitting
+the database each time, every worker process keeps one immutable snapshot of
+the settings singletons and rebuilds it lazily when the shared version key
+(stored in the Django cache, so all gunicorn workers see it) changes.
+"""
+import threading
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+
+SETTINGS_VERSION_KEY = 'properties:settings_version'
+
+SiteSnapshot = namedtuple('SiteSnapshot', [
+    'version',
+    'about',
+    'site_settings',
+    'popup_settings',
+    'nav_settings',
+    'listings_count',
+    'constructions_count',
+    'content_stats',
+])
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def get_settings_version():
+    """
+    Return the current shared settings version, creating one if missing
+    (e.g. after a cache restart or eviction)
+    """
+    version = cache.get(SETTINGS_VERSION_KEY)
+    if version is None:
+        cache.add(SETTINGS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(SETTINGS_VERSION_KEY)
+    return version
+
+
+def bump_settings_version():
+    """
+    Invalidate the snapshot in every worker process
+    """
+    global _snapshot
+    cache.set(SETTINGS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _snapshot = None
+
+
+def _build_snapshot(version):
+    """
+    Load the settings singletons and the denormalized active counts
+    (content_stats.py) from the database
+    The singleton getters may create rows (and so bump the version) on first use
+    """
+    from .content_stats import get_content_stats
+    from .models import About, SiteSettings, PopupSettings, NavigationSettings
+
+    try:
+        popup_settings = PopupSettings.get_settings()
+    except Exception:
+        popup_settings = None
+
+    try:
+        nav_settings = NavigationSettings.get_settings()
+    except Exception:
+        nav_settings = None
+
+    content_stats = get_content_stats()
+
+    return SiteSnapshot(
+        version=version,
+        about=About.objects.first(),
+        site_settings=SiteSettings.objects.first(),
+        popup_settings=popup_settings,
+        nav_settings=nav_settings,
+        listings_count=content_stats['listing']['all'],
+        constructions_count=content_stats['construction']['all'],
+        content_stats=content_stats,
+    )
+
+
+def get_site_snapshot():
+    """
+    Return the snapshot for the current settings version, rebuilding it
+    if another process (or this one) has bumped the version
+    """
+    global _snapshot
+    version = get_settings_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is not None and _snapshot.version == version:
+            return _snapshot
+        # Rebuild once more if the version moved while loading, so a change
+        # committed mid-build is not hidden behind the old version
+        for _ in range(2):
+            snapshot = _build_snapshot(version)
+            current = get_settings_version()
+            if current == version:
+                break
+            version = current
+        else:
+            # Still moving; serve this build but rebuild on the next request
+            version = None
+        _snapshot = snapshot._replace(version=version)
+        return _snapshot
@@ -0,0 +1,71 @@
+"""
+Template precompilation
+
+In production the template engine uses the cached loader, so every template
+is parsed once per worker. Many of them are only picked at request time
+through {% include %} by layout or homepage template name; warm_templates()
+compiles all project templates up front so no visitor pays for the first
+parse. It is called from wsgi.py before the worker accepts traffic.
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def layout_template_names():
+    """Template chosen for every layout/homepage template option -> option label"""
+    from .models import About, CustomSection
+
+    names = {}
+    for layout, label in CustomSection.LAYOUT_CHOICES:
+        names[f'properties/custom_sections/{layout}.html'] = f'CustomSection layout "{layout}" ({label})'
+    for template, label in About.HOMEPAGE_TEMPLATES:
+        names[f'properties/homepage_templates/{template}.html'] = f'About homepage template "{template}" ({label})'
+        names[f'headers/header_{template}.html'] = f'About header for "{template}" ({label})'
+    return names
+
+
+def project_template_names():
+    """Every template under the project template dirs and the project's own apps"""
+    directories = [str(directory) for directory in settings.TEMPLATES[0]['DIRS']]
+    for app_config in apps.get_app_configs():
+        app_templates = os.path.join(app_config.path, 'templates')
+        if app_config.path.startswith(str(settings.BASE_DIR)) and os.path.isdir(app_templates):
+            directories.append(app_templates)
+
+    names = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt')):
+                    names.add(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def compile_templates(names):
+    """Compile the templates through the engine's loaders; returns {name: error}"""
+    engine = engines['django']
+    errors = {}
+    for name in names:
+        try:
+            engine.get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            errors[name] = e
+    return errors
+
+
+def warm_templates():
+    """Compile every project template into the cached loader of this process"""
+    started = time.monotonic()
+    names = sorted(set(project_template_names()) | set(layout_template_names()))
+    errors = compile_templates(names)
+    for name, error in errors.items():
+        logger.error(f"Template {name} could not be compiled: {error}")
+    logger.info(f"Compiled {len(names) - len(errors)} templates in {time.monotonic() - started:.2f}s")
+    return len(names) - len(errors), errors
@@ -0,0 +1,51 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+def image_srcset(obj, field_name):
+    """
+    Return (src, srcset) for an image field using the object's
+    image_variants manifest; srcset is empty until variants exist
+    """
+    image = getattr(obj, field_name, None)
+    if not image:
+        return '', ''
+    entry = (getattr(obj, 'image_variants', None) or {}).get(field_name)
+    # Ignore a manifest written for a previous file of this field
+    if not entry or entry.get('source') != image.name:
+        return image.url, ''
+    candidates = [(int(width), image.storage.url(name)) for width, name in entry.get('variants', {}).items()]
+    if entry.get('width'):
+        candidates.append((entry['width'], image.url))
+    srcset = ', '.join(f'{url} {width}w' for width, url in sorted(candidates))
+    return image.url, srcset
+
+
+@register.simple_tag
+def responsive_image(obj, field_name, sizes='100vw', **attrs):
+    """
+    Render an <img> with srcset/sizes for a processed image field
+
+    Usage: {% responsive_image listing 'main_image' sizes='(min-width: 992px) 33vw, 100vw' class='card-img-top' alt=listing.image_alt_text %}
+    Extra keyword arguments become attributes; loading defaults to lazy.
+    """
+    src, srcset = image_srcset(obj, field_name)
+    if not src:
+        return ''
+    attributes = {'src': src}
+    if srcset:
+        attributes['srcset'] = srcset
+        attributes['sizes'] = sizes
+    attributes.setdefault('loading', 'lazy')
+    attributes.update({key: value for key, value in attrs.items() if value is not None})
+    attributes.setdefault('alt', '')
+    return format_html('<img{}>', flatatt(attributes))
+
+
+@register.simple_tag
+def srcset(obj, field_name):
+    """srcset value for an image field, e.g. for <link rel="preload" imagesrcset=...>"""
+    return image_srcset(obj, field_name)[1]
@@ -1,3 +1,1122 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import boto3
+from PIL import Image
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.contrib.auth.models import User
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+try:
+    import moto
+except ImportError:  # optional, only needed for the S3 command tests
+    moto = None
+
+from . import autocomplete
+from .autocomplete import autocomplete_index
+from .content_stats import get_content_stats, reconcile, update_queryset
+from .context_processors import about_info
+from .db_router import replica_reads_enabled
+from .exchange_rates import load_rates, recompute_price_try
+from .facets import facet_counts
+from .image_pipeline import process_pending_jobs
+from .mail import drain_outbox, get_site_email_connection, queue_email
+from .models import (
+    ContactMessage, CustomSection, ExchangeRate, ImageProcessingJob, Listing, ListingImage, NavigationSettings, Newsletter,
+    NewsletterDelivery, NewsletterLog, NewsletterSubscriber, OutboundEmail, Reference, RelatedListing, SiteSettings,
+)
+from .newsletter import UNSUBSCRIBE_PLACEHOLDER, DeliveryCheckpoint, claim_newsletter, claim_next_newsletter, deliver_newsletter
+from .pagination import KeysetPaginator
+from .related import rebuild, refresh, stale_listings
+from .scheduler import LeaderLock, check_and_send_newsletters
+from .search import search_listings
+from .template_warmup import layout_template_names, warm_templates
+from .views import filter_listings
+
+
+class AboutInfoSnapshotTests(TestCase):
+    """The about_info context processor is served from the settings snapshot"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+
+    def test_warm_cache_makes_no_queries(self):
+        about_info(self.request)
+        with self.assertNumQueries(0):
+            context = about_info(self.request)
+        self.assertEqual(context['listings_count'], 0)
+        self.assertEqual(context['template_class'], 'template1-active')
+
+    def test_save_invalidates_snapshot(self):
+        about_info(self.request)
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteSettings.objects.create(phone='123')
+        self.assertEqual(about_info(self.request)['global_site_settings'].phone, '123')
+
+        nav = NavigationSettings.get_settings()
+        nav.home_label = 'Anasayfa'
+        with self.captureOnCommitCallbacks(execute=True):
+            nav.save()
+        self.assertEqual(about_info(self.request)['nav_settings'].home_label, 'Anasayfa')
+
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+def make_image(name='test.webp', size=(64, 48), format='WEBP'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format=format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{format.lower()}')
+
+
+def make_listing(**kwargs):
+    defaults = {
+        'title': 'Deniz Manzaralı Daire',
+        'description': 'Merkezi konumda geniş daire',
+        'location': 'Kadıköy, İstanbul',
+        'price': 1000000,
+        'area': 120,
+        'main_image': make_image(),
+    }
+    defaults.update(kwargs)
+    return Listing.objects.create(**defaults)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ListingSearchTests(TestCase):
+    """search_listings falls back to icontains outside PostgreSQL"""
+
+    def test_fallback_matches_title_location_and_description(self):
+        by_title = make_listing(title='Bahçeli Villa', slug='bahceli-villa')
+        by_location = make_listing(title='Ofis', slug='ofis', location='Çankaya, Ankara')
+        make_listing(title='Arsa', slug='arsa', description='Yatırımlık arsa')
+
+        qs = Listing.objects.all()
+        self.assertEqual(list(search_listings(qs, 'bahçeli')), [by_title])
+        self.assertEqual(list(search_listings(qs, 'Ankara')), [by_location])
+        self.assertEqual(search_listings(qs, 'yatırımlık').count(), 1)
+        self.assertEqual(search_listings(qs, '  ').count(), 3)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class KeysetPaginatorTests(TestCase):
+    """Cursor pages walk the (created_date, id) ordering without gaps"""
+
+    @classmethod
+    def setUpTestData(cls):
+        created = timezone.now()
+        # Pairs share a created_date so the id tie-breaker is exercised
+        cls.listings = [
+            make_listing(slug=f'ilan-{i}', created_date=created - timedelta(days=i // 2))
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_forward_and_backward_walk(self):
+        paginator = KeysetPaginator(Listing.objects.all(), 3)
+        expected = list(Listing.objects.order_by('-created_date', '-id'))
+
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([obj for page in pages for obj in page], expected)
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(paginator.count, 7)
+
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertEqual(back.number, 2)
+        self.assertFalse(paginator.get_page(back.previous_cursor).has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        page = KeysetPaginator(Listing.objects.all(), 3).get_page('not-a-cursor')
+        self.assertEqual(page.number, 1)
+        self.assertFalse(page.has_previous())
+
+    def test_numbered_pages_for_sitemap(self):
+        paginator = KeysetPaginator(Listing.objects.all(), 3)
+        expected = list(Listing.objects.order_by('-created_date', '-id'))
+        self.assertEqual(list(paginator.page(3).object_list), expected[6:])
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+
+class HotPathIndexTests(TestCase):
+    """
+    EXPLAIN regression: the home and listings queries must be served by their
+    partial index, with enough rows that a sequential scan would be chosen
+    otherwise
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        types = [code for code, _ in Listing.PROPERTY_TYPES]
+        created = timezone.now()
+        Listing.objects.bulk_create([
+            Listing(
+                title=f'İlan {i}', slug=f'ilan-{i}', description='Açıklama',
+                location=f'Konum {i % 20}', price=1000 + i, price_try=1000 + i, area=100,
+                property_type=types[i % len(types)], status='sale' if i % 3 else 'rent',
+                is_active=i % 10 != 0, is_featured=i % 200 == 1,
+                created_date=created - timedelta(hours=i), main_image='listings/seed.webp',
+            )
+            for i in range(5000)
+        ], batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assert_uses_index(self, queryset, index, ordered=False):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertRegex(plan, rf'(Index (Only )?Scan( Backward)? using|Bitmap Index Scan on) {index}\b', plan)
+            if ordered:
+                # Rows come in index order: no sort of the matching rows
+                self.assertNotRegex(plan, r'(?m)^\W*Sort\b', plan)
+        else:
+            self.assertRegex(plan, rf'(SCAN|SEARCH) properties_listing USING (COVERING )?INDEX {index}\b', plan)
+
+    def test_home_queries(self):
+        # SQLite does not match a bare boolean condition ("is_featured") to an
+        # index column, so there only the recent index serves the featured list
+        featured_index = 'listing_active_featured_idx' if connection.vendor == 'postgresql' else 'listing_active_recent_idx'
+        self.assert_uses_index(Listing.objects.filter(is_active=True, is_featured=True)[:6], featured_index)
+        self.assert_uses_index(Listing.objects.filter(is_active=True)[:8], 'listing_active_recent_idx')
+
+    def test_listings_queries(self):
+        paginated = Listing.objects.order_by('-created_date', '-id')
+        self.assert_uses_index(paginated.filter(is_active=True)[:10], 'listing_active_recent_idx')
+        self.assert_uses_index(paginated.filter(is_active=True, status='rent')[:10], 'listing_active_status_idx')
+        self.assert_uses_index(
+            paginated.filter(is_active=True, property_type='villa', status='sale')[:10], 'listing_active_type_status_idx'
+        )
+
+    def test_range_and_sort_queries(self):
+        for query, index in (
+            ({'status': 'sale', 'min_price': 1100, 'max_price': 1300, 'sort': 'price_asc'}, 'listing_status_price_try_idx'),
+            ({'type': 'villa', 'status': 'sale', 'min_area': 50, 'sort': 'area_desc'}, 'listing_type_area_idx'),
+            ({'min_price': 5800, 'sort': 'price_asc'}, 'listing_active_price_try_idx'),
+        ):
+            listings_list = filter_listings(RequestFactory().get('/listings/', query))[0]
+            self.assert_uses_index(listings_list[:10], index)
+
+    def test_price_sorts_read_in_index_order(self):
+        # The DESC NULLS LAST indexes only exist on PostgreSQL (migration 0026)
+        desc = connection.vendor == 'postgresql'
+        for query, index in (
+            ({'sort': 'price_asc'}, 'listing_active_price_try_idx'),
+            ({'sort': 'price_desc'}, 'listing_active_price_desc_idx'),
+            ({'status': 'sale', 'sort': 'price_desc'}, 'listing_status_price_desc_idx'),
+            ({'type': 'villa', 'status': 'sale', 'sort': 'price_desc'}, 'listing_type_price_desc_idx'),
+        ):
+            if index.endswith('_desc_idx') and not desc:
+                continue
+            listings_list = filter_listings(RequestFactory().get('/listings/', query))[0]
+            self.assert_uses_index(listings_list[:10], index, ordered=True)
+
+
+class EmailOutboxTests(TestCase):
+    """Contact notifications are queued in the request and sent by the worker"""
+
+    def setUp(self):
+        cache.clear()
+        SiteSettings.objects.create(contact_email_recipients='a@example.com, b@example.com')
+
+    def test_contact_post_queues_email(self):
+        response = self.client.post(reverse('contact'), {
+            'name': 'Ayşe', 'email': 'ayse@example.com', 'subject': 'Bilgi', 'message': 'Merhaba',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.get_recipient_list(), ['a@example.com', 'b@example.com'])
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+        self.assertEqual(drain_outbox(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['a@example.com', 'b@example.com'])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'sent')
+
+    def test_failed_send_is_retried_with_backoff(self):
+        queued = queue_email('Konu', 'İçerik', ['a@example.com'])
+        with mock.patch('properties.mail.EmailMessage.send', side_effect=OSError('timeout')):
+            self.assertEqual(drain_outbox(), 0)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('pending', 1))
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        # Not due yet, so nothing is picked up
+        self.assertEqual(drain_outbox(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_site_smtp_connection_needs_credentials(self):
+        site_settings = SiteSettings(smtp_host='', smtp_username='site@example.com', smtp_password='sifre')
+        connection = get_site_email_connection(site_settings)
+        self.assertEqual((connection.host, connection.username), ('smtp.gmail.com', 'site@example.com'))
+        self.assertEqual(connection.timeout, settings.EMAIL_TIMEOUT)
+
+        site_settings.smtp_password = ''
+        self.assertNotIsInstance(get_site_email_connection(site_settings), SMTPEmailBackend)
+
+    def test_worker_killed_mid_batch_keeps_delivered_emails(self):
+        first = queue_email('Birinci', 'İçerik', ['a@example.com'])
+        second = queue_email('İkinci', 'İçerik', ['b@example.com'])
+        real_send = EmailMessage.send
+
+        def send_then_die(message, *args, **kwargs):
+            if message.subject == 'İkinci':
+                raise SystemExit
+            return real_send(message, *args, **kwargs)
+
+        with mock.patch('properties.mail.EmailMessage.send', autospec=True, side_effect=send_then_die):
+            with self.assertRaises(SystemExit):
+                drain_outbox()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, second.status), ('sent', 'sending'))
+
+        # The dead worker's claim is only taken over once stale
+        self.assertEqual(drain_outbox(), 0)
+        OutboundEmail.objects.filter(pk=second.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(drain_outbox(), 1)
+        self.assertEqual([message.subject for message in mail.outbox], ['Birinci', 'İkinci'])
+
+
+@override_settings(SITE_PROTOCOL='https', SITE_DOMAIN='example.com')
+class NewsletterDeliveryTests(TestCase):
+    """All send paths go through the pooled delivery engine"""
+
+    def setUp(self):
+        SiteSettings.objects.create(smtp_host='smtp.example.com', smtp_username='bulten@example.com', email_from='bulten@example.com')
+        self.subscribers = [
+            NewsletterSubscriber.objects.create(email=f'abone{i}@example.com', name=f'Abone {i}')
+            for i in range(7)
+        ]
+        NewsletterSubscriber.objects.create(email='pasif@example.com', name='Pasif', is_active=False)
+        self.newsletter = Newsletter.objects.create(title='Ekim', subject='Ekim Bülteni', content='<p>Yeni ilanlar</p>')
+        patcher = mock.patch('properties.newsletter.get_site_email_connection', side_effect=lambda site_settings: mail.get_connection())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sends_personalised_messages_with_worker_pool(self):
+        result = deliver_newsletter(self.newsletter, workers=3)
+
+        self.assertEqual((result.total, result.sent, result.failed), (7, 7, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(s.email for s in self.subscribers))
+        for message in mail.outbox:
+            subscriber = NewsletterSubscriber.objects.get(email=message.to[0])
+            html = message.alternatives[0][0]
+            self.assertIn(f'https://example.com/newsletter/unsubscribe/{subscriber.unsubscribe_token}/', html)
+            self.assertNotIn(UNSUBSCRIBE_PLACEHOLDER, html)
+            self.assertEqual(message.body, 'Yeni ilanlar')
+
+        self.newsletter.refresh_from_db()
+        self.assertEqual((self.newsletter.status, self.newsletter.sent_count), ('sent', 7))
+
+    def test_failures_are_counted(self):
+        original_send = mail.EmailMultiAlternatives.send
+
+        def flaky_send(message, *args, **kwargs):
+            if message.to[0] == 'abone3@example.com':
+                raise OSError('rejected')
+            return original_send(message, *args, **kwargs)
+
+        with mock.patch.object(mail.EmailMultiAlternatives, 'send', flaky_send):
+            result = deliver_newsletter(self.newsletter, workers=2)
+
+        self.assertEqual((result.sent, result.failed), (6, 1))
+        self.assertTrue(NewsletterLog.objects.filter(log_type='error', subscriber_email='abone3@example.com').exists())
+
+    def test_missing_smtp_settings_fails_campaign(self):
+        SiteSettings.objects.update(smtp_username='')
+        result = deliver_newsletter(self.newsletter)
+        self.assertIsNotNone(result.error)
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, 'failed')
+
+    def test_interrupted_campaign_resumes_from_checkpoint(self):
+        # A previous run recorded the first three subscribers before dying,
+        # one of them as failed
+        done = self.subscribers[:3]
+        NewsletterDelivery.objects.bulk_create([
+            NewsletterDelivery(newsletter=self.newsletter, subscriber=s, status='sent') for s in done[:2]
+        ] + [NewsletterDelivery(newsletter=self.newsletter, subscriber=done[2], status='failed')])
+        Newsletter.objects.filter(pk=self.newsletter.pk).update(
+            status='sending', total_recipients=7, updated_date=timezone.now() - timedelta(hours=1),
+        )
+
+        with override_settings(NEWSLETTER_CHECKPOINT_SIZE=2):
+            check_and_send_newsletters()
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(s.email for s in self.subscribers[2:]))
+        self.newsletter.refresh_from_db()
+        self.assertEqual((self.newsletter.status, self.newsletter.sent_count, self.newsletter.failed_count), ('sent', 7, 0))
+        self.assertEqual(self.newsletter.deliveries.count(), 7)
+
+    def test_heartbeat_is_refreshed_while_no_result_arrives(self):
+        flushed = threading.Event()
+        real_flush = DeliveryCheckpoint.flush
+
+        def flush(checkpoint):
+            real_flush(checkpoint)
+            flushed.set()
+
+        def stalled_send(message, *args, **kwargs):
+            # The SMTP server hangs until the campaign heartbeat was written
+            self.assertTrue(flushed.wait(5))
+            return 1
+
+        with override_settings(NEWSLETTER_HEARTBEAT_SECONDS=0), \
+                mock.patch.object(DeliveryCheckpoint, 'flush', flush), \
+                mock.patch.object(mail.EmailMultiAlternatives, 'send', stalled_send):
+            result = deliver_newsletter(self.newsletter, workers=1)
+        self.assertEqual(result.sent, 7)
+
+    def test_logs_are_buffered_and_successes_summarised(self):
+        with CaptureQueriesContext(connection) as ctx:
+            deliver_newsletter(self.newsletter, workers=2)
+
+        log_inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "properties_newsletterlog"')]
+        self.assertEqual(len(log_inserts), 1)
+        self.assertFalse(self.newsletter.logs.filter(subscriber_email__isnull=False).exists())
+        self.assertTrue(self.newsletter.logs.filter(log_type='success', message__contains='7/7').exists())
+
+        with override_settings(NEWSLETTER_LOG_RECIPIENTS=True, NEWSLETTER_LOG_BATCH_SIZE=3):
+            Newsletter.objects.filter(pk=self.newsletter.pk).update(status='draft')
+            self.newsletter.refresh_from_db()
+            deliver_newsletter(self.newsletter, workers=2)
+        self.assertEqual(self.newsletter.logs.filter(subscriber_email__isnull=False).count(), 7)
+
+
+class SchedulerLeaderTests(TestCase):
+    """Only one process runs the scheduler jobs and claims each campaign"""
+
+    def test_file_lock_elects_a_single_leader(self):
+        lock_path = f'{TEST_MEDIA_ROOT}/scheduler.lock'
+        with override_settings(SCHEDULER_LOCK_FILE=lock_path):
+            os.makedirs(TEST_MEDIA_ROOT, exist_ok=True)
+            first, second = LeaderLock(), LeaderLock()
+            self.assertTrue(first.acquire())
+            self.assertTrue(first.acquire())
+            self.assertFalse(second.acquire())
+            first.release()
+            self.assertTrue(second.acquire())
+            second.release()
+
+    def test_advisory_lock_retries_on_one_connection(self):
+        wrapper = mock.MagicMock(vendor='postgresql')
+        session = wrapper.get_new_connection.return_value
+        session.cursor.return_value.__enter__.return_value.fetchone.side_effect = [[False], [False], [True]]
+        lock = LeaderLock()
+        with mock.patch('properties.scheduler.connections', {'default': wrapper}), \
+                override_settings(DB_POOL_MODE='session'):
+            self.assertFalse(lock.acquire())
+            self.assertFalse(lock.acquire())
+            self.assertTrue(lock.acquire())
+        wrapper.get_new_connection.assert_called_once()
+        self.assertIs(lock._connection, session)
+        session.close.assert_not_called()
+
+    def test_due_campaign_is_claimed_once(self):
+        newsletter = Newsletter.objects.create(
+            title='Kasım', subject='Kasım Bülteni', content='<p>Yeni</p>',
+            status='scheduled', scheduled_date=timezone.now() - timedelta(minutes=1),
+        )
+        Newsletter.objects.create(
+            title='Aralık', subject='Aralık Bülteni', content='<p>Yeni</p>',
+            status='scheduled', scheduled_date=timezone.now() + timedelta(days=1),
+        )
+
+        claimed, resume = claim_next_newsletter()
+        self.assertEqual((claimed.pk, claimed.status, resume), (newsletter.pk, 'sending', False))
+        self.assertIsNone(claim_next_newsletter())
+
+        # The admin action cannot start it a second time either
+        self.assertFalse(claim_newsletter(newsletter))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, IMAGE_PROCESSING_MODE='sync')
+class ImagePipelineTests(TestCase):
+    """Uploads are stored as-is and optimized after the request"""
+
+    def test_upload_is_optimized_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            listing = make_listing(main_image=make_image('salon.png', size=(2400, 1600), format='PNG'))
+        original = listing.main_image.name
+        self.assertTrue(original.endswith('.png'))
+        self.assertEqual(ImageProcessingJob.status_for(listing), 'pending')
+
+        for callback in callbacks:
+            callback()
+
+        listing.refresh_from_db()
+        self.assertTrue(listing.main_image.name.endswith('.webp'))
+        self.assertFalse(listing.main_image.storage.exists(original))
+        with Image.open(listing.main_image.path) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (1620, 1080)))
+        self.assertEqual(ImageProcessingJob.status_for(listing), 'done')
+
+    def test_replaced_image_is_not_overwritten(self):
+        with self.captureOnCommitCallbacks():
+            listing = make_listing(main_image=make_image('eski.png', format='PNG'))
+        listing.main_image = make_image('yeni.webp')
+        listing.save()
+
+        # The dispatch was lost (worker restart); the recovery pass still runs it
+        # (the new upload gets its own job, for its variants)
+        self.assertEqual(process_pending_jobs(), 2)
+        listing.refresh_from_db()
+        self.assertTrue(listing.main_image.name.startswith('listings/yeni'))
+        job = ImageProcessingJob.objects.get(source_name__startswith='listings/eski')
+        self.assertEqual((job.status, job.result_name), ('done', ''))
+
+    def test_variants_are_listed_in_manifest_and_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = make_listing(main_image=make_image('bahce.webp', size=(1000, 500)))
+
+        listing.refresh_from_db()
+        entry = listing.image_variants['main_image']
+        self.assertEqual((entry['source'], entry['width']), (listing.main_image.name, 1000))
+        self.assertEqual(sorted(entry['variants'], key=int), ['320', '640', '960'])
+        self.assertTrue(all(listing.main_image.storage.exists(name) for name in entry['variants'].values()))
+
+        html = Template(
+            "{% load responsive_images %}{% responsive_image listing 'main_image' sizes='50vw' class='card-img-top' alt=listing.title %}"
+        ).render(Context({'listing': listing}))
+        self.assertIn(f'{listing.main_image.url} 1000w', html)
+        self.assertIn('_320w.webp 320w', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('loading="lazy"', html)
+
+        # A new upload makes the old manifest entry stale until it is processed
+        listing.main_image = make_image('yeni.webp')
+        listing.save()
+        html = Template("{% load responsive_images %}{% responsive_image listing 'main_image' %}").render(Context({'listing': listing}))
+        self.assertNotIn('srcset', html)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ConvertImagesCommandTests(TestCase):
+    """convert_images_to_webp converts in parallel and resumes from its checkpoint"""
+
+    def test_converts_with_pool_and_skips_completed_rows_on_rerun(self):
+        listings = [
+            make_listing(slug=f'png-{i}', main_image=make_image(f'ilan{i}.png', size=(2400, 1200), format='PNG'))
+            for i in range(3)
+        ]
+        checkpoint = os.path.join(TEST_MEDIA_ROOT, 'convert.json')
+        out = StringIO()
+
+        call_command('convert_images_to_webp', workers=2, checkpoint=checkpoint, stdout=out)
+
+        self.assertIn('Successfully converted 3 images', out.getvalue())
+        self.assertIn('images/sec', out.getvalue())
+        for listing in listings:
+            listing.refresh_from_db()
+            self.assertTrue(listing.main_image.name.endswith('.webp'))
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)['properties.listing'], listings[-1].pk)
+
+        # New non-WebP rows after the checkpoint are still picked up; older rows are not read again
+        Listing.objects.filter(pk=listings[0].pk).update(main_image='listings/eksik.png')
+        newer = make_listing(slug='png-new', main_image=make_image('yeni.png', format='PNG'))
+        out = StringIO()
+        call_command('convert_images_to_webp', workers=1, checkpoint=checkpoint, stdout=out)
+        self.assertIn('Successfully converted 1 images', out.getvalue())
+        newer.refresh_from_db()
+        self.assertTrue(newer.main_image.name.endswith('.webp'))
+
+
+
+@skipUnless(moto, 'moto is not installed')
+@override_settings(DEBUG=False)
+class UpdateS3CacheHeadersTests(TestCase):
+    """update_s3_cache_headers only copies objects whose headers differ"""
+
+    def setUp(self):
+        aws = moto.mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        env = mock.patch.dict(os.environ, {
+            'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test',
+            'AWS_STORAGE_BUCKET_NAME': 'medya', 'AWS_S3_REGION_NAME': 'us-east-1',
+            'AWS_S3_ENDPOINT_URL': 'https://s3.amazonaws.com',
+        })
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='medya')
+        self.s3.put_object(Bucket='medya', Key='media/listings/a.webp', Body=b'a', ContentType='image/webp',
+                           CacheControl='public, max-age=31536000, immutable', ACL='public-read')
+        self.s3.put_object(Bucket='medya', Key='media/listings/b.jpg', Body=b'b', ContentType='binary/octet-stream')
+        self.s3.put_object(Bucket='medya', Key='media/notes.txt', Body=b'c')
+        self.s3.put_object(Bucket='medya', Key='static/site.css', Body=b'd')
+        self.state_file = os.path.join(TEST_MEDIA_ROOT, 's3_state.json')
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('update_s3_cache_headers', concurrency=4, state_file=self.state_file, stdout=out, **options)
+        return out.getvalue()
+
+    def test_updates_only_mismatching_objects_and_remembers_them(self):
+        output = self.run_command(prefix='media/')
+        self.assertIn('Updated: 1', output)
+        self.assertIn('Already correct: 1', output)
+        head = self.s3.head_object(Bucket='medya', Key='media/listings/b.jpg')
+        self.assertEqual((head['CacheControl'], head['ContentType']), ('public, max-age=31536000, immutable', 'image/jpeg'))
+        # Outside the prefix: untouched
+        self.assertNotIn('CacheControl', self.s3.head_object(Bucket='medya', Key='static/site.css'))
+
+        with mock.patch('botocore.client.BaseClient._make_api_call', wraps=self.s3._make_api_call) as api:
+            output = self.run_command(prefix='media/')
+        self.assertIn('Skipped (state file): 2', output)
+        self.assertEqual([call.args[0] for call in api.call_args_list], ['ListObjectsV2'])
+
+    def test_private_object_with_right_headers_is_made_public(self):
+        self.s3.put_object(Bucket='medya', Key='media/listings/c.png', Body=b'c', ContentType='image/png',
+                           CacheControl='public, max-age=31536000, immutable')
+        output = self.run_command(prefix='media/listings/c')
+        self.assertIn('Updated: 1', output)
+        grants = self.s3.get_object_acl(Bucket='medya', Key='media/listings/c.png')['Grants']
+        self.assertIn(
+            ('http://acs.amazonaws.com/groups/global/AllUsers', 'READ'),
+            [(grant['Grantee'].get('URI'), grant['Permission']) for grant in grants],
+        )
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ConditionalGetTests(TestCase):
+    """Public pages answer revalidations with 304 before rendering"""
+
+    def setUp(self):
+        cache.clear()
+        self.listing = make_listing(slug='kosulu-ilan', main_image=make_image())
+        # The first render creates the settings singletons
+        self.client.get(reverse('home'))
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_home_is_not_rendered_again_until_content_changes(self):
+        response = self.client.get(reverse('home'))
+        self.assertIn('ETag', response)
+
+        with self.assertNumQueries(0):
+            not_modified = self.revalidate(reverse('home'), response)
+        self.assertEqual(not_modified.status_code, 304)
+
+        self.listing.title = 'Yeni Başlık'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        self.assertEqual(self.revalidate(reverse('home'), response).status_code, 200)
+
+    def test_listing_detail_validators(self):
+        url = self.listing.get_absolute_url()
+        response = self.client.get(url)
+        # Only the ETag validates: a row timestamp misses settings changes
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600)).status_code, 200)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        ListingImage.objects.create(listing=self.listing, image=make_image('galeri.webp'))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_exchange_rate_change_revalidates_listings(self):
+        make_listing(slug='dolar-ilan', price=50000, currency='USD')
+        url = reverse('listings') + '?sort=price_asc'
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            load_rates({'USD': Decimal('10')})
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertEqual([listing.slug for listing in changed.context['page_obj']], ['dolar-ilan', 'kosulu-ilan'])
+
+    def test_listings_etag_depends_on_filters(self):
+        all_listings = self.client.get(reverse('listings'))
+        rentals = self.client.get(reverse('listings'), {'status': 'rent'})
+        self.assertNotEqual(all_listings['ETag'], rentals['ETag'])
+        self.assertEqual(self.revalidate(reverse('listings'), all_listings).status_code, 304)
+
+    def test_pending_messages_disable_validation(self):
+        self.client.post(self.listing.get_absolute_url(), {'name': 'Ali', 'email': 'ali@example.com', 'message': 'Merhaba'})
+        response = self.client.get(self.listing.get_absolute_url())
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'Sorgunuz başarıyla gönderildi')
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class PageCacheTests(TestCase):
+    """Anonymous pages are served from the rendered HTML cache until their content changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.listing = make_listing(slug='onbellek-ilan')
+        self.client.get(reverse('home'))
+
+    def test_pages_are_served_from_cache_until_a_listing_changes(self):
+        self.assertEqual(self.client.get(reverse('home'))['X-Page-Cache'], 'HIT')
+        self.client.get(reverse('listings'))
+        with self.assertNumQueries(1):  # only the ETag validator
+            self.assertEqual(self.client.get(reverse('listings'))['X-Page-Cache'], 'HIT')
+
+        self.listing.title = 'Yenilenmiş Başlık'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        self.assertEqual(self.client.get(reverse('home'))['X-Page-Cache'], 'MISS')
+        response = self.client.get(reverse('listings'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Yenilenmiş Başlık')
+
+    def test_invalidation_only_touches_affected_pages(self):
+        self.client.get(reverse('listings'))
+        self.client.get(reverse('references'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reference.objects.create(title='Yeni Referans')
+        self.assertEqual(self.client.get(reverse('listings'))['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('references'))['X-Page-Cache'], 'MISS')
+
+    def test_listing_detail_follows_related_listings(self):
+        url = self.listing.get_absolute_url()
+        neighbour = make_listing(slug='komsu-ilan', title='Komşu Daire')
+        refresh()
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Komşu Daire')
+        self.assertNotContains(response, 'PAGE_CACHE_CSRF')
+        self.assertIn('csrftoken', response.cookies)
+
+        neighbour.status = 'rent'
+        with self.captureOnCommitCallbacks(execute=True):
+            neighbour.save()
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        # The recomputed related listings invalidate the page too
+        refresh()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, 'Komşu Daire')
+
+    def test_query_string_is_normalized(self):
+        self.client.get(reverse('listings') + '?status=rent&type=apartment')
+        response = self.client.get(reverse('listings') + '?type=apartment&status=rent&utm_source=mail')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_visitor_specific_requests_bypass_the_cache(self):
+        self.client.post(self.listing.get_absolute_url(), {'name': 'Ali', 'email': 'ali@example.com', 'message': 'Merhaba'})
+        response = self.client.get(self.listing.get_absolute_url())
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Sorgunuz başarıyla gönderildi')
+
+        self.client.cookies['sessionid'] = 'abc'
+        self.assertNotIn('X-Page-Cache', self.client.get(reverse('home')))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, PAGE_CACHE_ENABLED=False)
+class ChromeFragmentCacheTests(TestCase):
+    """The shared header/footer in base.html is rendered once per settings version"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.get(reverse('home'))
+
+    def test_navigation_follows_settings_changes_and_active_page(self):
+        nav = NavigationSettings.get_settings()
+        nav.home_label = 'Anasayfamız'
+        with self.captureOnCommitCallbacks(execute=True):
+            nav.save()
+        home = self.client.get(reverse('home'))
+        self.assertContains(home, 'Anasayfamız')
+        self.assertContains(home, 'nav-link active" href="/"')
+
+        references = self.client.get(reverse('references'))
+        self.assertContains(references, 'Anasayfamız')
+        self.assertNotContains(references, 'nav-link active" href="/"')
+
+    def test_chrome_fragments_are_reused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            NavigationSettings.get_settings().save()
+        first = self.client.get(reverse('references'))
+        self.assertIn('headers/header_template1.html', [t.name for t in first.templates])
+        second = self.client.get(reverse('contact'))
+        self.assertNotIn('headers/header_template1.html', [t.name for t in second.templates])
+
+    def test_csrf_token_is_not_cached(self):
+        first = Client().get(reverse('references'))
+        second = Client().get(reverse('references'))
+        self.assertContains(second, 'id="newsletterModal"')
+        self.assertNotEqual(first.cookies['csrftoken'].value, second.cookies['csrftoken'].value)
+        self.assertContains(second, str(second.context['csrf_token']))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_pages', iterations=1, pages=['home'], stdout=out)
+        self.assertIn('speedup', out.getvalue())
+
+
+class TemplateWarmupTests(TestCase):
+    """Every template selectable by name exists and compiles"""
+
+    def test_validate_templates(self):
+        out = StringIO()
+        call_command('validate_templates', '--all', stdout=out)
+        self.assertIn('properties/custom_sections/services.html', out.getvalue())
+        self.assertIn('compiled successfully', out.getvalue())
+
+    def test_missing_layout_template_fails(self):
+        choices = CustomSection.LAYOUT_CHOICES + (('carousel', 'Karusel'),)
+        with mock.patch.object(CustomSection, 'LAYOUT_CHOICES', choices):
+            with self.assertRaises(CommandError):
+                call_command('validate_templates', stdout=StringIO())
+
+    def test_warm_templates(self):
+        compiled, errors = warm_templates()
+        self.assertEqual(errors, {})
+        self.assertGreater(compiled, len(layout_template_names()))
+
+
+@override_settings(DB_CONNECTION_STATS_HEADER=True)
+class DBConnectionStatsTests(TestCase):
+    """Connection age and reuse are exposed on the response"""
+
+    def requests_served(self):
+        header = self.client.get(reverse('robots_txt'))['X-DB-Connection']
+        return dict(part.split('=') for part in header.split('; '))
+
+    def test_reused_connection_is_counted(self):
+        first = self.requests_served()
+        second = self.requests_served()
+        self.assertEqual(int(second['requests']), int(first['requests']) + 1)
+        self.assertEqual(second['opened'], first['opened'])
+        self.assertGreaterEqual(float(second['age']), float(first['age']))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ContentStatsTests(TestCase):
+    """Active counts are maintained incrementally instead of counted per request"""
+
+    def setUp(self):
+        cache.clear()
+        self.listing = make_listing(slug='villa', property_type='villa', status='rent')
+        make_listing(slug='daire')
+
+    def test_counts_follow_saves_and_deletes(self):
+        stats = get_content_stats()['listing']
+        self.assertEqual(stats['all'], 2)
+        self.assertEqual(stats['property_type'], {'villa': 1, 'apartment': 1})
+        self.assertEqual(stats['status'], {'rent': 1, 'sale': 1})
+
+        self.listing.property_type = 'apartment'
+        self.listing.save()
+        self.assertEqual(get_content_stats()['listing']['property_type'], {'apartment': 2})
+
+        self.listing.is_active = False
+        self.listing.save()
+        self.assertEqual(get_content_stats()['listing']['all'], 1)
+
+        Listing.objects.get(slug='daire').delete()
+        self.assertEqual(get_content_stats()['listing'], {'all': 0, 'property_type': {}, 'status': {}})
+
+    def test_bulk_update_and_reconcile(self):
+        self.assertEqual(update_queryset(Listing.objects.all(), is_active=False), 2)
+        self.assertEqual(get_content_stats()['listing']['all'], 0)
+
+        # update() outside update_queryset drifts until the next reconcile
+        Listing.objects.filter(slug='villa').update(is_active=True)
+        self.assertEqual(get_content_stats()['listing']['all'], 0)
+        self.assertEqual(reconcile(), 3)
+        self.assertEqual(get_content_stats()['listing']['status'], {'rent': 1})
+        self.assertEqual(reconcile(), 0)
+
+    def test_snapshot_build_runs_no_count_queries(self):
+        request = RequestFactory().get('/')
+        with CaptureQueriesContext(connection) as queries:
+            context = about_info(request)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql'].upper()])
+        self.assertEqual(context['listings_count'], 2)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, PAGE_CACHE_ENABLED=False)
+class ListingFacetTests(TestCase):
+    """Facet counts come from one grouped query and are cached per filter state"""
+
+    def setUp(self):
+        cache.clear()
+        make_listing(slug='villa', property_type='villa', price=12000000, area=350, bedrooms=5, location='Bodrum, Muğla')
+        make_listing(slug='daire', bedrooms=2, currency='USD')
+        make_listing(slug='kiralik', status='rent', price=50000, bedrooms=1)
+
+    def test_counts_ignore_own_facet_only(self):
+        with self.assertNumQueries(1):
+            counts = facet_counts('', {'type': 'apartment'})
+        self.assertEqual(counts['type'], {'villa': 1, 'apartment': 2})
+        self.assertEqual(counts['status'], {'sale': 1, 'rent': 1})
+        self.assertEqual(counts['bedrooms'], {'1': 1, '2': 1})
+        # The USD listing has no TRY price without an exchange rate
+        self.assertEqual(counts['price'], {'0-1m': 1})
+        self.assertEqual(counts['location'], {'Kadıköy, İstanbul': 2})
+
+        with self.assertNumQueries(0):
+            facet_counts('', {'type': 'apartment'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_listing(slug='yeni')
+        self.assertEqual(facet_counts('', {'type': 'apartment'})['type']['apartment'], 3)
+
+    def test_listings_page_filters_by_facets(self):
+        response = self.client.get(reverse('listings'), {'price': '10m+', 'bedrooms': 'bogus'})
+        self.assertEqual([listing.slug for listing in response.context['page_obj']], ['villa'])
+        self.assertEqual(response.context['extra_filters'], {'price': '10m+'})
+        area = {option['value']: option for option in response.context['facets']['area']['options']}
+        self.assertEqual(area['200-500']['count'], 1)
+        self.assertIn('price=10m%2B', area['200-500']['url'])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, PAGE_CACHE_ENABLED=False)
+class ListingRangeFilterTests(TestCase):
+    """Validated min/max filters and sorting on the listings page"""
+
+    def setUp(self):
+        cache.clear()
+        make_listing(slug='buyuk', price=5000000, area=300, bedrooms=4, floor=8)
+        make_listing(slug='orta', price=2000000, area=120, bedrooms=3, floor=2)
+        make_listing(slug='kucuk', price=800000, area=60, bedrooms=1)
+
+    def slugs(self, **query):
+        response = self.client.get(reverse('listings'), query)
+        return [listing.slug for listing in response.context['page_obj']], response
+
+    def test_ranges_compose_and_sort(self):
+        slugs, _ = self.slugs(min_price=1000000, min_bedrooms=3, sort='price_asc')
+        self.assertEqual(slugs, ['orta', 'buyuk'])
+        slugs, _ = self.slugs(max_area=200, min_floor=1, status='sale', sort='area_desc')
+        self.assertEqual(slugs, ['orta'])
+
+    def test_invalid_bounds_are_ignored(self):
+        slugs, response = self.slugs(min_price=3000000, max_price=1000, min_area='abc', sort='bogus')
+        self.assertEqual(sorted(slugs), ['buyuk'])
+        self.assertIn('max_price', response.context['filter_form'].errors)
+        self.assertContains(response, 'En yüksek değer en düşük değerden küçük olamaz.')
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, PAGE_CACHE_ENABLED=False)
+class ExchangeRateTests(TestCase):
+    """Prices are filtered and sorted in TRY across currencies"""
+
+    def setUp(self):
+        cache.clear()
+        make_listing(slug='dolar', price=100000, currency='USD')
+        make_listing(slug='euro', price=90000, currency='EUR')
+        make_listing(slug='lira', price=3500000)
+
+    def test_rates_recompute_price_try(self):
+        self.assertIsNone(Listing.objects.get(slug='dolar').price_try)
+        self.assertEqual(load_rates({'USD': Decimal('40'), 'EUR': Decimal('45')}), ['USD', 'EUR'])
+        self.assertEqual(Listing.objects.get(slug='dolar').price_try, Decimal('4000000'))
+        self.assertEqual(load_rates({'USD': Decimal('40')}), [])
+
+        ExchangeRate.objects.filter(currency='EUR').update(rate=Decimal('30'))
+        with self.assertNumQueries(1):
+            recompute_price_try()
+        self.assertEqual(Listing.objects.get(slug='euro').price_try, Decimal('2700000'))
+
+        rate = ExchangeRate.objects.get(currency='USD')
+        rate.rate = Decimal('20')
+        rate.save()
+        self.assertEqual(Listing.objects.get(slug='dolar').price_try, Decimal('2000000'))
+
+    def test_filters_and_sort_compare_in_try(self):
+        # Without a rate there is no TRY price: those listings sort last
+        response = self.client.get(reverse('listings'), {'sort': 'price_desc'})
+        self.assertEqual(response.context['page_obj'][0].slug, 'lira')
+
+        load_rates({'USD': Decimal('40'), 'EUR': Decimal('45')})
+        response = self.client.get(reverse('listings'), {'sort': 'price_desc'})
+        self.assertEqual([listing.slug for listing in response.context['page_obj']], ['euro', 'dolar', 'lira'])
+        response = self.client.get(reverse('listings'), {'min_price': 3800000, 'sort': 'price_asc'})
+        self.assertEqual([listing.slug for listing in response.context['page_obj']], ['dolar', 'euro'])
+
+    def test_load_exchange_rates_command(self):
+        path = os.path.join(TEST_MEDIA_ROOT, 'rates.json')
+        with open(path, 'w') as f:
+            json.dump({'usd': '41.5'}, f)
+        call_command('load_exchange_rates', path, stdout=StringIO())
+        self.assertEqual(Listing.objects.get(slug='dolar').price_try, Decimal('4150000'))
+
+        with open(path, 'w') as f:
+            json.dump({'XYZ': '1'}, f)
+        with self.assertRaises(CommandError):
+            call_command('load_exchange_rates', path, stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, IMAGE_PROCESSING_MODE='sync')
+class AutocompleteTests(TestCase):
+    """Suggestions come from the in-memory prefix index, folded the Turkish way"""
+
+    def setUp(self):
+        cache.clear()
+        make_listing(slug='moda', title='Moda Sahil Dairesi', location='Kadıköy, İstanbul')
+        make_listing(slug='fenerbahce', title='Fenerbahçe Bahçeli Ev', location='Kadıköy, İstanbul')
+        make_listing(slug='izmir', title='Işıklı Villa', location='Karşıyaka, İzmir')
+        # Fresh index built from this test's rows
+        autocomplete_index._index = None
+
+    def test_turkish_case_folding(self):
+        for query in ('kadı', 'KADIKÖY', 'kadikoy', 'İstan', 'Istanbul'):
+            self.assertEqual(autocomplete_index.suggest(query)['locations'], ['Kadıköy, İstanbul'], query)
+        self.assertEqual(autocomplete_index.suggest('IŞIK')['titles'][0]['title'], 'Işıklı Villa')
+        self.assertEqual(autocomplete_index.suggest('ka')['locations'], ['Kadıköy, İstanbul', 'Karşıyaka, İzmir'])
+        self.assertEqual(autocomplete_index.suggest('k'), {'locations': [], 'titles': []})
+
+    def test_endpoint_runs_no_queries(self):
+        autocomplete_index.warm()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('autocomplete'), {'q': 'bahçe'})
+        self.assertEqual(response.json()['titles'], [
+            {'title': 'Fenerbahçe Bahçeli Ev', 'url': reverse('listing_detail', kwargs={'slug': 'fenerbahce'})},
+        ])
+
+    def test_saves_update_the_index_incrementally(self):
+        autocomplete_index.warm()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_listing(slug='bodrum', title='Bodrum Yazlık', location='Bodrum, Muğla')
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.get(slug='izmir').delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete_index.suggest('muğ')['locations'], ['Bodrum, Muğla'])
+            self.assertEqual(autocomplete_index.suggest('izm')['locations'], [])
+
+    def test_change_of_another_process_is_not_skipped(self):
+        autocomplete_index.warm()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_listing(slug='bodrum', title='Bodrum Yazlık', location='Bodrum, Muğla')
+        self.assertEqual(autocomplete_index._version, autocomplete.get_version())
+
+        # Another worker saved a listing in between: this index misses it
+        autocomplete.bump_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_listing(slug='datca', title='Datça Evi', location='Datça, Muğla')
+        self.assertNotEqual(autocomplete_index._version, autocomplete.get_version())
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, PAGE_CACHE_ENABLED=False)
+class RelatedListingTests(TestCase):
+    """Related listings are precomputed and scored on location words, type and bands"""
+
+    def setUp(self):
+        cache.clear()
+        self.listing = make_listing(slug='moda', location='Moda, Kadıköy, İstanbul')
+        make_listing(slug='kadikoy', location='Kadikoy / ISTANBUL')
+        make_listing(slug='besiktas', location='Beşiktaş, İstanbul', property_type='villa', price=20000000, area=600)
+        make_listing(slug='kiralik', location='Moda, Kadıköy, İstanbul', status='rent')
+
+    def related_slugs(self, slug):
+        return list(
+            RelatedListing.objects.filter(listing__slug=slug).order_by('rank').values_list('related__slug', flat=True)
+        )
+
+    def test_rebuild_scores_similar_listings(self):
+        self.assertEqual(rebuild(), 4)
+        self.assertEqual(self.related_slugs('moda'), ['kadikoy', 'besiktas'])
+        self.assertEqual(self.related_slugs('kiralik'), [])
+        self.assertFalse(stale_listings().exists())
+
+        response = self.client.get(self.listing.get_absolute_url())
+        self.assertEqual([listing.slug for listing in response.context['related_listings']], ['kadikoy', 'besiktas'])
+
+    def test_refresh_follows_saved_listings(self):
+        rebuild()
+        self.assertEqual(refresh(), 0)
+
+        new = make_listing(slug='yeni', location='Moda / Kadıköy')
+        self.assertEqual(list(stale_listings().values_list('slug', flat=True)), ['yeni'])
+        refresh()
+        self.assertEqual(self.related_slugs('moda'), ['yeni', 'kadikoy', 'besiktas'])
+        self.assertEqual(self.related_slugs('yeni'), ['moda', 'kadikoy', 'besiktas'])
+
+        new.is_active = False
+        new.save()
+        refresh()
+        self.assertEqual(self.related_slugs('moda'), ['kadikoy', 'besiktas'])
+        self.assertEqual(self.related_slugs('yeni'), [])
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_related_listings', stdout=out)
+        self.assertIn('4 listing(s)', out.getvalue())
+        self.assertEqual(self.related_slugs('kadikoy'), ['moda', 'besiktas'])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, PAGE_CACHE_ENABLED=False, DB_READ_REPLICA='test_replica', IMAGE_PROCESSING_MODE='sync')
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Public reads go to a second database acting as the replica
+    (TransactionTestCase: inside a transaction on the primary reads stay there)
+    """
+
+    databases = {'default', 'test_replica'}
+
+    def setUp(self):
+        cache.clear()
+        # Same row, replicated with a lag: the replica still has the old title
+        listing = make_listing(slug='kopya-ilan', title='Birincil Başlık')
+        Listing.objects.using('test_replica').bulk_create([Listing(
+            **{field.attname: getattr(listing, field.attname) for field in Listing._meta.concrete_fields
+               if field.attname != 'search_vector'} | {'title': 'Kopya Başlık'}
+        )])
+
+    def test_public_reads_use_replica(self):
+        response = self.client.get(reverse('listings'))
+        self.assertContains(response, 'Kopya Başlık')
+        self.assertNotIn('db_primary', response.cookies)
+
+    def test_reads_stick_to_primary_after_a_post(self):
+        response = self.client.post(reverse('newsletter_subscribe'), {'email': 'yeni@example.com'})
+        self.assertIn('db_primary', response.cookies)
+        self.assertContains(self.client.get(reverse('listings')), 'Birincil Başlık')
+
+    def test_logged_in_users_read_from_primary(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'sifre')
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('listings')), 'Birincil Başlık')
+
+    def test_writes_go_to_primary(self):
+        with replica_reads_enabled():
+            self.assertEqual(Listing.objects.get(slug='kopya-ilan').title, 'Kopya Başlık')
+            Listing.objects.filter(slug='kopya-ilan').update(title='Güncel')
+        self.assertEqual(Listing.objects.using('default').get(slug='kopya-ilan').title, 'Güncel')
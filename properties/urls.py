@@ -10,6 +10,7 @@ urlpatterns = [
     path('contact/', views.contact, name='contact'),
     path('references/', views.references, name='references'),
     path('robots.txt', views.robots_txt, name='robots_txt'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
     
     # Newsletter endpoints
     path('newsletter/subscribe/', views.newsletter_subscribe, name='newsletter_subscribe'),
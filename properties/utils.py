@@ -82,8 +82,41 @@ def optimize_image(image_field, max_width=1920, max_height=1080, quality=85):
     if image_field.name.lower().endswith('.webp'):
         return image_field
     
-    # Open the image
-    img = Image.open(image_field)
+    # Open, resize and encode the image
+    output = BytesIO(encode_webp(image_field.read(), max_width, max_height, quality))
+    
+    # Generate new filename
+    original_name = os.path.splitext(os.path.basename(image_field.name))[0]
+    new_name = f"{original_name}.webp"
+    
+    # Create InMemoryUploadedFile
+    return InMemoryUploadedFile(
+        output,
+        'ImageField',
+        new_name,
+        'image/webp',
+        sys.getsizeof(output),
+        None
+    )
+
+
+def encode_webp(data, max_width=1920, max_height=1080, quality=85):
+    """
+    Resize image bytes to fit max dimensions and encode them as WebP
+    
+    Pure function of its arguments (no Django access), so it can run in a
+    worker process.
+    
+    Args:
+        data: Original image file contents
+        max_width: Maximum width in pixels
+        max_height: Maximum height in pixels
+        quality: WebP quality (1-100)
+    
+    Returns:
+        bytes: WebP encoded image
+    """
+    img = Image.open(BytesIO(data))
     
     # Resize if larger than max dimensions
     if img.width > max_width or img.height > max_height:
@@ -99,23 +132,38 @@ def optimize_image(image_field, max_width=1920, max_height=1080, quality=85):
     elif img.mode != 'RGB':
         img = img.convert('RGB')
     
-    # Create output buffer
-    output = BytesIO()
-    
     # Save as WebP
+    output = BytesIO()
     img.save(output, format='WEBP', quality=quality, method=6)
-    output.seek(0)
+    return output.getvalue()
+
+
+def encode_variants(data, widths, quality=85):
+    """
+    Encode downscaled WebP copies of an image for responsive srcsets
     
-    # Generate new filename
-    original_name = os.path.splitext(os.path.basename(image_field.name))[0]
-    new_name = f"{original_name}.webp"
+    Only widths narrower than the image are produced (never upscaled).
+    Pure function of its arguments, so it can run in a worker process.
     
-    # Create InMemoryUploadedFile
-    return InMemoryUploadedFile(
-        output,
-        'ImageField',
-        new_name,
-        'image/webp',
-        sys.getsizeof(output),
-        None
-    )
+    Args:
+        data: Image file contents (normally the optimized WebP)
+        widths: Target widths in pixels
+        quality: WebP quality (1-100)
+    
+    Returns:
+        tuple: (original width, {width: WebP bytes})
+    """
+    img = Image.open(BytesIO(data))
+    img.load()
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGB')
+    
+    variants = {}
+    for width in sorted(set(widths)):
+        if width >= img.width:
+            break
+        height = max(round(img.height * width / img.width), 1)
+        output = BytesIO()
+        img.resize((width, height), Image.Resampling.LANCZOS).save(output, format='WEBP', quality=quality, method=6)
+        variants[width] = output.getvalue()
+    return img.width, variants
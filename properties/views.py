@@ -1,21 +1,32 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 from django.views.decorators.http import require_POST
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from .models import (
     Listing, Construction, About, ContactMessage, Reference, 
     SEOSettings, CustomSection, BannerImage, SiteSettings,
     NewsletterSubscriber, Newsletter, PopupSettings, VisibleCustomSection
 )
-from .forms import ContactForm, NewsletterSubscribeForm
+from .autocomplete import autocomplete_index
+from .conditional import home_condition, listing_detail_condition, listings_condition
+from .db_router import replica_reads
+from .forms import ContactForm, ListingFilterForm, NewsletterSubscribeForm
+from .mail import queue_contact_notification
+from . import facets, page_cache
+from .pagination import KEY_ORDERING, KeysetPaginator
+from .search import search_listings
+from .snapshot import get_site_snapshot
 
 # Create your views here.
 
+@replica_reads
+@home_condition
+@page_cache.cached_page('home')
 def home(request):
     """
     Home page view displaying featured listings, hero section, and about info
@@ -122,35 +133,58 @@ def home(request):
     return render(request, 'properties/home.html', context)
 
 
-def listings(request):
+def filter_listings(request):
     """
-    Listings page with search, filter, and pagination
+    Active listings filtered by the search, facet and range GET parameters
+    Returns (queryset, search_query, selected facets, ListingFilterForm)
     """
     listings_list = Listing.objects.filter(is_active=True)
     
-    # Search functionality
+    # Search functionality (ranked full-text search on PostgreSQL)
     search_query = request.GET.get('search', '')
     if search_query:
-        listings_list = listings_list.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(location__icontains=search_query)
-        )
+        listings_list = search_listings(listings_list, search_query)
     
-    # Filter by property type
-    property_type = request.GET.get('type', '')
-    if property_type:
-        listings_list = listings_list.filter(property_type=property_type)
+    # Filter by type, status, currency, bedroom/price/area bands and location
+    selected = facets.selected_facets(request)
+    listings_list = facets.apply_facets(listings_list, selected)
     
-    # Filter by status (sale/rent)
-    status = request.GET.get('status', '')
-    if status:
-        listings_list = listings_list.filter(status=status)
+    # Min/max ranges (price, area, rooms, floor, building age) and sort order
+    filter_form = ListingFilterForm(request.GET)
+    filter_form.is_valid()
+    listings_list = listings_list.filter(**filter_form.range_lookups())
+    ordering = filter_form.ordering()
+    if ordering:
+        listings_list = listings_list.order_by(*ordering)
     
-    # Pagination
-    paginator = Paginator(listings_list, 9)  # 9 listings per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return listings_list, search_query, selected, filter_form
+
+
+def filter_query(request):
+    """Query string of the current filters without the page/cursor parameters"""
+    query = request.GET.copy()
+    for param in ('page', 'cursor'):
+        query.pop(param, None)
+    return query.urlencode()
+
+
+@replica_reads
+@listings_condition
+@page_cache.cached_page('listings')
+def listings(request):
+    """
+    Listings page with search, filter, and pagination
+    """
+    listings_list, search_query, selected, filter_form = filter_listings(request)
+    
+    # Pagination: ranked search results, price/area sorts and legacy ?page=N
+    # links use offset pagination, everything else seeks on (created_date, id) cursors
+    if search_query or 'page' in request.GET or filter_form.ordering() not in (None, KEY_ORDERING):
+        paginator = Paginator(listings_list, 9)  # 9 listings per page
+        page_obj = paginator.get_page(request.GET.get('page'))
+    else:
+        paginator = KeysetPaginator(listings_list, 9)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
     
     # Get SEO settings for listings page
     try:
@@ -165,8 +199,14 @@ def listings(request):
     context = {
         'page_obj': page_obj,
         'search_query': search_query,
-        'selected_type': property_type,
-        'selected_status': status,
+        'selected_type': selected.get('type', ''),
+        'selected_status': selected.get('status', ''),
+        'facets': facets.build_facets(request, search_query, selected, filter_form.range_lookups()),
+        'filter_form': filter_form,
+        # Current filters for the pagination links
+        'filter_query': filter_query(request),
+        # Facet selections without a dropdown, kept as hidden inputs by the filter form
+        'extra_filters': {param: value for param, value in selected.items() if param not in ('type', 'status')},
         'page_title': page_title,
         'meta_description': meta_description,
         'seo_settings': seo_settings,
@@ -174,15 +214,26 @@ def listings(request):
     return render(request, 'properties/listings.html', context)
 
 
+@replica_reads
+@listing_detail_condition
+@page_cache.cached_page()
 def listing_detail(request, slug):
     """
     Individual listing detail page with inquiry form
     """
     listing = get_object_or_404(Listing, slug=slug, is_active=True)
+    # Precomputed by properties.related: one lookup on (listing, rank)
     related_listings = Listing.objects.filter(
         is_active=True,
-        location=listing.location
-    ).exclude(id=listing.id)[:3]
+        related_from__listing=listing,
+    ).order_by('related_from__rank')[:3]
+    # Cached page: also stale when this listing, a related one or the location changes
+    page_cache.depends_on(
+        request,
+        page_cache.listing_group(listing.pk),
+        page_cache.location_group(listing.location),
+        *(page_cache.listing_group(related.pk) for related in related_listings),
+    )
     
     # Handle inquiry form submission
     if request.method == 'POST':
@@ -192,39 +243,12 @@ def listing_detail(request, slug):
         message = request.POST.get('message', '')
         
         if name and email and message:
-            # Save inquiry as contact message
-            contact_message = ContactMessage(
-                name=name,
-                email=email,
-                phone=phone,
-                subject=f"İlan Sorgusu: {listing.title}",
-                message=message
-            )
-            contact_message.save()
-            
-            # Send email notification
-            try:
-                site_settings = SiteSettings.objects.first()
-                
-                # Get email recipients
-                recipient_emails = []
-                if site_settings and site_settings.contact_email_recipients:
-                    recipient_emails = [email.strip() for email in site_settings.contact_email_recipients.split(',') if email.strip()]
-                
-                if not recipient_emails and site_settings and site_settings.email:
-                    recipient_emails = [site_settings.email]
-                
-                # Send email if SMTP configured
-                if recipient_emails and site_settings and site_settings.smtp_username and site_settings.smtp_password:
-                    from django.core.mail import EmailMessage
-                    import smtplib
-                    
-                    subject = f"İlan Sorgusu: {listing.title}"
-                    message_body = f"""
+            subject = f"İlan Sorgusu: {listing.title}"
+            message_body = f"""
 Yeni bir ilan sorgusu alındı:
 
 İlan: {listing.title}
-İlan Linki: {request.build_absolute_uri(listing.get_absolute_url() if hasattr(listing, 'get_absolute_url') else '')}
+İlan Linki: {request.build_absolute_uri(listing.get_absolute_url())}
 
 Müşteri Bilgileri:
 Ad Soyad: {name}
@@ -236,29 +260,19 @@ Mesaj:
 
 ---
 Bu mesaj web sitenizin ilan detay sayfasından gönderilmiştir.
-                    """
-                    
-                    try:
-                        email_msg = EmailMessage(
-                            subject=subject,
-                            body=message_body,
-                            from_email=site_settings.email_from or site_settings.smtp_username,
-                            to=recipient_emails,
-                        )
-                        
-                        smtp_host = site_settings.smtp_host or 'smtp.gmail.com'
-                        smtp_port = site_settings.smtp_port or 587
-                        
-                        connection = smtplib.SMTP(smtp_host, smtp_port)
-                        if site_settings.smtp_use_tls:
-                            connection.starttls()
-                        connection.login(site_settings.smtp_username, site_settings.smtp_password)
-                        connection.send_message(email_msg.message())
-                        connection.quit()
-                    except Exception as smtp_error:
-                        print(f"SMTP Email gönderme hatası: {smtp_error}")
-            except Exception as e:
-                print(f"Email gönderme hatası: {e}")
+            """
+            
+            # Save inquiry as contact message and queue the email notification
+            # in one transaction; the outbox worker does the SMTP work
+            with transaction.atomic():
+                ContactMessage.objects.create(
+                    name=name,
+                    email=email,
+                    phone=phone,
+                    subject=subject,
+                    message=message
+                )
+                queue_contact_notification(get_site_snapshot().site_settings, subject, message_body)
             
             messages.success(request, 'Sorgunuz başarıyla gönderildi! En kısa sürede size dönüş yapacağız.')
             return redirect('listing_detail', slug=slug)
@@ -272,6 +286,8 @@ Bu mesaj web sitenizin ilan detay sayfasından gönderilmiştir.
     return render(request, 'properties/listing_detail.html', context)
 
 
+@replica_reads
+@page_cache.cached_page('construction')
 def construction(request):
     """
     Construction projects page with gallery layout
@@ -347,40 +363,8 @@ def contact(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            # Save the contact message
-            contact_message = ContactMessage(
-                name=form.cleaned_data['name'],
-                email=form.cleaned_data['email'],
-                phone=form.cleaned_data.get('phone', ''),
-                subject=form.cleaned_data.get('subject', ''),
-                message=form.cleaned_data['message']
-            )
-            contact_message.save()
-            
-            # Send email notification to admin
-            try:
-                # Get admin emails and SMTP settings from SiteSettings
-                site_settings = SiteSettings.objects.first()
-                
-                # Get email recipients from contact_email_recipients field
-                recipient_emails = []
-                if site_settings and site_settings.contact_email_recipients:
-                    # Split by comma and clean whitespace
-                    recipient_emails = [email.strip() for email in site_settings.contact_email_recipients.split(',') if email.strip()]
-                
-                # Fallback to regular email field if no recipients specified
-                if not recipient_emails and site_settings and site_settings.email:
-                    recipient_emails = [site_settings.email]
-                
-                # Check if SMTP settings are configured
-                if recipient_emails and site_settings and site_settings.smtp_username and site_settings.smtp_password:
-                    # Use custom SMTP settings from admin panel
-                    from django.core.mail import EmailMessage
-                    import smtplib
-                    from email.mime.text import MIMEText
-                    
-                    subject = f"Yeni İletişim Mesajı: {form.cleaned_data.get('subject', 'Genel')}"
-                    message_body = f"""
+            subject = f"Yeni İletişim Mesajı: {form.cleaned_data.get('subject', 'Genel')}"
+            message_body = f"""
 Yeni bir iletişim mesajı alındı:
 
 Ad Soyad: {form.cleaned_data['name']}
@@ -393,40 +377,19 @@ Mesaj:
 
 ---
 Bu mesaj web sitenizin iletişim formu üzerinden gönderilmiştir.
-                    """
-                    
-                    try:
-                        # Create email message
-                        email = EmailMessage(
-                            subject=subject,
-                            body=message_body,
-                            from_email=site_settings.email_from or site_settings.smtp_username,
-                            to=recipient_emails,
-                        )
-                        
-                        # Configure SMTP connection
-                        smtp_host = site_settings.smtp_host or 'smtp.gmail.com'
-                        smtp_port = site_settings.smtp_port or 587
-                        
-                        connection = smtplib.SMTP(smtp_host, smtp_port)
-                        if site_settings.smtp_use_tls:
-                            connection.starttls()
-                        connection.login(site_settings.smtp_username, site_settings.smtp_password)
-                        connection.send_message(email.message())
-                        connection.quit()
-                    except Exception as smtp_error:
-                        print(f"SMTP Email gönderme hatası: {smtp_error}")
-                        # Fallback to Django's default email backend
-                        send_mail(
-                            subject=subject,
-                            message=message_body,
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=recipient_emails,
-                            fail_silently=True,
-                        )
-            except Exception as e:
-                # Log error but don't show to user
-                print(f"Email gönderme hatası: {e}")
+            """
+            
+            # Save the contact message and queue the admin notification in one
+            # transaction; the outbox worker does the SMTP work
+            with transaction.atomic():
+                ContactMessage.objects.create(
+                    name=form.cleaned_data['name'],
+                    email=form.cleaned_data['email'],
+                    phone=form.cleaned_data.get('phone', ''),
+                    subject=form.cleaned_data.get('subject', ''),
+                    message=form.cleaned_data['message']
+                )
+                queue_contact_notification(get_site_snapshot().site_settings, subject, message_body)
             
             messages.success(request, 'Bizimle iletişime geçtiğiniz için teşekkür ederiz! En kısa sürede size dönüş yapacağız.')
             return redirect('contact')
@@ -470,6 +433,23 @@ Bu mesaj web sitenizin iletişim formu üzerinden gönderilmiştir.
     return render(request, 'properties/contact.html', context)
 
 
+def autocomplete(request):
+    """
+    Location and listing title suggestions for the search boxes (JSON)
+    Served from the in-memory prefix index of this process, without database queries
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    suggestions = autocomplete_index.suggest(request.GET.get('q', '')[:100], limit)
+    for title in suggestions['titles']:
+        title['url'] = reverse('listing_detail', kwargs={'slug': title.pop('slug')})
+    response = JsonResponse(suggestions)
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
 def robots_txt(request):
     """
     Serve robots.txt file
@@ -493,6 +473,8 @@ def robots_txt(request):
     return HttpResponse("\n".join(lines), content_type="text/plain")
 
 
+@replica_reads
+@page_cache.cached_page('references')
 def references(request):
     """
     References page with gallery layout
@@ -69,6 +69,8 @@ MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Add this for static files
     "properties.middleware.PerformanceCacheMiddleware",  # Custom cache middleware
     "properties.middleware.SecurityHeadersMiddleware",  # Custom security headers
+    "properties.middleware.DBConnectionStatsMiddleware",  # Connection age/reuse header
+    "properties.middleware.ReplicaStickinessMiddleware",  # Primary reads right after a write
     "corsheaders.middleware.CorsMiddleware",  # Add this for CORS support
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -84,6 +86,8 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
+        # Without explicit loaders Django wraps these in the cached loader, so
+        # each template is parsed once per worker (see TEMPLATE_WARMUP)
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -99,6 +103,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "realestate_project.wsgi.application"
+# Compile every template when a WSGI worker boots, before it accepts traffic
+TEMPLATE_WARMUP = os.getenv('TEMPLATE_WARMUP', 'True') == 'True'
+# Build the search autocomplete index at boot instead of on the first lookup
+AUTOCOMPLETE_WARMUP = os.getenv('AUTOCOMPLETE_WARMUP', 'True') == 'True'
 
 
 # Database
@@ -115,9 +123,68 @@ DATABASES = {
         "OPTIONS": {
             "sslmode": "require",
         },
+        # Keep connections open across requests instead of paying the
+        # TCP + TLS + auth handshake every time (0 = close after each request)
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        # Ping a reused connection before the request uses it
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
     }
 }
 
+# Optional streaming replica: public pages (views wrapped with
+# properties.db_router.replica_reads) read from it, writes, the admin and
+# logged-in users use the primary. After a write the visitor reads from the
+# primary for DB_REPLICA_STICKY_SECONDS so they see their own changes
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", os.getenv("DB_PORT")),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["properties.db_router.ReplicaRouter"]
+DB_READ_REPLICA = "replica"
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+
+# Set DB_POOL_MODE=transaction when connecting through pgbouncer in transaction
+# pooling mode: consecutive transactions may run on different server sessions,
+# so server-side cursors and named prepared statements cannot be used
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "session")
+if DB_POOL_MODE == "transaction":
+    for _database in DATABASES.values():
+        _database["DISABLE_SERVER_SIDE_CURSORS"] = True
+        try:
+            import psycopg  # noqa: F401
+            _database["OPTIONS"] = {**_database["OPTIONS"], "prepare_threshold": None}
+        except ImportError:
+            pass  # psycopg2 never uses named prepared statements
+
+# Adds an X-DB-Connection header (connection age and reuse count, see
+# properties/db_instrumentation.py) to every response
+DB_CONNECTION_STATS_HEADER = os.getenv("DB_CONNECTION_STATS_HEADER", str(DEBUG)) == "True"
+
+
+# Cache
+# The settings snapshot version key (properties.snapshot) must be shared by all
+# gunicorn workers, so production should point REDIS_URL at a Redis instance.
+# Without it each process falls back to its own local-memory cache.
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -258,11 +325,62 @@ else:
     EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')  # Your email
     EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # Your email password or app password
     DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@yourdomain.com')
+# Seconds before a blocked SMTP connect/send fails (also used for the SiteSettings SMTP)
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
 
 # Site Domain for Newsletter Unsubscribe Links (used in cron jobs)
 SITE_PROTOCOL = os.getenv('SITE_PROTOCOL', 'https' if not DEBUG else 'http')
 SITE_DOMAIN = os.getenv('SITE_DOMAIN', 'www.realinvestgayrimenkul.com' if not DEBUG else 'localhost:8000')
 
+# Web processes start the APScheduler on boot; only the process holding the
+# leader lock (PostgreSQL advisory lock, or SCHEDULER_LOCK_FILE elsewhere)
+# runs jobs. Set SCHEDULER_AUTOSTART=False when running `manage.py run_scheduler`
+SCHEDULER_AUTOSTART = os.getenv('SCHEDULER_AUTOSTART', 'True') == 'True'
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', '')
+
+# Outbox emails claimed by a worker that did not report back within
+# OUTBOX_STALE_MINUTES (crash, kill) are sent again
+OUTBOX_STALE_MINUTES = int(os.getenv('OUTBOX_STALE_MINUTES', 10))
+
+# Newsletter delivery: parallel SMTP connections and optional messages/second limit (0 = unlimited)
+NEWSLETTER_SEND_WORKERS = int(os.getenv('NEWSLETTER_SEND_WORKERS', 4))
+NEWSLETTER_SEND_RATE = float(os.getenv('NEWSLETTER_SEND_RATE', 0))
+# Delivery records are checkpointed every N recipients; a 'sending' campaign
+# without a checkpoint for NEWSLETTER_STALE_MINUTES is resumed by the scheduler
+NEWSLETTER_CHECKPOINT_SIZE = int(os.getenv('NEWSLETTER_CHECKPOINT_SIZE', 200))
+NEWSLETTER_STALE_MINUTES = int(os.getenv('NEWSLETTER_STALE_MINUTES', 10))
+# The running campaign's heartbeat is refreshed at least every N seconds, even
+# while no recipient result arrives (slow SMTP, throttling)
+NEWSLETTER_HEARTBEAT_SECONDS = int(os.getenv('NEWSLETTER_HEARTBEAT_SECONDS', 60))
+# NewsletterLog rows are buffered and bulk-inserted every N entries or T seconds;
+# per-recipient success rows are only written when NEWSLETTER_LOG_RECIPIENTS is set
+NEWSLETTER_LOG_BATCH_SIZE = int(os.getenv('NEWSLETTER_LOG_BATCH_SIZE', 500))
+NEWSLETTER_LOG_FLUSH_SECONDS = float(os.getenv('NEWSLETTER_LOG_FLUSH_SECONDS', 5))
+NEWSLETTER_LOG_RECIPIENTS = os.getenv('NEWSLETTER_LOG_RECIPIENTS', 'False') == 'True'
+
+# Uploaded images are stored as-is and optimized to WebP in the background
+# ('background': dispatcher threads + process pool, 'sync': right after commit)
+IMAGE_PROCESSING_MODE = os.getenv('IMAGE_PROCESSING_MODE', 'background')
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_PROCESSING_STALE_MINUTES = int(os.getenv('IMAGE_PROCESSING_STALE_MINUTES', 10))
+# Widths of the responsive WebP variants served through {% responsive_image %}
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1280, 1920)
+
+# Rendered HTML of public pages is cached for anonymous visitors and
+# invalidated per content group by the signals (see properties/page_cache.py)
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True') == 'True'
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 6 * 3600))
+# A miss is rendered by one request; others wait up to PAGE_CACHE_WAIT_SECONDS for it
+PAGE_CACHE_LOCK_SECONDS = 10
+PAGE_CACHE_WAIT_SECONDS = 2
+
+# Lifetime of the cached listing facet counts per filter state; listing
+# changes invalidate them earlier (see properties/facets.py)
+FACET_CACHE_TIMEOUT = int(os.getenv('FACET_CACHE_TIMEOUT', 3600))
+
+# Lifetime of the versioned header/footer fragments in base.html (0 disables them)
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 24 * 3600))
+
 # CORS settings
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True
@@ -0,0 +1,13 @@
+"""
+Settings for the test suite (`manage.py test` selects them by default)
+
+Adds a second database standing in for the streaming replica
+(ReplicaRouterTests); the router ignores it unless DB_READ_REPLICA names it.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DATABASES["test_replica"] = {
+    **DATABASES["default"],
+    "TEST": {"NAME": f"test_{DATABASES['default']['NAME'] or 'realestate'}_replica"},
+}
@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
+from properties.db_router import replica_reads
 from properties.sitemaps import ListingSitemap, ConstructionSitemap, StaticViewSitemap
 from django.views.defaults import page_not_found, server_error
 
@@ -32,7 +33,7 @@ sitemaps = {
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('', include('properties.urls')),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', replica_reads(sitemap), {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
 ]
 
 # Serve media files in development
@@ -14,3 +14,22 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "realestate_project.settings")
 
 application = get_wsgi_application()
+
+# Parse all templates into the cached loader now rather than on the first
+# requests (layouts are picked at request time through {% include %})
+from django.conf import settings  # noqa: E402
+
+if settings.TEMPLATE_WARMUP:
+    from properties.template_warmup import warm_templates  # noqa: E402
+
+    warm_templates()
+
+if settings.AUTOCOMPLETE_WARMUP:
+    from properties.autocomplete import autocomplete_index  # noqa: E402
+
+    try:
+        autocomplete_index.warm()
+    except Exception:  # the first lookup builds it instead
+        import logging  # noqa: E402
+
+        logging.getLogger(__name__).exception('Autocomplete index could not be built at boot')
@@ -497,6 +497,33 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// ===================================
+// Search-as-you-type suggestions
+// ===================================
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-autocomplete-url]').forEach(function(input) {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        const update = debounce(function() {
+            const query = input.value.trim();
+            if (query.length < 2) return;
+            fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(response => response.ok ? response.json() : null)
+                .then(function(data) {
+                    if (!data) return;
+                    datalist.innerHTML = '';
+                    data.locations.concat(data.titles.map(item => item.title)).forEach(function(value) {
+                        const option = document.createElement('option');
+                        option.value = value;
+                        datalist.appendChild(option);
+                    });
+                })
+                .catch(function() {});
+        }, 150);
+        input.addEventListener('input', update);
+    });
+});
+
 // ===================================
 // Utility Functions
 // ===================================